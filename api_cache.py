@@ -0,0 +1,192 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta
+
+import statsapi
+
+# Game states after which a schedule entry no longer changes
+FINAL_STATUSES = {'Final', 'Game Over', 'Completed Early', 'Cancelled', 'Postponed'}
+
+# Seconds before a response may have changed
+LIVE_TTL = 5 * 60
+HIGHLIGHT_TTL = 6 * 60 * 60
+TEAMS_TTL = 24 * 60 * 60
+
+CACHE_PATH = os.getenv('MLB_API_CACHE_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'mlb_api_cache.sqlite3'))
+CACHE_MAX_ENTRIES = int(os.getenv('MLB_API_CACHE_MAX_ENTRIES', 500000))
+# Hits whose last_access is written in one transaction; until then it is held in memory
+ACCESS_FLUSH_EVERY = 1000
+
+
+class ResponseCache:
+    """SQLite-backed cache of JSON API responses keyed by endpoint and parameters.
+
+    Hits do not write: their access times are batched and flushed with the next
+    write, every ACCESS_FLUSH_EVERY hits, before an eviction and on close.
+    """
+
+    def __init__(self, path=CACHE_PATH, max_entries=CACHE_MAX_ENTRIES, flush_every=ACCESS_FLUSH_EVERY):
+        self.path = path
+        self.max_entries = max_entries
+        self.flush_every = flush_every
+        self.hits = 0
+        self.misses = 0
+        # key -> time of its latest hit not yet written to last_access
+        self._accessed = {}
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""CREATE TABLE IF NOT EXISTS responses (
+                            key TEXT PRIMARY KEY,
+                            value TEXT NOT NULL,
+                            expires_at REAL,
+                            last_access REAL NOT NULL
+                            )""")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_last_access_idx ON responses (last_access)")
+        self._conn.commit()
+        self._size = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    @staticmethod
+    def make_key(endpoint, params):
+        return endpoint + ":" + json.dumps(params, sort_keys=True, default=str)
+
+    def get(self, key, allow_expired=False):
+        """Cached value for key, or None when missing or (unless allow_expired) expired"""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT value, expires_at FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None or (not allow_expired and row[1] is not None and row[1] <= now):
+                self.misses += 1
+                return None
+            self._accessed[key] = now
+            if len(self._accessed) >= self.flush_every:
+                self._flush_accesses()
+                self._conn.commit()
+            self.hits += 1
+        return json.loads(row[0])
+
+    def set(self, key, value, ttl=None):
+        """Store value; ttl of None keeps it until evicted"""
+        now = time.time()
+        expires_at = None if ttl is None else now + ttl
+        with self._lock:
+            self._flush_accesses()
+            existed = self._conn.execute("SELECT 1 FROM responses WHERE key = ?", (key,)).fetchone() is not None
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, value, expires_at, last_access) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value), expires_at, now)
+            )
+            if not existed:
+                self._size += 1
+            if self._size > self.max_entries:
+                self._evict(now)
+            self._conn.commit()
+
+    def _flush_accesses(self):
+        # Written in the caller's transaction
+        if self._accessed:
+            self._conn.executemany("UPDATE responses SET last_access = ? WHERE key = ?",
+                                   [(accessed, key) for key, accessed in self._accessed.items()])
+            self._accessed.clear()
+
+    def _evict(self, now):
+        # Drop expired entries first, then the least recently used down to 90% of the bound
+        self._conn.execute("DELETE FROM responses WHERE expires_at IS NOT NULL AND expires_at <= ?", (now,))
+        target = int(self.max_entries * 0.9)
+        self._conn.execute("""DELETE FROM responses WHERE key IN (
+                            SELECT key FROM responses ORDER BY last_access
+                            LIMIT MAX((SELECT COUNT(*) FROM responses) - ?, 0))""", (target,))
+        self._size = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    def get_or_fetch(self, endpoint, params, fetch, ttl=None):
+        """Return the cached response, calling fetch() on a miss.
+
+        ttl is seconds, None for no expiry, or a callable taking the response
+        and returning either.
+        """
+        key = self.make_key(endpoint, params)
+        value = self.get(key)
+        if value is not None:
+            return value
+        value = fetch()
+        self.set(key, value, ttl(value) if callable(ttl) else ttl)
+        return value
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "entries": self._size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / total if total else 0.0,
+        }
+
+    def close(self):
+        with self._lock:
+            self._flush_accesses()
+            self._conn.commit()
+            self._conn.close()
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ResponseCache()
+    return _cache
+
+
+def _is_historical(day):
+    # A date at least two days back has no games still in progress in any time zone
+    if not day:
+        return False
+    return datetime.strptime(str(day)[:10], '%Y-%m-%d').date() <= (datetime.today() - timedelta(days=2)).date()
+
+
+def cached_get(endpoint, params, ttl=TEAMS_TTL):
+    """statsapi.get through the response cache"""
+    return get_cache().get_or_fetch(endpoint, params, lambda: statsapi.get(endpoint, params), ttl)
+
+
+def cached_schedule(date=None, start_date=None, end_date=None, game_id=None, **kwargs):
+    """statsapi.schedule through the response cache.
+
+    Ranges that ended in the past and games that reached a final state never
+    expire; anything that may still change is refetched after LIVE_TTL.
+    """
+    params = dict(date=date, start_date=start_date, end_date=end_date, game_id=game_id, **kwargs)
+    historical = _is_historical(end_date or date)
+
+    def ttl(games):
+        if historical or (games and all(game.get('status') in FINAL_STATUSES for game in games)):
+            return None
+        return LIVE_TTL
+
+    return get_cache().get_or_fetch(
+        'schedule', params,
+        lambda: statsapi.schedule(date=date, start_date=start_date, end_date=end_date, game_id=game_id, **kwargs),
+        ttl
+    )
+
+
+def cached_game_highlight_data(game_id, fetch=None):
+    """statsapi.game_highlight_data (or fetch(), which returns the same list)
+    through the response cache; once a condensed game is published the
+    response is kept for good"""
+    def ttl(highlights):
+        if any('condensed-game' in item.get('id', '') for item in highlights):
+            return None
+        return HIGHLIGHT_TTL
+
+    return get_cache().get_or_fetch(
+        'game_highlight_data', {'game_id': game_id},
+        fetch or (lambda: statsapi.game_highlight_data(game_id)),
+        ttl
+    )
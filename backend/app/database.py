@@ -0,0 +1,222 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+import psycopg2
+from psycopg2 import pool
+from psycopg2.extras import RealDictCursor
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+class PoolClosed(Exception):
+    pass
+
+
+class DatabasePool:
+    """Thread-safe psycopg2 connection pool with acquire timeouts and health checks"""
+
+    def __init__(self, minconn=1, maxconn=10, timeout=5.0, health_check_interval=30.0, **connect_kwargs):
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self.health_check_interval = health_check_interval
+        self.connect_kwargs = connect_kwargs
+        self._pool = None
+        self._closed = False
+        # Guards the pool, the idle times and the counters
+        self._lock = threading.Lock()
+        # Bounds concurrent checkouts so callers wait up to `timeout` instead of failing immediately
+        self._slots = threading.BoundedSemaphore(maxconn)
+        self._last_used = {}
+        self._in_use = 0
+        self.acquired = 0
+        self.timeouts = 0
+        self.discarded = 0
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            minconn=int(os.getenv('DB_POOL_MIN_SIZE', 1)),
+            maxconn=int(os.getenv('DB_POOL_MAX_SIZE', 10)),
+            timeout=float(os.getenv('DB_POOL_TIMEOUT', 5)),
+            health_check_interval=float(os.getenv('DB_POOL_HEALTH_CHECK_INTERVAL', 30)),
+            dbname=os.getenv('DB_NAME'),
+            user=os.getenv('DB_USER'),
+            password=os.getenv('DB_PASSWORD'),
+            host=os.getenv('DB_HOST'),
+            port=os.getenv('DB_PORT'),
+            cursor_factory=RealDictCursor,
+        )
+
+    def open(self):
+        with self._lock:
+            self._closed = False
+            self._create()
+        return self
+
+    def _create(self):
+        if self._pool is None:
+            self._pool = pool.ThreadedConnectionPool(self.minconn, self.maxconn, **self.connect_kwargs)
+
+    def _ensure_open(self):
+        # Opens lazily when the first open() failed, but never after close()
+        with self._lock:
+            if self._closed:
+                raise PoolClosed("The database pool has been closed")
+            self._create()
+            return self._pool
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+            if self._pool is not None:
+                self._pool.closeall()
+                self._pool = None
+                self._last_used.clear()
+
+    def _healthy(self, conn):
+        if conn.closed:
+            return False
+        with self._lock:
+            last_used = self._last_used.get(id(conn))
+        if last_used is not None and time.monotonic() - last_used < self.health_check_interval:
+            return True
+        # Idle for a while: make sure the server side is still there
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            return False
+
+    def _getconn(self, conn_pool):
+        # Every slot may hold a dead connection, so allow one replacement per slot
+        for _ in range(self.maxconn + 1):
+            conn = conn_pool.getconn()
+            if self._healthy(conn):
+                return conn
+            conn_pool.putconn(conn, close=True)
+            with self._lock:
+                self._last_used.pop(id(conn), None)
+                self.discarded += 1
+        raise psycopg2.OperationalError("Could not obtain a healthy database connection")
+
+    @contextmanager
+    def connection(self):
+        """Check out a connection, waiting at most `timeout` seconds for a free slot"""
+        if not self._slots.acquire(timeout=self.timeout):
+            with self._lock:
+                self.timeouts += 1
+            raise PoolTimeout(f"Timed out after {self.timeout}s waiting for a database connection")
+        conn = None
+        try:
+            conn_pool = self._ensure_open()
+            conn = self._getconn(conn_pool)
+            with self._lock:
+                self._in_use += 1
+                self.acquired += 1
+            try:
+                yield conn
+            finally:
+                with self._lock:
+                    self._in_use -= 1
+                if not conn.closed:
+                    # End the implicit transaction before handing the connection back
+                    try:
+                        conn.rollback()
+                    except psycopg2.Error:
+                        conn.close()
+        finally:
+            if conn is not None:
+                with self._lock:
+                    # After close() the pool has already closed every connection
+                    if self._pool is conn_pool:
+                        if conn.closed:
+                            self._last_used.pop(id(conn), None)
+                        else:
+                            self._last_used[id(conn)] = time.monotonic()
+                        conn_pool.putconn(conn, close=bool(conn.closed))
+            self._slots.release()
+
+    def metrics(self):
+        """Samples for Metrics.add_collector"""
+        stats = self.stats()
+        yield ("db_pool_max_size", "gauge", "Connections the pool may open", stats["max_size"])
+        yield ("db_pool_in_use", "gauge", "Connections checked out", stats["in_use"])
+        yield ("db_pool_acquired_total", "counter", "Connection checkouts", stats["acquired"])
+        yield ("db_pool_timeouts_total", "counter", "Checkouts that timed out waiting for a free connection", stats["timeouts"])
+        yield ("db_pool_discarded_total", "counter", "Connections replaced after failing a health check", stats["discarded"])
+
+    def stats(self):
+        with self._lock:
+            return {
+                "min_size": self.minconn,
+                "max_size": self.maxconn,
+                "in_use": self._in_use,
+                "acquired": self.acquired,
+                "timeouts": self.timeouts,
+                "discarded": self.discarded,
+            }
+
+
+def ensure_columns(db_pool, table, columns):
+    """Add any of `columns` (name -> SQL type) missing from `table`; returns the added names.
+    Existing columns are looked up first, so a current table is never locked by ALTER."""
+    with db_pool.connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                "SELECT column_name FROM information_schema.columns WHERE table_name = %s AND column_name = ANY(%s)",
+                (table, list(columns)),
+            )
+            existing = {row['column_name'] for row in cur.fetchall()}
+            added = [name for name in columns if name not in existing]
+            for name in added:
+                cur.execute(f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS {name} {columns[name]}")
+        conn.commit()
+    return added
+
+
+class TableVersion:
+    """A value that changes whenever rows of a table are inserted, updated or deleted.
+
+    Built from the table's cumulative change counters in pg_stat_user_tables and its
+    MAX(id), and re-read at most once every `interval` seconds, so it is cheap enough
+    to tag cached responses with. Backends flush their statistics up to ~10s after a
+    commit, so a new version can lag a write by that much plus `interval`.
+    """
+
+    def __init__(self, db_pool, table="games", interval=5.0):
+        self.db_pool = db_pool
+        self.table = table
+        self.interval = interval
+        self.version = None
+        self.changed_at = None
+        self._checked_at = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        """(version, time it was first seen)"""
+        with self._lock:
+            now = time.monotonic()
+            if self._checked_at is None or now - self._checked_at >= self.interval:
+                with self.db_pool.connection() as conn:
+                    with conn.cursor() as cur:
+                        cur.execute(f"""
+                            SELECT
+                                (SELECT COALESCE(MAX(id), 0) FROM {self.table}) AS max_id,
+                                (SELECT n_tup_ins + n_tup_upd + n_tup_del FROM pg_stat_user_tables
+                                 WHERE relid = %s::regclass) AS changes
+                        """, (self.table,))
+                        row = cur.fetchone()
+                version = (row['max_id'], row['changes'])
+                if version != self.version:
+                    self.version = version
+                    self.changed_at = datetime.now()
+                self._checked_at = now
+            return self.version, self.changed_at
@@ -1,16 +1,74 @@
-from fastapi import FastAPI, Query, HTTPException
+from fastapi import FastAPI, Query, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import Response, StreamingResponse
 from typing import Optional, List
-import psycopg2
-from psycopg2.extras import RealDictCursor
-import os
+from contextlib import asynccontextmanager, contextmanager
 from dotenv import load_dotenv
-from pydantic import BaseModel
+from pydantic import BaseModel, create_model
 from datetime import date
+import itertools
+import json
+import os
+import sys
+import time
+import psycopg2
+
+# response_cache.py, export.py, metrics.py, cursors.py and serialization.py are shared with the
+# pandas backend one directory up; excitement_metrics.py, highlight_views.py and game_rollups.py live
+# at the repository root
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.extend([BACKEND_DIR, os.path.join(BACKEND_DIR, '..')])
+from database import DatabasePool, PoolClosed, PoolTimeout, TableVersion, ensure_columns
+from pagination import SORT_EXPRESSIONS, METRIC_COLUMNS
+from queries import (build_games_query, build_export_query, build_team_stats_query, build_month_stats_query,
+                     build_head_to_head_query, TOP_TEAMS_QUERY)
+from serialization import METRIC_FIELD_TYPES
+from response_cache import ResponseCache
+from export import EXPORT_CHUNK_ROWS, EXPORT_FORMATS, encode_export, export_headers, row_columns
+from metrics import Metrics, MetricsMiddleware, record_phase, record_rows, span
+from cursors import encode_cursor, decode_cursor
+from highlight_views import VIEW_COLUMNS
+from game_rollups import create_missing_rollups
 
 load_dotenv()
 
-app = FastAPI(title="MLB Exciting Games API", version="1.0.0")
+# Shared connection pool, opened at startup and closed at shutdown
+db_pool = DatabasePool.from_env()
+
+# Cached /games, /seasons, /teams and /stats responses, dropped when the games table changes
+data_version = TableVersion(db_pool, "games", interval=float(os.getenv('DATA_VERSION_INTERVAL', 5)))
+response_cache = ResponseCache()
+
+# Set once ensure_schema has succeeded; until then every request retries it
+schema_ready = False
+
+def ensure_schema():
+    """Bring a database loaded before the highlight view columns or the /stats rollup
+    tables up to date, so /games and /stats work before the next ingest"""
+    global schema_ready
+    added = ensure_columns(db_pool, "games", VIEW_COLUMNS)
+    if added:
+        print(f"Added columns {', '.join(added)} to games")
+    with db_pool.connection() as conn:
+        with conn.cursor(cursor_factory=psycopg2.extensions.cursor) as cur:
+            created = create_missing_rollups(cur)
+        conn.commit()
+    if created:
+        print(f"Created and filled rollup tables {', '.join(created)}")
+    schema_ready = True
+
+@asynccontextmanager
+async def lifespan(app):
+    try:
+        db_pool.open()
+        ensure_schema()
+    except Exception as e:
+        # Keep serving; the pool and the schema check are retried on the first request
+        print(f"Failed to prepare the database: {str(e)}")
+    yield
+    db_pool.close()
+
+app = FastAPI(title="MLB Exciting Games API", version="1.0.0", lifespan=lifespan)
 
 # Enable CORS
 app.add_middleware(
@@ -21,8 +79,14 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Request latency, per-phase timings, row counts and pool statistics, served on /metrics
+metrics = Metrics()
+metrics.add_collector(db_pool.metrics)
+metrics.add_collector(response_cache.metrics)
+app.add_middleware(MetricsMiddleware, metrics=metrics)
+
 # Pydantic models
-class Game(BaseModel):
+class GameFields(BaseModel):
     id: int
     game_id: int
     game_date: date
@@ -33,174 +97,320 @@ class Game(BaseModel):
     excitement_score: float
     season: int
     highlight_url: Optional[str]
+    # Highlight popularity from data_processing.py; None for games without a matched video
+    view_count: Optional[int] = None
+    normalized_views: Optional[float] = None
+
+# One field per registered excitement metric; None for games scored before it was computed
+Game = create_model("Game", __base__=GameFields, **{name: (Optional[kind], None) for name, kind in METRIC_FIELD_TYPES.items()})
 
 class GameResponse(BaseModel):
     games: List[Game]
     total: int
     page: int
     limit: int
+    next_cursor: Optional[str] = None
 
 # Database connection
+@contextmanager
 def get_db_connection():
     try:
-        conn = psycopg2.connect(
-            dbname=os.getenv('DB_NAME'),
-            user=os.getenv('DB_USER'),
-            password=os.getenv('DB_PASSWORD'),
-            host=os.getenv('DB_HOST'),
-            port=os.getenv('DB_PORT'),
-            cursor_factory=RealDictCursor
-        )
-        return conn
-    except Exception as e:
+        if not schema_ready:
+            ensure_schema()
+        started = time.perf_counter()
+        with db_pool.connection() as conn:
+            record_phase("db_acquire", time.perf_counter() - started)
+            yield conn
+    except (PoolTimeout, PoolClosed, psycopg2.OperationalError) as e:
         raise HTTPException(status_code=500, detail=f"Database connection failed: {str(e)}")
 
 @app.get("/")
 async def root():
     return {"message": "MLB Exciting Games API"}
 
+@app.get("/metrics")
+async def get_metrics():
+    """Metrics in the Prometheus text format"""
+    return Response(content=metrics.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/health")
+async def health_check():
+    """Health check endpoint"""
+    return {
+        "status": "healthy",
+        "db_pool": db_pool.stats(),
+        "response_cache": response_cache.stats()
+    }
+
+# Handlers that touch the database are plain functions so FastAPI runs them in its
+# threadpool instead of blocking the event loop on psycopg2 calls
 @app.get("/games", response_model=GameResponse)
-async def get_games(
+def get_games(
+    request: Request,
     season: Optional[str] = Query(None, description="Filter by season (year)"),
     limit: int = Query(25, ge=1, le=100, description="Number of games to return"),
     page: int = Query(1, ge=1, description="Page number"),
-    sort: str = Query("excitement", description="Sort by: excitement, date, or score_diff"),
-    team: Optional[str] = Query(None, description="Filter by team abbreviation")
+    sort: str = Query("excitement", description=f"Sort by: excitement, date, score_diff, normalized_views (highlight popularity), or an excitement metric ({', '.join(METRIC_COLUMNS)})"),
+    team: Optional[str] = Query(None, description="Filter by team abbreviation"),
+    cursor: Optional[str] = Query(None, description="Opaque cursor from a previous response's next_cursor; takes precedence over page"),
+    approximate_total: bool = Query(False, description="Use the planner's row estimate for the total of unfiltered queries")
 ):
     try:
-        conn = get_db_connection()
-        cur = conn.cursor()
-        
-        # Build the query
-        base_query = """
-            SELECT 
-                id, game_id, date as game_date, home_team, away_team, 
-                home_score, away_score, excitement as excitement_score, 
-                season, highlight_url
-            FROM games
-            WHERE 1=1
-        """
-        
-        params = []
-        
-        # Add filters
-        if season:
-            base_query += " AND season = %s"
-            params.append(int(season))
-        
-        if team:
-            base_query += " AND (home_team = %s OR away_team = %s)"
-            params.extend([team.upper(), team.upper()])
-        
-        # Add sorting
-        if sort == "excitement":
-            base_query += " ORDER BY excitement DESC"
-        elif sort == "date":
-            base_query += " ORDER BY date DESC"
-        elif sort == "score_diff":
-            base_query += " ORDER BY ABS(home_score - away_score) DESC"
-        else:
-            base_query += " ORDER BY excitement DESC"
-        
-        # Get total count for pagination
-        count_query = """
-            SELECT COUNT(*) as count
-            FROM games
-            WHERE 1=1
-        """
-        count_params = []
-        
-        # Add same filters for count
-        if season:
-            count_query += " AND season = %s"
-            count_params.append(int(season))
-        
-        if team:
-            count_query += " AND (home_team = %s OR away_team = %s)"
-            count_params.extend([team.upper(), team.upper()])
-        
-        cur.execute(count_query, count_params)
-        total = cur.fetchone()['count']
-        
-        # Add pagination
-        offset = (page - 1) * limit
-        base_query += " LIMIT %s OFFSET %s"
-        params.extend([limit, offset])
-        
-        # Execute main query
-        cur.execute(base_query, params)
-        games_data = cur.fetchall()
-        
-        games = [
-            Game(
-                id=game['id'],
-                game_id=game['game_id'],
-                game_date=game['game_date'],
-                home_team=game['home_team'],
-                away_team=game['away_team'],
-                home_score=game['home_score'],
-                away_score=game['away_score'],
-                excitement_score=float(game['excitement_score']) if game['excitement_score'] else 0.0,
-                season=game['season'],
-                highlight_url=game['highlight_url']
+        if sort not in SORT_EXPRESSIONS:
+            sort = "excitement"
+        
+        # Keyset pagination: seek past the cursor's (sort key, id) instead of skipping rows
+        seek = None
+        if cursor:
+            try:
+                cursor_sort, cursor_key, cursor_id = decode_cursor(cursor)
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
+            if cursor_sort != sort:
+                raise HTTPException(status_code=400, detail="Cursor does not match the requested sort")
+            seek = (cursor_key, cursor_id)
+        
+        def build():
+            # Total and page come back from a single statement
+            query, params = build_games_query(
+                season=season,
+                team=team,
+                sort=sort,
+                limit=limit,
+                page=page,
+                seek=seek,
+                approximate_total=approximate_total
             )
-            for game in games_data
-        ]
+            
+            with get_db_connection() as conn:
+                # The count and the page are one statement, so they are timed together
+                with span("db_query"):
+                    cur = conn.cursor()
+                    cur.execute(query, params)
+                    rows = cur.fetchall()
+                    cur.close()
+            
+            total = rows[0]['total'] if rows else 0
+            games_data = [row for row in rows if row['id'] is not None]
+            record_rows(total, len(games_data))
+            
+            with span("serialize"):
+                return games_response(games_data, total)
         
-        cur.close()
-        conn.close()
+        def games_response(games_data, total):
+            games = [
+                Game(
+                    id=game['id'],
+                    game_id=game['game_id'],
+                    game_date=game['game_date'],
+                    home_team=game['home_team'],
+                    away_team=game['away_team'],
+                    home_score=game['home_score'],
+                    away_score=game['away_score'],
+                    excitement_score=float(game['excitement_score']) if game['excitement_score'] else 0.0,
+                    season=game['season'],
+                    highlight_url=game['highlight_url'],
+                    view_count=game['view_count'],
+                    normalized_views=game['normalized_views'],
+                    **{column: game[column] for column in METRIC_COLUMNS}
+                )
+                for game in games_data
+            ]
+            
+            next_cursor = None
+            if len(games_data) == limit:
+                last = games_data[-1]
+                next_cursor = encode_cursor(sort, last['sort_key'], last['id'])
+            
+            return GameResponse(
+                games=games,
+                total=total,
+                page=page,
+                limit=limit,
+                next_cursor=next_cursor
+            ).model_dump_json().encode()
         
-        return GameResponse(
-            games=games,
-            total=total,
-            page=page,
-            limit=limit
-        )
+        version, changed_at = data_version.get()
+        key = response_cache.make_key("/games", season=season, limit=limit, page=page, sort=sort, team=team,
+                                       cursor=cursor, approximate_total=approximate_total)
+        return response_cache.respond(request, key, version, changed_at, build)
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching games: {str(e)}")
 
-@app.get("/seasons")
-async def get_seasons():
-    """Get list of available seasons"""
+def export_chunks(query, params):
+    """Game field columns of the query's rows, EXPORT_CHUNK_ROWS at a time, read
+    through a server-side cursor that holds one pool connection for the whole export"""
+    with get_db_connection() as conn:
+        # Plain tuples: building a dict per row would cost several times the fetch itself
+        with conn.cursor(name="games_export", cursor_factory=psycopg2.extensions.cursor) as cur:
+            cur.itersize = EXPORT_CHUNK_ROWS
+            cur.execute(query, params)
+            names = None
+            while True:
+                rows = cur.fetchmany(EXPORT_CHUNK_ROWS)
+                if not rows:
+                    break
+                # A named cursor has no description until its first fetch
+                names = names or [column.name for column in cur.description]
+                yield row_columns(rows, names)
+
+@app.get("/games/export")
+def export_games(
+    season: Optional[str] = Query(None, description="Filter by season (year)"),
+    sort: str = Query("excitement", description="Sort order, as for /games"),
+    team: Optional[str] = Query(None, description="Filter by team abbreviation"),
+    format: str = Query("ndjson", description="ndjson, csv or arrow (Arrow IPC stream)")
+):
+    """Stream every game matching the filters in one response"""
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unknown format {format!r}; expected one of {', '.join(EXPORT_FORMATS)}")
     try:
-        conn = get_db_connection()
-        cur = conn.cursor()
+        if sort not in SORT_EXPRESSIONS:
+            sort = "excitement"
+        chunks = export_chunks(*build_export_query(season=season, team=team, sort=sort))
+        # The first chunk is read here, so connection and query errors become a 500
+        # instead of a truncated stream
+        first = next(chunks, None)
+        if first is not None:
+            chunks = itertools.chain([first], chunks)
         
-        cur.execute("SELECT DISTINCT season FROM games ORDER BY season DESC")
-        seasons = [row['season'] for row in cur.fetchall()]
+        media_type, headers = export_headers(format)
+        return StreamingResponse(encode_export(chunks, format), media_type=media_type, headers=headers)
         
-        cur.close()
-        conn.close()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error exporting games: {str(e)}")
+
+@app.get("/seasons")
+def get_seasons(request: Request):
+    """Get list of available seasons"""
+    try:
+        def build():
+            with get_db_connection() as conn:
+                with span("db_query"):
+                    cur = conn.cursor()
+                    cur.execute("SELECT DISTINCT season FROM games ORDER BY season DESC")
+                    seasons = [row['season'] for row in cur.fetchall()]
+                    cur.close()
+            return json.dumps({"seasons": seasons}).encode()
         
-        return {"seasons": seasons}
+        version, changed_at = data_version.get()
+        return response_cache.respond(request, response_cache.make_key("/seasons"), version, changed_at, build)
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching seasons: {str(e)}")
 
 @app.get("/teams")
-async def get_teams():
+def get_teams(request: Request):
     """Get list of available teams"""
     try:
-        conn = get_db_connection()
-        cur = conn.cursor()
+        def build():
+            with get_db_connection() as conn:
+                with span("db_query"):
+                    cur = conn.cursor()
+                    cur.execute("""
+                        SELECT DISTINCT team FROM (
+                            SELECT home_team as team FROM games
+                            UNION
+                            SELECT away_team as team FROM games
+                        ) t ORDER BY team
+                    """)
+                    teams = [row['team'] for row in cur.fetchall()]
+                    cur.close()
+            return json.dumps({"teams": teams}).encode()
         
-        cur.execute("""
-            SELECT DISTINCT team FROM (
-                SELECT home_team as team FROM games
-                UNION
-                SELECT away_team as team FROM games
-            ) t ORDER BY team
-        """)
-        teams = [row['team'] for row in cur.fetchall()]
+        version, changed_at = data_version.get()
+        return response_cache.respond(request, response_cache.make_key("/teams"), version, changed_at, build)
         
-        cur.close()
-        conn.close()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error fetching teams: {str(e)}")
+
+def fetch_stats(query, params=()):
+    with get_db_connection() as conn:
+        with span("db_query"):
+            cur = conn.cursor()
+            cur.execute(query, params)
+            rows = cur.fetchall()
+            cur.close()
+    return rows
+
+@app.get("/stats/teams")
+def get_team_stats(request: Request, season: Optional[int] = Query(None, description="Season; all seasons when omitted")):
+    """Teams ranked by average excitement"""
+    try:
+        def build():
+            rows = fetch_stats(*build_team_stats_query(season))
+            teams = [{"team": row['team'], "games": int(row['games']), "avg_excitement": row['avg_excitement'],
+                      "total_excitement": row['total_excitement']} for row in rows]
+            return json.dumps({"season": season, "teams": teams}).encode()
         
-        return {"teams": teams}
+        version, changed_at = data_version.get()
+        return response_cache.respond(request, response_cache.make_key("/stats/teams", season=season), version, changed_at, build)
         
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error fetching teams: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error fetching team stats: {str(e)}")
+
+@app.get("/stats/top-teams")
+def get_top_teams(request: Request):
+    """Most exciting team of each season"""
+    try:
+        def build():
+            seasons = [dict(row) for row in fetch_stats(TOP_TEAMS_QUERY)]
+            return json.dumps({"seasons": seasons}).encode()
+        
+        version, changed_at = data_version.get()
+        return response_cache.respond(request, response_cache.make_key("/stats/top-teams"), version, changed_at, build)
+        
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error fetching top teams: {str(e)}")
+
+@app.get("/stats/months")
+def get_month_stats(request: Request, season: Optional[int] = Query(None, description="Season; all seasons when omitted")):
+    """Average excitement by month"""
+    try:
+        def build():
+            months = [{"month": f"{row['season']:04d}-{row['month']:02d}", "games": row['games'], "avg_excitement": row['avg_excitement']}
+                      for row in fetch_stats(*build_month_stats_query(season))]
+            return json.dumps({"months": months}).encode()
+        
+        version, changed_at = data_version.get()
+        return response_cache.respond(request, response_cache.make_key("/stats/months", season=season), version, changed_at, build)
+        
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error fetching month stats: {str(e)}")
+
+@app.get("/stats/head-to-head")
+def get_head_to_head(
+    request: Request,
+    team: str = Query(..., description="Team abbreviation"),
+    opponent: str = Query(..., description="Opponent abbreviation"),
+    season: Optional[int] = Query(None, description="Season; all seasons when omitted")
+):
+    """Excitement of the games between two teams"""
+    try:
+        def build():
+            rows = fetch_stats(*build_head_to_head_query(team, opponent, season))
+            excitement_games = sum(row['excitement_games'] for row in rows)
+            excitement_sum = sum(row['excitement_sum'] for row in rows)
+            return json.dumps({
+                "team": team.strip().upper(),
+                "opponent": opponent.strip().upper(),
+                "games": sum(row['games'] for row in rows),
+                "avg_excitement": excitement_sum / excitement_games if excitement_games else None,
+                "total_excitement": float(excitement_sum),
+                "seasons": [{"season": row['season'], "games": row['games'],
+                             "avg_excitement": row['excitement_sum'] / row['excitement_games'] if row['excitement_games'] else None}
+                            for row in rows],
+            }).encode()
+        
+        key = response_cache.make_key("/stats/head-to-head", team=team.strip().upper(), opponent=opponent.strip().upper(), season=season)
+        version, changed_at = data_version.get()
+        return response_cache.respond(request, key, version, changed_at, build)
+        
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error fetching head-to-head stats: {str(e)}")
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,27 @@
+from excitement_metrics import METRICS, METRIC_TYPES
+
+# Sort options for /games mapped to the SQL expression they order by (descending)
+SORT_EXPRESSIONS = {
+    "excitement": "excitement",
+    "date": "date",
+    "score_diff": "ABS(home_score - away_score)",
+    # Games without a matched highlight video sort last (normalized views are >= 0)
+    "normalized_views": "COALESCE(normalized_views, -1)",
+}
+# Per-game excitement metrics. Games scored before a metric existed have it NULL;
+# coalescing to -1 sorts them last and keeps keyset row comparisons NULL-free.
+METRIC_COLUMNS = list(METRICS)
+SORT_EXPRESSIONS.update({
+    name: f"COALESCE({name}::int, -1)" if METRIC_TYPES[name] == 'bool' else f"COALESCE({name}, -1)"
+    for name in METRIC_COLUMNS
+})
+
+
+def seek_predicate(sort, key, game_id):
+    """WHERE fragment and params selecting rows after (key, id) in `ORDER BY expr DESC, id DESC`"""
+    expr = SORT_EXPRESSIONS[sort]
+    if key is None:
+        # NULL keys sort first under DESC, so everything non-NULL is still ahead
+        return f" AND ({expr} IS NOT NULL OR id < %s)", [game_id]
+    # A row comparison lets the (expr DESC, id DESC) index seek straight to the cursor
+    return f" AND ({expr}, id) < (%s, %s)", [key, game_id]
@@ -0,0 +1,126 @@
+from pagination import SORT_EXPRESSIONS, METRIC_COLUMNS, seek_predicate
+
+GAME_COLUMNS = f"""
+    id, game_id, date as game_date, home_team, away_team,
+    home_score, away_score, excitement as excitement_score,
+    season, highlight_url, view_count, normalized_views, {", ".join(METRIC_COLUMNS)}
+"""
+
+# Planner estimate of the table size, falling back to an exact count before the
+# first ANALYZE (reltuples is -1 until then)
+APPROXIMATE_COUNT = """
+    SELECT CASE WHEN reltuples < 0 THEN (SELECT COUNT(*) FROM games)
+                ELSE reltuples::bigint END AS total
+    FROM pg_class WHERE oid = 'games'::regclass
+"""
+
+
+def build_filters(season=None, team=None):
+    """WHERE clause and params shared by the count and the page query"""
+    where = "WHERE 1=1"
+    params = []
+    if season:
+        where += " AND season = %s"
+        params.append(int(season))
+    if team:
+        where += " AND (home_team = %s OR away_team = %s)"
+        params.extend([team.upper(), team.upper()])
+    return where, params
+
+
+def build_games_query(season=None, team=None, sort="excitement", limit=25, page=1, seek=None, approximate_total=False):
+    """Single statement returning the filtered total alongside one page of games.
+
+    The count is the left side of a LATERAL join, so the statement always yields
+    at least one row; when the page is empty that row has NULL game columns.
+    `seek` is a decoded (key, id) cursor and replaces OFFSET pagination.
+    """
+    sort_expression = SORT_EXPRESSIONS[sort]
+    where, filter_params = build_filters(season, team)
+
+    if approximate_total and not filter_params:
+        count_query = APPROXIMATE_COUNT
+        count_params = []
+    else:
+        count_query = f"SELECT COUNT(*) AS total FROM games {where}"
+        count_params = list(filter_params)
+
+    page_query = f"SELECT {GAME_COLUMNS}, {sort_expression} as sort_key FROM games {where}"
+    page_params = list(filter_params)
+    if seek is not None:
+        seek_query, seek_params = seek_predicate(sort, *seek)
+        page_query += seek_query
+        page_params.extend(seek_params)
+    # id breaks ties so every row has a stable position for keyset pagination
+    page_query += f" ORDER BY {sort_expression} DESC, id DESC"
+    if seek is not None:
+        page_query += " LIMIT %s"
+        page_params.append(limit)
+    else:
+        page_query += " LIMIT %s OFFSET %s"
+        page_params.extend([limit, (page - 1) * limit])
+
+    query = f"""
+        SELECT c.total, p.*
+        FROM ({count_query}) c
+        LEFT JOIN LATERAL ({page_query}) p ON true
+        ORDER BY p.sort_key DESC, p.id DESC
+    """
+    return query, count_params + page_params
+
+
+def build_export_query(season=None, team=None, sort="excitement"):
+    """Every matching game in the /games order, for reading through a server-side cursor"""
+    sort_expression = SORT_EXPRESSIONS[sort]
+    where, params = build_filters(season, team)
+    return f"SELECT {GAME_COLUMNS} FROM games {where} ORDER BY {sort_expression} DESC, id DESC", params
+
+
+# /stats reads the per-season rollup tables of game_rollups.py, created at startup when missing
+STATS_AVERAGE = "SUM(excitement_sum) / NULLIF(SUM(excitement_games), 0)"
+
+
+def build_team_stats_query(season=None):
+    """Teams by average excitement, summed over the team's seasons unless one is given"""
+    where, params = ("WHERE season = %s", [int(season)]) if season is not None else ("", [])
+    query = f"""
+        SELECT team, SUM(games) AS games, {STATS_AVERAGE} AS avg_excitement,
+               SUM(excitement_sum) AS total_excitement
+        FROM games_team_season_stats {where}
+        GROUP BY team
+        ORDER BY avg_excitement DESC NULLS LAST, team
+    """
+    return query, params
+
+
+TOP_TEAMS_QUERY = """
+    SELECT DISTINCT ON (season) season, team, games, excitement_sum / excitement_games AS avg_excitement
+    FROM games_team_season_stats
+    WHERE excitement_games > 0
+    ORDER BY season DESC, avg_excitement DESC, team
+"""
+
+
+def build_month_stats_query(season=None):
+    where, params = ("WHERE season = %s", [int(season)]) if season is not None else ("", [])
+    query = f"""
+        SELECT season, month, games, excitement_sum / NULLIF(excitement_games, 0) AS avg_excitement
+        FROM games_month_stats {where}
+        ORDER BY season, month
+    """
+    return query, params
+
+
+def build_head_to_head_query(team, opponent, season=None):
+    """Per-season rows for the pair, stored once with the teams in sorted order"""
+    team, opponent = team.strip().upper(), opponent.strip().upper()
+    query = """
+        SELECT season, games, excitement_games, excitement_sum
+        FROM games_matchup_stats
+        WHERE team_a = LEAST(%s, %s) AND team_b = GREATEST(%s, %s)
+    """
+    params = [team, opponent, team, opponent]
+    if season is not None:
+        query += " AND season = %s"
+        params.append(int(season))
+    return query + " ORDER BY season DESC", params
@@ -0,0 +1,67 @@
+"""Check that /games queries are served from indexes rather than table scans.
+
+Run after Database_Manager.create_games_indexes(); exits non-zero if any
+representative query plans a sequential scan over games.
+"""
+import os
+import sys
+
+from dotenv import load_dotenv
+
+# excitement_metrics.py, which the queries are built from, lives at the repository root
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from database import DatabasePool
+from queries import build_games_query
+
+load_dotenv()
+
+# (description, build_games_query kwargs)
+CHECKS = [
+    ("unfiltered by excitement, approximate total", dict(sort="excitement", approximate_total=True)),
+    ("unfiltered by date, approximate total", dict(sort="date", approximate_total=True)),
+    ("unfiltered by score_diff, approximate total", dict(sort="score_diff", approximate_total=True)),
+    ("season by excitement", dict(season="2001", sort="excitement")),
+    ("season by score_diff", dict(season="2001", sort="score_diff")),
+    ("team by excitement", dict(team="NYY", sort="excitement")),
+    ("team by date", dict(team="NYY", sort="date")),
+    ("season and team", dict(season="2001", team="NYY")),
+    ("unfiltered by lead_changes, approximate total", dict(sort="lead_changes", approximate_total=True)),
+    ("unfiltered by walk_off, approximate total", dict(sort="walk_off", approximate_total=True)),
+    ("unfiltered by normalized_views, approximate total", dict(sort="normalized_views", approximate_total=True)),
+    ("deep keyset page by excitement", dict(sort="excitement", seek=(0.5, 1000), approximate_total=True)),
+    ("deep keyset page by date", dict(sort="date", seek=("1980-06-01", 1000), approximate_total=True)),
+    ("deep keyset page by late_leverage", dict(sort="late_leverage", seek=(0.5, 1000), approximate_total=True)),
+]
+
+
+def plan_nodes(node):
+    yield node
+    for child in node.get('Plans', []):
+        yield from plan_nodes(child)
+
+
+def explain(cur, query, params):
+    # ANALYZE so branches that never run (e.g. the approximate count's fallback) are skipped
+    cur.execute("EXPLAIN (ANALYZE, FORMAT JSON) " + query, params)
+    row = cur.fetchone()
+    return [n for n in plan_nodes(row['QUERY PLAN'][0]['Plan']) if n.get('Actual Loops', 0) > 0]
+
+
+def main():
+    failures = 0
+    with DatabasePool.from_env().open().connection() as conn:
+        cur = conn.cursor()
+        for description, kwargs in CHECKS:
+            query, params = build_games_query(**kwargs)
+            nodes = explain(cur, query, params)
+            seq_scans = [n for n in nodes if n['Node Type'] == 'Seq Scan' and n.get('Relation Name') == 'games']
+            indexes = sorted({n['Index Name'] for n in nodes if n.get('Index Name', 'pg_').startswith('games_')})
+            status = "FAIL" if seq_scans else "ok"
+            failures += bool(seq_scans)
+            print(f"{status:4} {description}: {', '.join(indexes) or 'no indexes'}")
+        cur.close()
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
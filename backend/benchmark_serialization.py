@@ -0,0 +1,61 @@
+import time
+from datetime import date
+
+import pandas as pd
+
+from main import Game, GameResponse, reloader
+from serialization import game_records, json_response
+
+LIMITS = [25, 250, 1000]
+REPEATS = 50
+
+
+def pydantic_response(page_df, total, limit):
+    """Original path: iterrows, one Game model per row, then response_model validation"""
+    games = []
+    for _, row in page_df.iterrows():
+        games.append(Game(
+            id=int(row['id']),
+            game_id=int(row['game_id']),
+            game_date=row['date'].date() if pd.notna(row['date']) else date.today(),
+            home_team=str(row['home_team']),
+            away_team=str(row['away_team']),
+            home_score=int(row['home_score']) if pd.notna(row.get('home_score')) else None,
+            away_score=int(row['away_score']) if pd.notna(row.get('away_score')) else None,
+            excitement_score=float(row['excitement']) if pd.notna(row['excitement']) else 0.0,
+            season=int(row['season']) if pd.notna(row['season']) else 2024,
+            highlight_url=str(row['highlight_url']) if pd.notna(row.get('highlight_url')) else None
+        ))
+    response = GameResponse(games=games, total=total, page=1, limit=limit)
+    return GameResponse.model_validate(response.model_dump()).model_dump_json()
+
+
+def columnar_response(page_df, total, limit):
+    """Fast path: columnar conversion and a raw JSON body"""
+    return json_response({"games": game_records(page_df), "total": total, "page": 1, "limit": limit}).body
+
+
+def time_path(func, page_df, total, limit):
+    start = time.perf_counter()
+    for _ in range(REPEATS):
+        func(page_df, total, limit)
+    return (time.perf_counter() - start) / REPEATS * 1000
+
+
+def main():
+    query_engine = reloader.dataset.engine
+    games_df = query_engine.df
+    if games_df.empty:
+        print("No game data available")
+        return
+    print(f"{'limit':>6} {'pydantic ms':>12} {'columnar ms':>12} {'speedup':>8}")
+    for limit in LIMITS:
+        rows, total = query_engine.query(limit=limit)
+        page_df = games_df.iloc[rows]
+        slow = time_path(pydantic_response, page_df, total, limit)
+        fast = time_path(columnar_response, page_df, total, limit)
+        print(f"{limit:>6} {slow:>12.2f} {fast:>12.2f} {slow / fast:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
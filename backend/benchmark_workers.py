@@ -0,0 +1,73 @@
+import os
+import re
+import subprocess
+import sys
+import threading
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+WORKERS = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+PORT = 8793
+LOADED_PATTERN = re.compile(r"Process (\d+) loaded dataset v\d+ in ([\d.]+)s")
+
+# Every worker loads its own copy, against serve.py's shared snapshot
+MODES = {
+    "uvicorn --workers": [sys.executable, "-m", "uvicorn", "main:app", "--port", str(PORT), "--workers", str(WORKERS)],
+    "serve.py": [sys.executable, "serve.py", str(WORKERS)],
+}
+
+
+def memory_kib(pid):
+    """(RSS, PSS) in KiB; PSS charges each shared page to the processes mapping it in equal parts"""
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        fields = {line.split(":")[0]: int(line.split()[1]) for line in f if line.split()[-1] == "kB"}
+    return fields["Rss"], fields["Pss"]
+
+
+def children(pid):
+    with open(f"/proc/{pid}/task/{pid}/children") as f:
+        return [int(child) for child in f.read().split()]
+
+
+def run(label, command):
+    started = time.perf_counter()
+    env = dict(os.environ, PORT=str(PORT), DATA_RELOAD_INTERVAL="0", PYTHONUNBUFFERED="1")
+    process = subprocess.Popen(command, cwd=BACKEND_DIR, env=env, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+    loads = {}
+    try:
+        # Ready once every worker has reported its dataset (serve.py itself reports one more)
+        expected = WORKERS + (1 if label == "serve.py" else 0)
+        for line in process.stdout:
+            # Workers write concurrently, so one line can hold several reports
+            for match in LOADED_PATTERN.finditer(line):
+                loads[int(match.group(1))] = float(match.group(2))
+            if len(loads) >= expected:
+                break
+        ready = time.perf_counter() - started
+        # Keep reading, or the workers block on a full pipe when logging their shutdown
+        threading.Thread(target=lambda: [None for _ in process.stdout], daemon=True).start()
+        time.sleep(1)
+
+        print(f"{label}: {WORKERS} workers ready in {ready:.1f}s")
+        print(f"  {'pid':>7} {'role':<10} {'load s':>7} {'RSS MiB':>8} {'PSS MiB':>8}")
+        total_rss = total_pss = 0
+        for pid in [process.pid] + children(process.pid):
+            rss, pss = memory_kib(pid)
+            total_rss += rss
+            total_pss += pss
+            role = "main" if pid == process.pid else "worker" if pid in loads else "helper"
+            load = f"{loads[pid]:.2f}" if pid in loads else "-"
+            print(f"  {pid:>7} {role:<10} {load:>7} {rss / 1024:>8.1f} {pss / 1024:>8.1f}")
+        print(f"  total RSS {total_rss / 1024:.1f} MiB, total PSS {total_pss / 1024:.1f} MiB")
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def main():
+    for label, command in MODES.items():
+        run(label, command)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,21 @@
+import base64
+import json
+from datetime import date
+
+
+def encode_cursor(sort, key, game_id):
+    """Opaque token for the last (sort key, id) returned on a page"""
+    if isinstance(key, date):
+        key = key.isoformat()
+    payload = json.dumps({"sort": sort, "key": key, "id": game_id}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Inverse of encode_cursor; raises ValueError on malformed tokens"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return payload['sort'], payload['key'], int(payload['id'])
+    except Exception:
+        raise ValueError("Invalid cursor")
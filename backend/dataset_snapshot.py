@@ -0,0 +1,160 @@
+import json
+import mmap
+import os
+import pickle
+import tempfile
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+# Shared memory where available, so the snapshot never touches disk
+SNAPSHOT_PATH = os.getenv('DATASET_SNAPSHOT_PATH', os.path.join('/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir(), 'mlb-games-snapshot'))
+CURRENT_NAME = "current.json"
+ARRAY_ALIGNMENT = 64
+
+
+def _align(offset):
+    return (offset + ARRAY_ALIGNMENT - 1) // ARRAY_ALIGNMENT * ARRAY_ALIGNMENT
+
+
+class ArrayRef(NamedTuple):
+    """Stands in for an array of the data file in the pickled metadata"""
+    name: str
+
+
+def _extract(value, name, arrays):
+    """value with every ndarray moved into arrays and replaced by an ArrayRef"""
+    if isinstance(value, np.ndarray):
+        arrays[name] = value
+        return ArrayRef(name)
+    if isinstance(value, dict):
+        return {key: _extract(item, f"{name}/{key}", arrays) for key, item in value.items()}
+    return value
+
+
+def _restore(value, arrays):
+    if isinstance(value, ArrayRef):
+        return arrays[value.name]
+    if isinstance(value, dict):
+        return {key: _restore(item, arrays) for key, item in value.items()}
+    return value
+
+
+class DatasetSnapshot:
+    """A built dataset (frame, query indexes and stats rollups) in one memory-mapped
+    file, so several worker processes can serve it from the same physical pages.
+
+    One process writes versions with write(); the others attach() read-only and
+    get plain ndarray views over the mapping, so attaching costs little more than
+    opening the file. Numeric and date columns are stored as is; any other column
+    is stored as integer codes into a table of its values and rebuilt on attach.
+    current.json names the latest version and is swapped atomically; the version
+    before it is kept so a worker attaching during a write can still open it.
+    """
+
+    def __init__(self, path=SNAPSHOT_PATH):
+        self.path = path
+
+    def exists(self):
+        return os.path.exists(os.path.join(self.path, CURRENT_NAME))
+
+    def current_version(self):
+        """Version named by current.json, or None before the first write"""
+        try:
+            with open(os.path.join(self.path, CURRENT_NAME), "r") as f:
+                return json.load(f)["version"]
+        except FileNotFoundError:
+            return None
+
+    @staticmethod
+    def _encode_column(series):
+        if isinstance(series.dtype, np.dtype) and series.dtype.kind in 'biufM':
+            return series.to_numpy(), {"dtype": str(series.dtype)}
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            return series.cat.codes.to_numpy(), {"categories": series.cat.categories, "ordered": series.cat.ordered}
+        codes, uniques = pd.factorize(series, use_na_sentinel=True)
+        return codes.astype(np.int32), {"values": np.asarray(uniques, dtype=object), "dtype": str(series.dtype)}
+
+    @staticmethod
+    def _decode_column(values, spec):
+        if "categories" in spec:
+            return pd.Categorical.from_codes(values, categories=spec["categories"], ordered=spec["ordered"])
+        if "values" in spec:
+            # Missing values have code -1, which takes the trailing None
+            decoded = np.append(spec["values"], None)[values]
+            return decoded if spec["dtype"] == "object" else pd.array(decoded, dtype=spec["dtype"])
+        return values
+
+    def write(self, df, engine_state, stats, metadata):
+        """Write a new version and make it current; returns the version number.
+
+        engine_state is GameQueryEngine.state(), stats the StatsRollups, and
+        metadata anything else the readers need back (source, fingerprint, ...).
+        """
+        os.makedirs(self.path, exist_ok=True)
+        version = (self.current_version() or 0) + 1
+        arrays = {}
+        columns = {}
+        for column in df.columns:
+            arrays["df/" + column], columns[column] = self._encode_column(df[column])
+        engine_state = _extract(engine_state, "engine", arrays)
+
+        data_name = f"dataset-v{version}.bin"
+        layout = {}
+        offset = 0
+        with open(os.path.join(self.path, data_name), "wb") as f:
+            for name, values in arrays.items():
+                values = np.ascontiguousarray(values)
+                offset = _align(offset)
+                f.seek(offset)
+                f.write(values.tobytes())
+                layout[name] = (offset, values.dtype.str, values.shape)
+                offset += values.nbytes
+        # Small, non-array parts: layout, value tables, the engine's lookups and the rollups
+        meta_name = f"dataset-v{version}.pkl"
+        with open(os.path.join(self.path, meta_name), "wb") as f:
+            pickle.dump({"layout": layout, "columns": columns, "engine": engine_state, "stats": stats, "metadata": metadata}, f)
+
+        current = os.path.join(self.path, CURRENT_NAME)
+        with open(current + ".tmp", "w") as f:
+            json.dump({"version": version, "data": data_name, "meta": meta_name}, f)
+        os.replace(current + ".tmp", current)
+        self._remove_old(version)
+        return version
+
+    def _remove_old(self, version):
+        keep = {f"dataset-v{v}.{ext}" for v in (version, version - 1) for ext in ("bin", "pkl")}
+        for name in os.listdir(self.path):
+            if name.startswith("dataset-v") and name not in keep:
+                # Workers still mapping the file keep its pages until they move on
+                os.remove(os.path.join(self.path, name))
+
+    def attach(self):
+        """(df, engine_state, stats, metadata, version) of the current version"""
+        try:
+            return self._attach()
+        except FileNotFoundError:
+            # A newer write removed the files after current.json was read
+            return self._attach()
+
+    def _attach(self):
+        with open(os.path.join(self.path, CURRENT_NAME), "r") as f:
+            current = json.load(f)
+        with open(os.path.join(self.path, current["meta"]), "rb") as f:
+            meta = pickle.load(f)
+        with open(os.path.join(self.path, current["data"]), "rb") as f:
+            # An empty frame writes an empty file, which cannot be mapped
+            size = os.fstat(f.fileno()).st_size
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+
+        arrays = {}
+        for name, (offset, dtype, shape) in meta["layout"].items():
+            dtype = np.dtype(dtype)
+            count = int(np.prod(shape))
+            values = np.frombuffer(buffer, dtype=dtype, count=count, offset=offset) if count else np.empty(0, dtype=dtype)
+            arrays[name] = values.reshape(shape)
+
+        frame = {column: self._decode_column(arrays.pop("df/" + column), spec) for column, spec in meta["columns"].items()}
+        df = pd.DataFrame(frame, copy=False) if frame else pd.DataFrame()
+        return df, _restore(meta["engine"], arrays), meta["stats"], meta["metadata"], current["version"]
@@ -0,0 +1,106 @@
+import csv
+import io
+import json
+import os
+
+import pyarrow as pa
+
+from excitement_metrics import METRIC_TYPES
+from serialization import GAME_FIELDS
+
+# Rows encoded per chunk of an export stream
+EXPORT_CHUNK_ROWS = int(os.getenv('EXPORT_CHUNK_ROWS', 5000))
+
+# format -> (media type, file extension)
+EXPORT_FORMATS = {
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+    'csv': ('text/csv', 'csv'),
+    'arrow': ('application/vnd.apache.arrow.stream', 'arrows'),
+}
+
+# Arrow types of the Game fields; game_date arrives as YYYY-MM-DD strings
+ARROW_SCHEMA = pa.schema([
+    ('id', pa.int64()),
+    ('game_id', pa.int64()),
+    ('game_date', pa.date32()),
+    ('home_team', pa.string()),
+    ('away_team', pa.string()),
+    ('home_score', pa.int64()),
+    ('away_score', pa.int64()),
+    ('excitement_score', pa.float64()),
+    ('season', pa.int64()),
+    ('highlight_url', pa.string()),
+    ('view_count', pa.int64()),
+    ('normalized_views', pa.float64()),
+] + [(name, {'int': pa.int64(), 'float': pa.float64(), 'bool': pa.bool_()}[kind]) for name, kind in METRIC_TYPES.items()])
+
+
+def row_columns(rows, names):
+    """Game field columns of database rows (tuples of the columns in `names`, shaped
+    by queries.GAME_COLUMNS), with the same conversions as the /games response"""
+    by_name = dict(zip(names, zip(*rows)))
+    columns = [list(by_name[field]) for field in GAME_FIELDS]
+    date_index = GAME_FIELDS.index('game_date')
+    excitement_index = GAME_FIELDS.index('excitement_score')
+    columns[date_index] = [value.isoformat() if value is not None else None for value in columns[date_index]]
+    columns[excitement_index] = [float(value) if value else 0.0 for value in columns[excitement_index]]
+    return columns
+
+
+def _ndjson(chunks):
+    for columns in chunks:
+        yield "".join(json.dumps(dict(zip(GAME_FIELDS, row)), separators=(',', ':')) + "\n" for row in zip(*columns)).encode()
+
+
+def _csv(chunks):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    writer.writerow(GAME_FIELDS)
+    yield _drain(buffer).encode()
+    for columns in chunks:
+        writer.writerows(zip(*columns))
+        yield _drain(buffer).encode()
+
+
+def _arrow_batch(columns):
+    arrays = []
+    for values, field in zip(columns, ARROW_SCHEMA):
+        if field.type == pa.date32():
+            arrays.append(pa.array(values, pa.string()).cast(pa.date32()))
+        else:
+            arrays.append(pa.array(values, field.type))
+    return pa.record_batch(arrays, schema=ARROW_SCHEMA)
+
+
+def _drain(buffer):
+    data = buffer.getvalue()
+    buffer.seek(0)
+    buffer.truncate()
+    return data
+
+
+def _arrow(chunks):
+    # An Arrow IPC stream: the schema, one record batch per chunk, then the end marker
+    buffer = io.BytesIO()
+    with pa.ipc.new_stream(buffer, ARROW_SCHEMA) as writer:
+        yield _drain(buffer)
+        for columns in chunks:
+            writer.write_batch(_arrow_batch(columns))
+            yield _drain(buffer)
+    yield _drain(buffer)
+
+
+ENCODERS = {'ndjson': _ndjson, 'csv': _csv, 'arrow': _arrow}
+
+
+def encode_export(chunks, format):
+    """Encoded pieces of an export, one per chunk of Game field columns (as returned
+    by serialization.game_columns or row_columns). Only one chunk is held at a time."""
+    for data in ENCODERS[format](chunks):
+        if data:
+            yield data
+
+
+def export_headers(format, filename="games"):
+    media_type, extension = EXPORT_FORMATS[format]
+    return media_type, {"Content-Disposition": f'attachment; filename="{filename}.{extension}"'}
@@ -1,19 +1,55 @@
-from fastapi import FastAPI, Query, HTTPException
+from fastapi import FastAPI, Query, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from typing import Optional, List
+from fastapi.responses import Response, StreamingResponse
+from typing import Optional, List, NamedTuple
 import pandas as pd
+import ctypes
 import os
-from pydantic import BaseModel
+import sys
+import threading
+import time
+from pydantic import BaseModel, create_model
 from datetime import date, datetime
+from contextlib import asynccontextmanager
+from functools import lru_cache
 import pickle
 from dotenv import load_dotenv
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, text
 import psycopg2
 
+# game_store.py, highlight_views.py and excitement_metrics.py live at the repository root
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from game_store import GameStore, MANIFEST_NAME
+from highlight_views import HIGHLIGHT_VIEWS_PATH, attach_views
+from query_engine import GameQueryEngine, METRIC_COLUMNS
+from serialization import METRIC_FIELD_TYPES, game_records, game_columns, json_body
+from export import EXPORT_CHUNK_ROWS, EXPORT_FORMATS, encode_export, export_headers
+from response_cache import ResponseCache, normalize_date, normalize_teams
+from rollups import StatsRollups
+from dataset_snapshot import DatasetSnapshot
+from metrics import Metrics, MetricsMiddleware, record_rows, span
+
 # Load environment variables
 load_dotenv()
 
-app = FastAPI(title="MLB Exciting Games API", version="1.0.0")
+DATA_DIR = os.path.join(os.path.dirname(__file__), '..')
+PICKLE_PATH = os.path.join(DATA_DIR, 'all_games_data.pkl')
+CSV_PATH = os.path.join(DATA_DIR, 'all_games_data.csv')
+
+# Seconds between checks for new game data; 0 disables background reloads
+RELOAD_INTERVAL = float(os.getenv('DATA_RELOAD_INTERVAL', 60))
+
+# Set by serve.py for its workers: attach to the dataset snapshot it publishes
+# (at DATASET_SNAPSHOT_PATH) instead of loading and indexing the data in every process
+SNAPSHOT_WORKER = bool(os.getenv('DATASET_SNAPSHOT_WORKER'))
+
+@asynccontextmanager
+async def lifespan(app):
+    reloader.start()
+    yield
+    reloader.stop()
+
+app = FastAPI(title="MLB Exciting Games API", version="1.0.0", lifespan=lifespan)
 
 # Enable CORS
 app.add_middleware(
@@ -24,8 +60,12 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Request latency, per-phase timings and row counts, served on /metrics
+metrics = Metrics()
+app.add_middleware(MetricsMiddleware, metrics=metrics)
+
 # Pydantic models
-class Game(BaseModel):
+class GameFields(BaseModel):
     id: int
     game_id: int
     game_date: date
@@ -36,31 +76,36 @@ class Game(BaseModel):
     excitement_score: float
     season: int
     highlight_url: Optional[str]
+    # Highlight popularity from data_processing.py; None for games without a matched video
+    view_count: Optional[int] = None
+    normalized_views: Optional[float] = None
+
+# One field per registered excitement metric; None for games scored before it was computed
+Game = create_model("Game", __base__=GameFields, **{name: (Optional[kind], None) for name, kind in METRIC_FIELD_TYPES.items()})
 
 class GameResponse(BaseModel):
     games: List[Game]
     total: int
     page: int
     limit: int
+    next_cursor: Optional[str] = None
 
 # Load data
-def load_games_data():
-    """Load games data from PostgreSQL or fall back to CSV/pickle file"""
-    try:
-        # Try to load from PostgreSQL first
-        db_name = os.getenv('DB_NAME')
-        db_user = os.getenv('DB_USER')
-        db_password = os.getenv('DB_PASSWORD')
-        db_host = os.getenv('DB_HOST')
-        db_port = os.getenv('DB_PORT')
-        
-        if all([db_name, db_user, db_password, db_host, db_port]):
-            # Create PostgreSQL connection
-            connection_string = f"postgresql://{db_user}:{db_password}@{db_host}:{db_port}/{db_name}"
-            engine = create_engine(connection_string)
-            
-            # Load data from PostgreSQL
-            query = """
+@lru_cache(maxsize=1)
+def postgres_engine():
+    """SQLAlchemy engine for the games database, or None when it is not configured"""
+    db_name = os.getenv('DB_NAME')
+    db_user = os.getenv('DB_USER')
+    db_password = os.getenv('DB_PASSWORD')
+    db_host = os.getenv('DB_HOST')
+    db_port = os.getenv('DB_PORT')
+    if not all([db_name, db_user, db_password, db_host, db_port]):
+        return None
+    connection_string = f"postgresql://{db_user}:{db_password}@{db_host}:{db_port}/{db_name}"
+    return create_engine(connection_string)
+
+def games_query(where=""):
+    return f"""
             SELECT 
                 id,
                 game_id,
@@ -71,10 +116,44 @@ def load_games_data():
                 away_score,
                 excitement,
                 season,
-                highlight_url
+                highlight_url,
+                {", ".join(METRIC_COLUMNS)},
+                change_version
             FROM games 
+            {where}
             ORDER BY date DESC
             """
+
+def postgres_fingerprint(max_id, change_version):
+    """(max id, max change_version) of the games table: new rows raise the first,
+    rows that bulk_upsert_games changed in place the second"""
+    return int(max_id) if pd.notna(max_id) else 0, int(change_version) if pd.notna(change_version) else 0
+
+def load_changed_games(fingerprint):
+    """Rows added or changed since fingerprint, with their highlight views"""
+    max_id, change_version = fingerprint
+    query = games_query("WHERE id > :max_id OR change_version > :change_version")
+    df = pd.read_sql(text(query), postgres_engine(), params={"max_id": max_id, "change_version": change_version})
+    df['date'] = pd.to_datetime(df['date'])
+    return attach_views(df)
+
+def load_games_data():
+    """Games from load_games_source with view_count and normalized_views joined from
+    highlight_views.csv, whichever source they came from; returns (df, source)"""
+    df, source = load_games_source()
+    return attach_views(df), source
+
+def load_games_source():
+    """Load games data from PostgreSQL or fall back to the game store or CSV/pickle file.
+
+    Returns (df, source), where source is 'postgresql', 'store', 'pickle', 'csv' or None.
+    """
+    try:
+        # Try to load from PostgreSQL first
+        engine = postgres_engine()
+        if engine is not None:
+            # Load data from PostgreSQL
+            query = games_query()
             df = pd.read_sql(query, engine)
             
             # Convert date column to datetime
@@ -82,23 +161,35 @@ def load_games_data():
                 df['date'] = pd.to_datetime(df['date'])
             
             print(f"Loaded {len(df)} games from PostgreSQL database")
-            return df
+            return df, 'postgresql'
             
     except Exception as e:
         print(f"Failed to load from PostgreSQL: {str(e)}")
-        print("Falling back to CSV/pickle file...")
+        print("Falling back to the game store...")
+    
+    # Season-partitioned store from game_store.py: columns are already typed, with
+    # season and date precomputed, and the season files are memory-mapped
+    try:
+        store = GameStore()
+        if store.exists():
+            df = store.read()
+            print(f"Loaded {len(df)} games from the game store")
+            return df, 'store'
+    except Exception as e:
+        print(f"Failed to load from the game store: {str(e)}")
+    print("Falling back to CSV/pickle file...")
     
-    # Fall back to CSV/pickle if PostgreSQL fails
+    # Fall back to CSV/pickle if neither is available
     try:
         # Try to load pickle first (faster)
-        pickle_path = os.path.join(os.path.dirname(__file__), '..', 'all_games_data.pkl')
-        if os.path.exists(pickle_path):
-            with open(pickle_path, 'rb') as f:
+        if os.path.exists(PICKLE_PATH):
+            with open(PICKLE_PATH, 'rb') as f:
                 df = pickle.load(f)
+            source = 'pickle'
         else:
             # Fall back to CSV
-            csv_path = os.path.join(os.path.dirname(__file__), '..', 'all_games_data.csv')
-            df = pd.read_csv(csv_path)
+            df = pd.read_csv(CSV_PATH)
+            source = 'csv'
         
         # Map CSV columns to expected format
         column_mapping = {
@@ -125,6 +216,9 @@ def load_games_data():
             df['away_score'] = None
         if 'highlight_url' not in df.columns:
             df['highlight_url'] = None
+        for column in METRIC_COLUMNS:
+            if column not in df.columns:
+                df[column] = None
         
         # Add an ID column if it doesn't exist
         if 'id' not in df.columns:
@@ -137,152 +231,447 @@ def load_games_data():
             raise ValueError(f"Missing required columns after mapping: {missing_columns}")
             
         print(f"Loaded {len(df)} games from CSV/pickle file")
-        return df
+        return df, source
     except Exception as e:
         print(f"Error loading data: {str(e)}")
-        return pd.DataFrame()
+        return pd.DataFrame(), None
+
+def file_fingerprint(path):
+    if not os.path.exists(path):
+        return None
+    stat = os.stat(path)
+    return (stat.st_mtime_ns, stat.st_size)
+
+def file_fingerprints():
+    """Modification markers for every file-based source"""
+    return {
+        'store': file_fingerprint(os.path.join(GameStore().path, MANIFEST_NAME)),
+        'pickle': file_fingerprint(PICKLE_PATH),
+        'csv': file_fingerprint(CSV_PATH),
+    }
+
+def source_fingerprint(source, fingerprints):
+    """Fingerprint of a file source, or of all of them when there is no source"""
+    if source is None:
+        return tuple(sorted(fingerprints.items()))
+    return fingerprints.get(source)
+
+def process_memory():
+    """Resident and shared (file and shared memory backed) MiB of this process, from
+    /proc on Linux; snapshot pages count as shared in every worker mapping them"""
+    try:
+        with open('/proc/self/status') as f:
+            status = dict(line.split(':', 1) for line in f)
+    except OSError:
+        return {}
+    mib = {name: int(status.get(name, '0 kB').split()[0]) / 1024 for name in ('VmRSS', 'RssFile', 'RssShmem')}
+    return {"rss_mib": round(mib['VmRSS'], 1), "shared_mib": round(mib['RssFile'] + mib['RssShmem'], 1)}
+
+def release_memory():
+    """Return freed heap pages to the OS. glibc keeps the pages of a replaced dataset's
+    arrays for reuse otherwise; a no-op where malloc_trim is unavailable"""
+    try:
+        ctypes.CDLL(None).malloc_trim(0)
+    except (OSError, AttributeError, TypeError):
+        pass
+
+class Dataset(NamedTuple):
+    """A loaded frame with its query indexes and stats rollups, and where and when it came from"""
+    engine: GameQueryEngine
+    stats: StatsRollups
+    version: int
+    source: Optional[str]
+    # postgres_fingerprint for PostgreSQL, file modification marker otherwise; with no source (every
+    # load failed) the markers of all the files, so that one appearing is noticed
+    fingerprint: object
+    loaded_at: datetime
+
+def snapshot_dataset(snapshot):
+    """Dataset over the current version of a DatasetSnapshot, its arrays mapped read-only"""
+    df, engine_state, stats, metadata, version = snapshot.attach()
+    # Version and load time are the writer's, so every worker tags responses alike
+    return Dataset(GameQueryEngine.from_state(df, engine_state), stats, version,
+                   metadata['source'], metadata['fingerprint'], metadata['loaded_at'])
+
+class DatasetReloader:
+    """Owns the current Dataset and swaps in a rebuilt one when the source changes.
+
+    Requests read `dataset` once and use that snapshot throughout. Reloads build the
+    new frame and its indexes on a background thread and publish them with a single
+    assignment, so a request sees either the old dataset or the new one, never a
+    partially built one.
+
+    With a DatasetSnapshot the reloader follows it instead: it attaches to whatever
+    version the snapshot's writer (serve.py) last published. on_publish is called
+    with every dataset this reloader builds itself; a Dataset it returns is held
+    in place of the built one (serve.py returns the snapshot's mapped copy).
+    """
+
+    def __init__(self, interval=RELOAD_INTERVAL, snapshot=None, on_publish=None):
+        self.interval = interval
+        self.snapshot = snapshot
+        self.on_publish = on_publish
+        self.last_error = None
+        self.load_seconds = None
+        self.dataset = None
+        # highlight_views.csv marker as of the last load; it is joined onto every source
+        self.views_fingerprint = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def load(self):
+        """Full load from whichever source load_games_data picks, or from the snapshot"""
+        with self._lock:
+            started = time.perf_counter()
+            if self.snapshot is not None:
+                self._attach()
+            else:
+                self._load()
+            self.load_seconds = time.perf_counter() - started
+
+    def _load(self):
+        """Returns False when the load found the data already served"""
+        # Fingerprints are taken first, so a change made during the load triggers another reload
+        fingerprints = file_fingerprints()
+        views_fingerprint = file_fingerprint(HIGHLIGHT_VIEWS_PATH)
+        df, source = load_games_data()
+        if source == 'postgresql':
+            fingerprint = postgres_fingerprint(df['id'].max(), df['change_version'].max())
+        else:
+            fingerprint = source_fingerprint(source, fingerprints)
+        # A new version drops every cached response, so it is only published for changed data
+        current = self.dataset
+        if current is not None and (current.source, current.fingerprint, self.views_fingerprint) == (source, fingerprint, views_fingerprint):
+            return False
+        self.views_fingerprint = views_fingerprint
+        self._publish(GameQueryEngine(df), StatsRollups.build(df), source, fingerprint)
+        return True
+
+    def _attach(self):
+        self.dataset = snapshot_dataset(self.snapshot)
+
+    def _publish(self, engine, stats, source, fingerprint):
+        version = self.dataset.version + 1 if self.dataset else 1
+        dataset = Dataset(engine, stats, version, source, fingerprint, datetime.now())
+        if self.on_publish is not None:
+            dataset = self.on_publish(dataset) or dataset
+        self.dataset = dataset
+
+    def check(self):
+        """Reload if the source has new data; returns True when a new dataset was published"""
+        with self._lock:
+            current = self.dataset
+            if self.snapshot is not None:
+                if self.snapshot.current_version() in (None, current.version):
+                    return False
+                self._attach()
+                return True
+            if file_fingerprint(HIGHLIGHT_VIEWS_PATH) != self.views_fingerprint:
+                return self._load()
+            if current.source == 'postgresql':
+                with postgres_engine().connect() as conn:
+                    fingerprint = postgres_fingerprint(*conn.execute(text("SELECT MAX(id), MAX(change_version) FROM games")).one())
+                if all(new <= old for new, old in zip(fingerprint, current.fingerprint)):
+                    return False
+                # Only games added or changed since the last load are fetched; indexes are rebuilt
+                # over the result. New games are added to the rollups, while seasons with games
+                # changed in place (e.g. final scores from the nightly re-fetch) are re-aggregated
+                changed = load_changed_games(current.fingerprint)
+                df = current.engine.df
+                replaced = df['game_id'].isin(changed['game_id'])
+                df = pd.concat([df[~replaced], changed], ignore_index=True)
+                if replaced.any():
+                    seasons = set(changed['season'].dropna()) | set(current.engine.df.loc[replaced, 'season'].dropna())
+                    stats = current.stats.rebuild_seasons(df, seasons)
+                else:
+                    stats = current.stats.add(changed)
+                self._publish(GameQueryEngine(df), stats, 'postgresql', fingerprint)
+                print(f"Reloaded {len(changed)} new or changed games from PostgreSQL ({int(replaced.sum())} updated in place)")
+                return True
+            if source_fingerprint(current.source, file_fingerprints()) == current.fingerprint:
+                return False
+            return self._load()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                if self.check():
+                    # The replaced dataset and the reload's temporaries are garbage by now
+                    release_memory()
+                self.last_error = None
+            except Exception as e:
+                self.last_error = str(e)
+                print(f"Failed to reload game data: {str(e)}")
+
+    def start(self):
+        if self.interval <= 0 or self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="dataset-reloader", daemon=True)
+        self._thread.start()
 
-# Global variable to store the loaded data
-games_df = load_games_data()
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+# The loaded data and its query indexes, reloaded in the background when the source changes
+reloader = DatasetReloader(snapshot=DatasetSnapshot() if SNAPSHOT_WORKER else None)
+reloader.load()
+print(f"Process {os.getpid()} loaded dataset v{reloader.dataset.version} in {reloader.load_seconds:.2f}s, {process_memory()}")
+
+# Encoded /games, /seasons, /teams and /stats responses for the current dataset version
+response_cache = ResponseCache()
+
+def collect_metrics():
+    dataset = reloader.dataset
+    yield ("dataset_rows", "gauge", "Games in the served dataset", len(dataset.engine.df))
+    yield ("dataset_version", "gauge", "Version of the served dataset", dataset.version)
+    yield ("dataset_load_seconds", "gauge", "Time this process took to load or attach the dataset", reloader.load_seconds)
+    yield ("dataset_reload_failing", "gauge", "1 while the last background reload failed", int(reloader.last_error is not None))
+    yield from response_cache.metrics()
+    memory = process_memory()
+    if memory:
+        yield ("process_rss_bytes", "gauge", "Resident memory of this process", memory["rss_mib"] * 2**20)
+        yield ("process_shared_bytes", "gauge", "Resident memory shared with other processes, such as snapshot pages", memory["shared_mib"] * 2**20)
+
+metrics.add_collector(collect_metrics)
 
 @app.get("/")
 async def root():
-    return {"message": "MLB Exciting Games API", "total_games": len(games_df)}
+    return {"message": "MLB Exciting Games API", "total_games": len(reloader.dataset.engine.df)}
 
 @app.get("/games", response_model=GameResponse)
 async def get_games(
+    request: Request,
     season: Optional[str] = Query(None, description="Filter by season (year)"),
     limit: int = Query(25, ge=1, le=1000, description="Number of games to return"),
     page: int = Query(1, ge=1, description="Page number"),
-    sort: str = Query("excitement", description="Sort by: excitement, excitement_asc, date, or score_diff"),
+    sort: str = Query("excitement", description=f"Sort by: excitement, excitement_asc, date, score_diff, normalized_views (highlight popularity), or an excitement metric ({', '.join(METRIC_COLUMNS)})"),
     team: Optional[str] = Query(None, description="Filter by team abbreviation (comma-separated for multiple teams)"),
     start: Optional[str] = Query(None, description="Start date (YYYY-MM-DD)"),
-    end: Optional[str] = Query(None, description="End date (YYYY-MM-DD)")
+    end: Optional[str] = Query(None, description="End date (YYYY-MM-DD)"),
+    cursor: Optional[str] = Query(None, description="Opaque cursor from a previous response's next_cursor; takes precedence over page")
 ):
     try:
+        # One snapshot for the whole request, even if a reload lands meanwhile
+        dataset = reloader.dataset
+        query_engine = dataset.engine
+        games_df = query_engine.df
         if games_df.empty:
             raise HTTPException(status_code=500, detail="No game data available")
         
-        # Start with all games
-        filtered_df = games_df.copy()
-        
-        # Apply filters
-        if season:
-            filtered_df = filtered_df[filtered_df['season'] == int(season)]
-        
-        if team:
-            if ',' in team:
-                # Handle multiple teams separated by commas
-                team_list = [t.strip() for t in team.split(',')]
-                # Create explicit boolean masks
-                home_mask = filtered_df['home_team'].isin(team_list)
-                away_mask = filtered_df['away_team'].isin(team_list)
-                combined_mask = home_mask | away_mask
-                filtered_df = filtered_df[combined_mask]
-            else:
-                # Handle single team (original logic)
-                team_upper = team.upper()
-                filtered_df = filtered_df[
-                    (filtered_df['home_team'].str.upper() == team_upper) |
-                    (filtered_df['away_team'].str.upper() == team_upper)
-                ]
-        
-        if start:
-            start_date = pd.to_datetime(start)
-            filtered_df = filtered_df[filtered_df['date'] >= start_date]
+        # Equivalent queries (team order, date spelling) share one cache entry
+        team = normalize_teams(team)
+        start = normalize_date(start)
+        end = normalize_date(end)
+        
+        def build():
+            # Resolve filters, sorting and pagination against the precomputed indexes
+            teams = None
+            if team:
+                teams = team.split(',')
             
-        if end:
-            end_date = pd.to_datetime(end)
-            filtered_df = filtered_df[filtered_df['date'] <= end_date]
-        
-        # Apply sorting
-        if sort == "excitement":
-            filtered_df = filtered_df.sort_values('excitement', ascending=False)
-        elif sort == "excitement_asc":
-            filtered_df = filtered_df.sort_values('excitement', ascending=True)
-        elif sort == "date":
-            filtered_df = filtered_df.sort_values('date', ascending=False)
-        elif sort == "score_diff":
-            # Calculate score difference if scores are available
-            if 'home_score' in filtered_df.columns and 'away_score' in filtered_df.columns:
-                filtered_df['score_diff'] = abs(filtered_df['home_score'].fillna(0) - filtered_df['away_score'].fillna(0))
-                filtered_df = filtered_df.sort_values('score_diff', ascending=False)
-            else:
-                filtered_df = filtered_df.sort_values('excitement', ascending=False)
-        
-        # Get total count before pagination
-        total = len(filtered_df)
-        
-        # Apply pagination
-        offset = (page - 1) * limit
-        paginated_df = filtered_df.iloc[offset:offset + limit]
-        
-        # Convert to Game objects
-        games = []
-        for _, row in paginated_df.iterrows():
-            game = Game(
-                id=int(row['id']) if 'id' in row else int(row.name),
-                game_id=int(row['game_id']),
-                game_date=row['date'].date() if pd.notna(row['date']) else date.today(),
-                home_team=str(row['home_team']),
-                away_team=str(row['away_team']),
-                home_score=int(row['home_score']) if pd.notna(row.get('home_score')) else None,
-                away_score=int(row['away_score']) if pd.notna(row.get('away_score')) else None,
-                excitement_score=float(row['excitement']) if pd.notna(row['excitement']) else 0.0,
-                season=int(row['season']) if pd.notna(row['season']) else 2024,
-                highlight_url=str(row['highlight_url']) if pd.notna(row.get('highlight_url')) else None
-            )
-            games.append(game)
-        
-        return GameResponse(
-            games=games,
-            total=total,
-            page=page,
-            limit=limit
-        )
+            offset = (page - 1) * limit
+            try:
+                rows, total = query_engine.query(
+                    season=season,
+                    teams=teams,
+                    start=start,
+                    end=end,
+                    sort=sort,
+                    offset=offset,
+                    limit=limit,
+                    cursor=cursor
+                )
+            except ValueError as e:
+                if cursor is None:
+                    raise
+                raise HTTPException(status_code=400, detail=str(e))
+            record_rows(total, len(rows))
+            paginated_df = games_df.iloc[rows]
+            
+            # Keyset cursor for the next page, pointing just past the last row returned
+            next_cursor = None
+            if len(rows) == limit and sort in query_engine.orders:
+                next_cursor = query_engine.cursor_for(sort, rows[-1])
+            
+            # Serialize the page column by column; the body matches GameResponse
+            with span("serialize"):
+                return json_body({
+                    "games": game_records(paginated_df),
+                    "total": total,
+                    "page": page,
+                    "limit": limit,
+                    "next_cursor": next_cursor
+                })
+        
+        key = response_cache.make_key("/games", season=season, limit=limit, page=page, sort=sort,
+                                       team=team, start=start, end=end, cursor=cursor)
+        return response_cache.respond(request, key, dataset.version, dataset.loaded_at, build)
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching games: {str(e)}")
 
+@app.get("/games/export")
+async def export_games(
+    season: Optional[str] = Query(None, description="Filter by season (year)"),
+    sort: str = Query("excitement", description="Sort order, as for /games"),
+    team: Optional[str] = Query(None, description="Filter by team abbreviation (comma-separated for multiple teams)"),
+    start: Optional[str] = Query(None, description="Start date (YYYY-MM-DD)"),
+    end: Optional[str] = Query(None, description="End date (YYYY-MM-DD)"),
+    format: str = Query("ndjson", description="ndjson, csv or arrow (Arrow IPC stream)")
+):
+    """Stream every game matching the filters in one response"""
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unknown format {format!r}; expected one of {', '.join(EXPORT_FORMATS)}")
+    try:
+        # The stream reads from this snapshot even if a reload lands meanwhile
+        query_engine = reloader.dataset.engine
+        games_df = query_engine.df
+        teams = team.split(',') if team else None
+        rows = query_engine.filter(season, teams, normalize_date(start), normalize_date(end))
+        
+        def chunks():
+            # Rows are gathered and serialized one chunk at a time, so memory does not grow with the export
+            for chunk_rows in query_engine.iter_rows(sort, rows, EXPORT_CHUNK_ROWS):
+                yield game_columns(games_df.iloc[chunk_rows])
+        
+        media_type, headers = export_headers(format)
+        return StreamingResponse(encode_export(chunks(), format), media_type=media_type, headers=headers)
+        
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error exporting games: {str(e)}")
+
 @app.get("/seasons")
-async def get_seasons():
+async def get_seasons(request: Request):
     """Get list of available seasons"""
     try:
-        if games_df.empty:
-            return {"seasons": []}
+        dataset = reloader.dataset
+        games_df = dataset.engine.df
+        
+        def build():
+            if games_df.empty:
+                return json_body({"seasons": []})
+            seasons = sorted(games_df['season'].dropna().unique().tolist(), reverse=True)
+            return json_body({"seasons": seasons})
         
-        seasons = sorted(games_df['season'].dropna().unique().tolist(), reverse=True)
-        return {"seasons": seasons}
+        return response_cache.respond(request, response_cache.make_key("/seasons"), dataset.version, dataset.loaded_at, build)
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching seasons: {str(e)}")
 
 @app.get("/teams")
-async def get_teams():
+async def get_teams(request: Request):
     """Get list of available teams"""
     try:
-        if games_df.empty:
-            return {"teams": []}
+        dataset = reloader.dataset
+        games_df = dataset.engine.df
         
-        home_teams = games_df['home_team'].dropna().unique()
-        away_teams = games_df['away_team'].dropna().unique()
-        all_teams = sorted(set(list(home_teams) + list(away_teams)))
+        def build():
+            if games_df.empty:
+                return json_body({"teams": []})
+            home_teams = games_df['home_team'].dropna().unique()
+            away_teams = games_df['away_team'].dropna().unique()
+            all_teams = sorted(set(list(home_teams) + list(away_teams)))
+            return json_body({"teams": all_teams})
         
-        return {"teams": all_teams}
+        return response_cache.respond(request, response_cache.make_key("/teams"), dataset.version, dataset.loaded_at, build)
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching teams: {str(e)}")
 
+@app.get("/stats/teams")
+async def get_team_stats(request: Request, season: Optional[int] = Query(None, description="Season; all seasons when omitted")):
+    """Teams ranked by average excitement"""
+    try:
+        dataset = reloader.dataset
+        
+        def build():
+            return json_body({"season": season, "teams": dataset.stats.teams(season)})
+        
+        key = response_cache.make_key("/stats/teams", season=season)
+        return response_cache.respond(request, key, dataset.version, dataset.loaded_at, build)
+        
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error fetching team stats: {str(e)}")
+
+@app.get("/stats/top-teams")
+async def get_top_teams(request: Request):
+    """Most exciting team of each season"""
+    try:
+        dataset = reloader.dataset
+        
+        def build():
+            return json_body({"seasons": dataset.stats.top_teams()})
+        
+        return response_cache.respond(request, response_cache.make_key("/stats/top-teams"), dataset.version, dataset.loaded_at, build)
+        
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error fetching top teams: {str(e)}")
+
+@app.get("/stats/months")
+async def get_month_stats(request: Request, season: Optional[int] = Query(None, description="Season; all seasons when omitted")):
+    """Average excitement by month"""
+    try:
+        dataset = reloader.dataset
+        
+        def build():
+            return json_body({"months": dataset.stats.months_stats(season)})
+        
+        key = response_cache.make_key("/stats/months", season=season)
+        return response_cache.respond(request, key, dataset.version, dataset.loaded_at, build)
+        
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error fetching month stats: {str(e)}")
+
+@app.get("/stats/head-to-head")
+async def get_head_to_head(
+    request: Request,
+    team: str = Query(..., description="Team abbreviation"),
+    opponent: str = Query(..., description="Opponent abbreviation"),
+    season: Optional[int] = Query(None, description="Season; all seasons when omitted")
+):
+    """Excitement of the games between two teams"""
+    try:
+        dataset = reloader.dataset
+        
+        def build():
+            return json_body(dataset.stats.head_to_head(team, opponent, season))
+        
+        # The pair is unordered apart from which team is reported first
+        key = response_cache.make_key("/stats/head-to-head", team=team.strip().upper(), opponent=opponent.strip().upper(), season=season)
+        return response_cache.respond(request, key, dataset.version, dataset.loaded_at, build)
+        
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error fetching head-to-head stats: {str(e)}")
+
+@app.get("/metrics")
+async def get_metrics():
+    """Metrics in the Prometheus text format"""
+    return Response(content=metrics.render(), media_type="text/plain; version=0.0.4")
+
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
+    dataset = reloader.dataset
     return {
         "status": "healthy",
-        "total_games": len(games_df),
-        "data_loaded": not games_df.empty
+        "total_games": len(dataset.engine.df),
+        "data_loaded": not dataset.engine.df.empty,
+        "data_version": dataset.version,
+        "data_source": dataset.source,
+        "last_reload": dataset.loaded_at.isoformat(),
+        "reload_error": reloader.last_error,
+        "process": {"pid": os.getpid(), "snapshot_worker": SNAPSHOT_WORKER, "load_seconds": reloader.load_seconds, **process_memory()},
+        "response_cache": response_cache.stats()
     }
 
 if __name__ == "__main__":
     import uvicorn
-    print(f"Loaded {len(games_df)} games from data file")
+    print(f"Loaded {len(reloader.dataset.engine.df)} games from data file")
     uvicorn.run(app, host="0.0.0.0", port=8000)
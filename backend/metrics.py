@@ -0,0 +1,194 @@
+import bisect
+import contextvars
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# Add a Server-Timing header with each request's phases to every response
+SERVER_TIMING = os.getenv('SERVER_TIMING', '').lower() in ('1', 'true', 'yes')
+
+# Upper bounds in seconds, from sub-millisecond cache hits to slow database queries
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Timings of the request being handled; None outside a request. Handlers running in
+# the threadpool see the same RequestTimings, since the context is copied there.
+_current = contextvars.ContextVar('request_timings', default=None)
+
+
+class RequestTimings:
+    def __init__(self):
+        self.phases = {}
+        self.rows_scanned = 0
+        self.rows_returned = 0
+
+
+def record_phase(phase, seconds):
+    """Add time spent in a phase to the current request; a no-op outside requests"""
+    timings = _current.get()
+    if timings is not None:
+        timings.phases[phase] = timings.phases.get(phase, 0.0) + seconds
+
+
+@contextmanager
+def span(phase):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_phase(phase, time.perf_counter() - started)
+
+
+def record_rows(scanned, returned):
+    """Rows a request examined and rows it returned"""
+    timings = _current.get()
+    if timings is not None:
+        timings.rows_scanned += int(scanned)
+        timings.rows_returned += int(returned)
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for value in labels.values())
+    return "{" + ",".join(f'{name}="{value}"' for name, value in zip(labels, escaped)) + "}"
+
+
+class Histogram:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def lines(self, name, labels):
+        cumulative = 0
+        for bound, count in zip(list(self.buckets) + ["+Inf"], self.counts):
+            cumulative += count
+            yield f"{name}_bucket{_labels({**labels, 'le': bound})} {cumulative}"
+        yield f"{name}_sum{_labels(labels)} {self.sum}"
+        yield f"{name}_count{_labels(labels)} {self.count}"
+
+
+class Metrics:
+    """Request metrics in the Prometheus text format.
+
+    Request latency and per-phase histograms, and request and row counters, are
+    labelled by route (the path template, so /games?page=2 counts as /games).
+    Collectors registered with add_collector report values read at scrape time,
+    such as cache and connection pool statistics.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._requests = {}
+        self._latency = {}
+        self._phases = {}
+        self._rows = {}
+        self._collectors = []
+
+    def add_collector(self, collect):
+        """collect() returns (name, type, help, value) or (name, type, help, labels, value) tuples"""
+        self._collectors.append(collect)
+
+    def observe(self, method, route, status, seconds, timings):
+        with self._lock:
+            key = (method, route, str(status))
+            self._requests[key] = self._requests.get(key, 0) + 1
+            self._latency.setdefault((method, route), Histogram()).observe(seconds)
+            for phase, phase_seconds in timings.phases.items():
+                self._phases.setdefault((route, phase), Histogram()).observe(phase_seconds)
+            if timings.rows_scanned or timings.rows_returned:
+                scanned, returned = self._rows.get(route, (0, 0))
+                self._rows[route] = (scanned + timings.rows_scanned, returned + timings.rows_returned)
+
+    def render(self):
+        lines = []
+        with self._lock:
+            lines += ["# HELP http_requests_total Requests handled, by route and status",
+                      "# TYPE http_requests_total counter"]
+            for (method, route, status), count in sorted(self._requests.items()):
+                lines.append(f"http_requests_total{_labels({'method': method, 'route': route, 'status': status})} {count}")
+            lines += ["# HELP http_request_duration_seconds Time to the start of the response",
+                      "# TYPE http_request_duration_seconds histogram"]
+            for (method, route), histogram in sorted(self._latency.items()):
+                lines += histogram.lines("http_request_duration_seconds", {'method': method, 'route': route})
+            lines += ["# HELP request_phase_duration_seconds Time spent in each phase of a request",
+                      "# TYPE request_phase_duration_seconds histogram"]
+            for (route, phase), histogram in sorted(self._phases.items()):
+                lines += histogram.lines("request_phase_duration_seconds", {'route': route, 'phase': phase})
+            lines += ["# HELP rows_scanned_total Rows examined to answer requests",
+                      "# TYPE rows_scanned_total counter"]
+            lines += [f"rows_scanned_total{_labels({'route': route})} {scanned}" for route, (scanned, _) in sorted(self._rows.items())]
+            lines += ["# HELP rows_returned_total Rows returned in responses",
+                      "# TYPE rows_returned_total counter"]
+            lines += [f"rows_returned_total{_labels({'route': route})} {returned}" for route, (_, returned) in sorted(self._rows.items())]
+
+        described = set()
+        for collect in self._collectors:
+            try:
+                samples = list(collect())
+            except Exception as e:
+                print(f"Failed to collect metrics: {str(e)}")
+                continue
+            for sample in samples:
+                name, kind, help_text, *rest = sample
+                labels, value = rest if len(rest) == 2 else ({}, rest[0])
+                if name not in described:
+                    described.add(name)
+                    lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+                lines.append(f"{name}{_labels(labels)} {float(value) if value is not None else 'NaN'}")
+        return "\n".join(lines) + "\n"
+
+
+class MetricsMiddleware:
+    """ASGI middleware timing each request into a Metrics registry, optionally
+    reporting the request's phases in a Server-Timing header"""
+
+    def __init__(self, app, metrics, server_timing=SERVER_TIMING):
+        self.app = app
+        self.metrics = metrics
+        self.server_timing = server_timing
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        timings = RequestTimings()
+        token = _current.set(timings)
+        started = time.perf_counter()
+        status = 500
+        observed = False
+
+        def finish():
+            nonlocal observed
+            if not observed:
+                observed = True
+                # The router records the matched route in the scope; unmatched paths share one label
+                route = scope.get("route")
+                self.metrics.observe(scope["method"], getattr(route, "path", "unmatched"), status,
+                                     time.perf_counter() - started, timings)
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if self.server_timing:
+                    total = time.perf_counter() - started
+                    entries = [f"{phase};dur={seconds * 1000:.3f}" for phase, seconds in timings.phases.items()]
+                    entries.append(f"total;dur={total * 1000:.3f}")
+                    message = {**message, "headers": list(message.get("headers", [])) + [(b"server-timing", ", ".join(entries).encode())]}
+                # Latency is taken at the start of the response, so streamed bodies do not count
+                finish()
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            finish()
+            _current.reset(token)
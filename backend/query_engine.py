@@ -0,0 +1,271 @@
+import numpy as np
+import pandas as pd
+
+from cursors import encode_cursor, decode_cursor
+from excitement_metrics import METRICS
+from metrics import span
+
+# Per-game excitement metrics stored next to excitement, one per registered metric
+METRIC_COLUMNS = list(METRICS)
+
+# Sort options exposed by /games mapped to (column, descending)
+SORT_KEYS = {
+    "excitement": ("excitement", True),
+    "excitement_asc": ("excitement", False),
+    "date": ("date", True),
+    "score_diff": ("score_diff", True),
+    "normalized_views": ("normalized_views", True),
+}
+SORT_KEYS.update({column: (column, True) for column in METRIC_COLUMNS})
+
+# Below this fraction of the table, candidates are ordered by their precomputed
+# rank; above it, a mask over the full sort order is cheaper
+RANK_SORT_FRACTION = 0.125
+
+# Smallest slice of a sort order scanned at a time when walking a filter mask
+SCAN_CHUNK = 4096
+
+
+class GameQueryEngine:
+    """Precomputed sort orders and column indexes over the loaded games"""
+
+    def __init__(self, df):
+        # Keep rows in date order so season and date filters are contiguous row ranges
+        if not df.empty and not df['date'].is_monotonic_increasing:
+            df = df.sort_values('date', kind='stable').reset_index(drop=True)
+        self.df = df
+        self.size = len(df)
+
+        if df.empty:
+            self.dates = np.array([], dtype='datetime64[ns]')
+            self.ids = np.array([], dtype=np.int64)
+            self.orders = {}
+            self.ranks = {}
+            self.sort_values = {}
+            self.season_ranges = {}
+            self.team_rows = {}
+            return
+
+        self.dates = df['date'].to_numpy(dtype='datetime64[ns]')
+        self.ids = df['id'].to_numpy(dtype=np.int64)
+        sort_columns = {
+            'excitement': df['excitement'].to_numpy(dtype=np.float64),
+            'date': self.dates.astype('datetime64[D]').astype(np.float64),
+            'score_diff': self._score_diff(df),
+            'normalized_views': self._metric(df, 'normalized_views'),
+        }
+        for column in METRIC_COLUMNS:
+            sort_columns[column] = self._metric(df, column)
+
+        # Each order is by sort key, ties broken by ascending id. sort_values keeps the
+        # keys along that order, negated for descending sorts so they always ascend.
+        self.orders = {}
+        self.ranks = {}
+        self.sort_values = {}
+        for sort, (column, descending) in SORT_KEYS.items():
+            keys = -sort_columns[column] if descending else sort_columns[column]
+            order = np.lexsort((self.ids, keys))
+            rank = np.empty(self.size, dtype=np.int64)
+            rank[order] = np.arange(self.size, dtype=np.int64)
+            self.orders[sort] = order
+            self.ranks[sort] = rank
+            self.sort_values[sort] = keys[order]
+
+        # season -> (first row, last row + 1)
+        seasons = df['season'].to_numpy()
+        self.season_ranges = {}
+        for season in pd.unique(seasons):
+            if pd.isna(season):
+                continue
+            rows = np.flatnonzero(seasons == season)
+            self.season_ranges[int(season)] = (int(rows[0]), int(rows[-1]) + 1)
+
+        # team abbreviation (upper case) -> sorted row ids where the team played
+        self.team_rows = {}
+        for column in ('home_team', 'away_team'):
+            codes, uniques = pd.factorize(df[column].astype('string').str.upper())
+            order = np.argsort(codes, kind='stable')
+            bounds = np.searchsorted(codes[order], np.arange(len(uniques) + 1))
+            for i, team in enumerate(uniques):
+                rows = order[bounds[i]:bounds[i + 1]]
+                if team in self.team_rows:
+                    self.team_rows[team] = np.union1d(self.team_rows[team], rows)
+                else:
+                    self.team_rows[team] = rows
+
+    # Everything __init__ builds besides df and size
+    STATE_ATTRIBUTES = ('dates', 'ids', 'orders', 'ranks', 'sort_values', 'season_ranges', 'team_rows')
+
+    def state(self):
+        """The built indexes: arrays, dicts of arrays and the season ranges"""
+        return {name: getattr(self, name) for name in self.STATE_ATTRIBUTES}
+
+    @classmethod
+    def from_state(cls, df, state):
+        """An engine over df using indexes from state() instead of rebuilding them.
+        df must be the engine's own (date-ordered) frame the state was taken from."""
+        engine = cls.__new__(cls)
+        engine.df = df
+        engine.size = len(df)
+        for name in cls.STATE_ATTRIBUTES:
+            setattr(engine, name, state[name])
+        return engine
+
+    @staticmethod
+    def _score_diff(df):
+        home = pd.to_numeric(df['home_score'], errors='coerce').fillna(0).to_numpy(dtype=np.float64)
+        away = pd.to_numeric(df['away_score'], errors='coerce').fillna(0).to_numpy(dtype=np.float64)
+        return np.abs(home - away)
+
+    @staticmethod
+    def _metric(df, column):
+        # Games without the metric (older data) sort last, like NaN excitement
+        if column not in df.columns:
+            return np.full(len(df), np.nan)
+        return pd.to_numeric(df[column], errors='coerce').to_numpy(dtype=np.float64, na_value=np.nan)
+
+    def _row_range(self, season, start, end):
+        lo, hi = 0, self.size
+        if season is not None:
+            lo, hi = self.season_ranges.get(int(season), (0, 0))
+        if start is not None:
+            lo = max(lo, int(np.searchsorted(self.dates, np.datetime64(pd.to_datetime(start), 'ns'), 'left')))
+        if end is not None:
+            hi = min(hi, int(np.searchsorted(self.dates, np.datetime64(pd.to_datetime(end), 'ns'), 'right')))
+        return lo, max(lo, hi)
+
+    def _team_candidates(self, teams, lo, hi):
+        rows = [self.team_rows[t] for t in teams if t in self.team_rows]
+        if not rows:
+            return np.array([], dtype=np.int64)
+        if len(rows) > 1:
+            # Union through a row mask, which keeps the result sorted and deduplicated
+            mask = np.zeros(self.size, dtype=bool)
+            for team_rows in rows:
+                mask[team_rows] = True
+            return np.flatnonzero(mask[lo:hi]) + lo
+        rows = rows[0]
+        # Team rows are sorted, so the row range is a slice
+        return rows[np.searchsorted(rows, lo, 'left'):np.searchsorted(rows, hi, 'left')]
+
+    def filter(self, season=None, teams=None, start=None, end=None):
+        """Return the matching row ids, or None when every row matches"""
+        lo, hi = self._row_range(season, start, end)
+        if teams:
+            return self._team_candidates([t.strip().upper() for t in teams], lo, hi)
+        if lo == 0 and hi == self.size:
+            return None
+        return np.arange(lo, hi, dtype=np.int64)
+
+    def seek(self, sort, key, game_id):
+        """Position in a sort order just past the row with the given (sort key, id)"""
+        descending = SORT_KEYS[sort][1]
+        if key is None:
+            key = np.nan
+        elif descending:
+            key = -float(key)
+        values = self.sort_values[sort]
+        lo = int(np.searchsorted(values, key, 'left'))
+        hi = int(np.searchsorted(values, key, 'right'))
+        if np.isnan(key):
+            hi = self.size
+        # Within equal keys the order is by ascending id
+        return lo + int(np.searchsorted(self.ids[self.orders[sort][lo:hi]], game_id, 'right'))
+
+    def cursor_for(self, sort, row):
+        """Cursor pointing just past the given row id in a sort order"""
+        value = self.sort_values[sort][self.ranks[sort][row]]
+        if np.isnan(value):
+            key = None
+        else:
+            key = -value if SORT_KEYS[sort][1] else value
+            key = float(key)
+        return encode_cursor(sort, key, int(self.ids[row]))
+
+    def _scan(self, order, mask, start, count):
+        # Walk the order in growing chunks until `count` rows pass the mask
+        found = []
+        needed = count
+        chunk = SCAN_CHUNK
+        while needed > 0 and start < len(order):
+            block = order[start:start + chunk]
+            block = block[mask[block]][:needed]
+            found.append(block)
+            needed -= len(block)
+            start += chunk
+            chunk *= 2
+        if not found:
+            return np.array([], dtype=np.int64)
+        return np.concatenate(found)
+
+    def page(self, sort, rows, start, count, seek=0):
+        """Rows at positions [start, start + count) of the filtered sort order,
+        counting only rows at or after position `seek` of the full order"""
+        if sort not in self.orders:
+            ordered = np.arange(self.size, dtype=np.int64) if rows is None else rows
+            return ordered[start:start + count]
+        order = self.orders[sort]
+        if rows is None:
+            return order[seek + start:seek + start + count]
+        if len(rows) < self.size * RANK_SORT_FRACTION:
+            ranks = self.ranks[sort][rows]
+            if seek:
+                keep = ranks >= seek
+                rows, ranks = rows[keep], ranks[keep]
+            end = start + count
+            if end < len(ranks):
+                # Only the first `end` rows are needed, so avoid a full sort
+                keep = np.argpartition(ranks, end - 1)[:end]
+                rows, ranks = rows[keep], ranks[keep]
+            return rows[np.argsort(ranks, kind='stable')][start:end]
+        mask = np.zeros(self.size, dtype=bool)
+        mask[rows] = True
+        return self._scan(order, mask, seek, start + count)[start:]
+
+    def iter_rows(self, sort, rows, chunk_size):
+        """Every filtered row id in sort order, as successive arrays of at most
+        chunk_size rows; beyond a row mask nothing is materialized up front"""
+        if sort not in self.orders:
+            ordered = np.arange(self.size, dtype=np.int64) if rows is None else rows
+            for start in range(0, len(ordered), chunk_size):
+                yield ordered[start:start + chunk_size]
+            return
+        order = self.orders[sort]
+        mask = None
+        if rows is not None:
+            mask = np.zeros(self.size, dtype=bool)
+            mask[rows] = True
+        pending = []
+        pending_count = 0
+        for start in range(0, self.size, chunk_size):
+            block = order[start:start + chunk_size]
+            if mask is not None:
+                block = block[mask[block]]
+            pending.append(block)
+            pending_count += len(block)
+            # Sparse filters pass few rows per block, so blocks are gathered into full chunks
+            if pending_count >= chunk_size:
+                block = np.concatenate(pending)
+                yield block[:chunk_size]
+                pending = [block[chunk_size:]]
+                pending_count = len(pending[0])
+        if pending_count:
+            yield np.concatenate(pending)
+
+    def query(self, season=None, teams=None, start=None, end=None, sort="excitement", offset=0, limit=25, cursor=None):
+        """Return (row ids for the requested page, total matching rows).
+
+        With a cursor the page starts just after the row it encodes and `offset`
+        is ignored, so deep pages cost the same as the first one.
+        """
+        with span("filter"):
+            rows = self.filter(season, teams, start, end)
+        total = self.size if rows is None else len(rows)
+        # Sorting and paginating are one step: the page is cut from the precomputed order
+        with span("sort"):
+            if cursor is not None:
+                cursor_sort, key, game_id = decode_cursor(cursor)
+                if cursor_sort != sort or sort not in self.orders:
+                    raise ValueError("Cursor does not match the requested sort")
+                return self.page(sort, rows, 0, limit, seek=self.seek(sort, key, game_id)), total
+            return self.page(sort, rows, offset, limit), total
@@ -0,0 +1,134 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime, timezone
+from email.utils import format_datetime
+from typing import NamedTuple
+
+from fastapi.responses import Response
+
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv('RESPONSE_CACHE_MAX_ENTRIES', 1024))
+RESPONSE_CACHE_MAX_BYTES = int(os.getenv('RESPONSE_CACHE_MAX_BYTES', 64 * 2**20))
+
+
+class CachedBody(NamedTuple):
+    body: bytes
+    etag: str
+    last_modified: str
+
+
+def normalize_teams(team):
+    """Comma-separated teams, upper-cased and in a canonical order, as the filter
+    matches them (see GameQueryEngine.filter)"""
+    if team is None:
+        return None
+    return ",".join(sorted({t.strip().upper() for t in team.split(',') if t.strip()}))
+
+
+def normalize_date(value):
+    """YYYY-MM-DD for any Y-M-D spelling (e.g. 2024-4-5); anything else is left as is"""
+    if value is None:
+        return None
+    try:
+        return datetime.strptime(value.strip(), '%Y-%m-%d').date().isoformat()
+    except ValueError:
+        return value
+
+
+def http_date(moment):
+    # Naive datetimes are taken as local time
+    return format_datetime(moment.astimezone(timezone.utc), usegmt=True)
+
+
+class ResponseCache:
+    """LRU cache of encoded JSON bodies keyed by endpoint and normalized query parameters.
+
+    Entries belong to one data version: the first lookup under a new version drops
+    everything cached for the old one. Bounded by entry count and by total bytes.
+    """
+
+    def __init__(self, max_entries=RESPONSE_CACHE_MAX_ENTRIES, max_bytes=RESPONSE_CACHE_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.version = None
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(endpoint, **params):
+        return (endpoint,) + tuple(sorted((name, value) for name, value in params.items() if value is not None))
+
+    def _check_version(self, version):
+        if version != self.version:
+            self._entries.clear()
+            self._bytes = 0
+            self.version = version
+
+    def get(self, key, version):
+        with self._lock:
+            self._check_version(version)
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key, version, body, last_modified):
+        entry = CachedBody(body, '"' + hashlib.blake2b(body, digest_size=12).hexdigest() + '"', http_date(last_modified))
+        with self._lock:
+            self._check_version(version)
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= len(previous.body)
+            self._entries[key] = entry
+            self._bytes += len(body)
+            while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= len(evicted.body)
+        return entry
+
+    def respond(self, request, key, version, last_modified, build):
+        """Response for key: 304 when the client's If-None-Match matches, otherwise
+        the cached body, calling build() for the encoded body on a miss"""
+        entry = self.get(key, version)
+        cache_status = "HIT"
+        if entry is None:
+            entry = self.put(key, version, build(), last_modified)
+            cache_status = "MISS"
+        # no-cache: clients may keep the body but must revalidate, so a reload shows up at once
+        headers = {"ETag": entry.etag, "Last-Modified": entry.last_modified, "Cache-Control": "no-cache", "X-Cache": cache_status}
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match and (if_none_match.strip() == "*" or entry.etag in [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]):
+            with self._lock:
+                self.not_modified += 1
+            return Response(status_code=304, headers=headers)
+        return Response(content=entry.body, media_type="application/json", headers=headers)
+
+    def metrics(self):
+        """Samples for Metrics.add_collector"""
+        stats = self.stats()
+        yield ("response_cache_hits_total", "counter", "Responses served from the cache", stats["hits"])
+        yield ("response_cache_misses_total", "counter", "Responses built because they were not cached", stats["misses"])
+        yield ("response_cache_not_modified_total", "counter", "304 responses to matching If-None-Match headers", stats["not_modified"])
+        yield ("response_cache_hit_ratio", "gauge", "Hits over all cache lookups", stats["hit_ratio"])
+        yield ("response_cache_entries", "gauge", "Cached responses", stats["entries"])
+        yield ("response_cache_bytes", "gauge", "Size of the cached bodies", stats["bytes"])
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "not_modified": self.not_modified,
+                "hit_ratio": self.hits / total if total else 0.0,
+            }
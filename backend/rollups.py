@@ -0,0 +1,157 @@
+import numpy as np
+import pandas as pd
+
+# Sums kept per rollup key; averages are derived from them when serving
+SUM_COLUMNS = ['games', 'excitement_games', 'excitement_sum']
+
+
+def _sums(frame, keys):
+    grouped = frame.groupby(keys, sort=True)
+    return pd.DataFrame({
+        'games': grouped.size(),
+        'excitement_games': grouped['excitement'].count(),
+        'excitement_sum': grouped['excitement'].sum(),
+    })
+
+
+def _average(row):
+    return row['excitement_sum'] / row['excitement_games'] if row['excitement_games'] else None
+
+
+class StatsRollups:
+    """Per-season sums behind the /stats endpoints.
+
+    team_seasons is keyed by (season, team), counting each game for both teams;
+    months by (season, month); matchups by (team_a, team_b, season) with the two
+    teams in alphabetical order. The tables hold a few thousand rows, so serving an
+    aggregate is an index lookup rather than a scan of every game, and adding games
+    aggregates only the new rows and merges them in.
+    """
+
+    def __init__(self, team_seasons, months, matchups):
+        self.team_seasons = team_seasons
+        self.months = months
+        self.matchups = matchups
+
+    @staticmethod
+    def _aggregate(df):
+        if df.empty or 'season' not in df.columns:
+            empty = pd.DataFrame(columns=SUM_COLUMNS)
+            return empty, empty, empty
+        season = pd.to_numeric(df['season'], errors='coerce')
+        home = df['home_team'].astype('string').str.upper().to_numpy(dtype=object, na_value=None)
+        away = df['away_team'].astype('string').str.upper().to_numpy(dtype=object, na_value=None)
+        dates = pd.to_datetime(df['date'])
+        games = pd.DataFrame({
+            'season': season.to_numpy(),
+            'month': dates.dt.month.to_numpy(),
+            'home': home,
+            'away': away,
+            'excitement': pd.to_numeric(df['excitement'], errors='coerce').to_numpy(dtype=np.float64, na_value=np.nan),
+        }).dropna(subset=['season', 'home', 'away'])
+        games['season'] = games['season'].astype(np.int64)
+
+        appearances = pd.concat([
+            games[['season', 'home', 'excitement']].rename(columns={'home': 'team'}),
+            games[['season', 'away', 'excitement']].rename(columns={'away': 'team'}),
+        ])
+        pairs = games.assign(
+            team_a=np.where(games['home'] <= games['away'], games['home'], games['away']),
+            team_b=np.where(games['home'] <= games['away'], games['away'], games['home']),
+        )
+        return (
+            _sums(appearances, ['season', 'team']),
+            _sums(games.dropna(subset=['month']).astype({'month': np.int64}), ['season', 'month']),
+            _sums(pairs, ['team_a', 'team_b', 'season']),
+        )
+
+    @classmethod
+    def build(cls, df):
+        return cls(*cls._aggregate(df))
+
+    def add(self, df):
+        """New rollups with the games in df added; self is left unchanged"""
+        merged = []
+        for current, new in zip((self.team_seasons, self.months, self.matchups), self._aggregate(df)):
+            if new.empty:
+                merged.append(current)
+            elif current.empty:
+                merged.append(new)
+            else:
+                merged.append(pd.concat([current, new]).groupby(level=list(range(current.index.nlevels)), sort=True).sum())
+        return StatsRollups(*merged)
+
+    def rebuild_seasons(self, df, seasons):
+        """New rollups with the given seasons re-aggregated from df, the full frame; for
+        games changed in place, whose old values cannot be subtracted out"""
+        seasons = [int(season) for season in seasons]
+        season_values = pd.to_numeric(df['season'], errors='coerce')
+        rebuilt = []
+        for current, new in zip((self.team_seasons, self.months, self.matchups), self._aggregate(df[season_values.isin(seasons)])):
+            if not current.empty:
+                current = current[~current.index.get_level_values('season').isin(seasons)]
+            if new.empty:
+                rebuilt.append(current)
+            elif current.empty:
+                rebuilt.append(new)
+            else:
+                rebuilt.append(pd.concat([current, new]).sort_index())
+        return StatsRollups(*rebuilt)
+
+    def teams(self, season=None):
+        """Teams by average excitement, for one season or across all of them"""
+        if self.team_seasons.empty:
+            return []
+        if season is None:
+            sums = self.team_seasons.groupby(level='team').sum()
+        elif int(season) in self.team_seasons.index.get_level_values('season'):
+            sums = self.team_seasons.xs(int(season), level='season')
+        else:
+            return []
+        records = [dict(team=team, games=int(row['games']), avg_excitement=_average(row), total_excitement=float(row['excitement_sum']))
+                   for team, row in zip(sums.index, sums.to_dict('records'))]
+        return sorted(records, key=lambda r: (r['avg_excitement'] is None, -(r['avg_excitement'] or 0), r['team']))
+
+    def top_teams(self):
+        """The most exciting team of each season, newest season first"""
+        if self.team_seasons.empty:
+            return []
+        sums = self.team_seasons.reset_index()
+        sums = sums[sums['excitement_games'] > 0].assign(avg_excitement=lambda s: s['excitement_sum'] / s['excitement_games'])
+        best = sums.sort_values(['season', 'avg_excitement', 'team'], ascending=[False, False, True]).drop_duplicates('season')
+        return [dict(season=int(row['season']), team=row['team'], games=int(row['games']), avg_excitement=float(row['avg_excitement']))
+                for row in best.to_dict('records')]
+
+    def months_stats(self, season=None):
+        """Average excitement by calendar month, in date order"""
+        sums = self.months
+        if sums.empty:
+            return []
+        if season is not None:
+            if int(season) not in sums.index.get_level_values('season'):
+                return []
+            sums = sums.xs(int(season), level='season', drop_level=False)
+        return [dict(month=f"{season_:04d}-{month:02d}", games=int(row['games']), avg_excitement=_average(row))
+                for (season_, month), row in zip(sums.index, sums.to_dict('records'))]
+
+    def head_to_head(self, team, opponent, season=None):
+        """Games between two teams (either side at home), in total and by season"""
+        team_a, team_b = sorted([team.strip().upper(), opponent.strip().upper()])
+        try:
+            # Leading levels of the sorted index: a slice, not a scan
+            sums = self.matchups.loc[(team_a, team_b)]
+        except KeyError:
+            sums = pd.DataFrame(columns=SUM_COLUMNS)
+        if season is not None:
+            sums = sums[sums.index == int(season)]
+        by_season = [dict(season=int(key), games=int(row['games']), avg_excitement=_average(row))
+                     for key, row in zip(sums.index, sums.to_dict('records'))]
+        total = sums[SUM_COLUMNS].sum() if not sums.empty else pd.Series(0, index=SUM_COLUMNS)
+        return {
+            "team": team.strip().upper(),
+            "opponent": opponent.strip().upper(),
+            "games": int(total['games']),
+            "avg_excitement": _average(total),
+            "total_excitement": float(total['excitement_sum']),
+            "seasons": sorted(by_season, key=lambda r: r['season'], reverse=True),
+        }
@@ -0,0 +1,103 @@
+import json
+from datetime import date
+
+import numpy as np
+import pandas as pd
+from fastapi.responses import Response
+
+from excitement_metrics import METRIC_TYPES
+
+# Field order of the Game model in main.py: the game, then one field per registered metric
+GAME_FIELDS = [
+    'id', 'game_id', 'game_date', 'home_team', 'away_team',
+    'home_score', 'away_score', 'excitement_score', 'season', 'highlight_url',
+    'view_count', 'normalized_views',
+] + list(METRIC_TYPES)
+
+# Python types of the metric fields, by registered value type
+METRIC_FIELD_TYPES = {name: {'int': int, 'float': float, 'bool': bool}[kind] for name, kind in METRIC_TYPES.items()}
+
+
+def _numbers(series):
+    """float64 values with NaN for anything missing or non-numeric"""
+    # Numeric columns skip to_numeric, whose per-call overhead dominates small pages
+    if series.dtype.kind in 'biuf':
+        return series.to_numpy(dtype=np.float64, na_value=np.nan)
+    return pd.to_numeric(series, errors='coerce').to_numpy(dtype=np.float64, na_value=np.nan)
+
+
+def _ints(series, default=None):
+    values = _numbers(series)
+    missing = np.isnan(values)
+    ints = np.where(missing, 0, values).astype(np.int64).tolist()
+    return [default if m else v for v, m in zip(ints, missing.tolist())]
+
+
+def _floats(series, default=0.0):
+    values = _numbers(series)
+    missing = np.isnan(values)
+    if default is None:
+        return [None if m else v for v, m in zip(values.tolist(), missing.tolist())]
+    return np.where(missing, default, values).tolist()
+
+
+def _bools(series):
+    values = _numbers(series)
+    missing = np.isnan(values).tolist()
+    return [None if m else v for v, m in zip((values != 0).tolist(), missing)]
+
+
+def _strings(series):
+    missing = series.isna().to_numpy().tolist()
+    return [None if m else str(v) for v, m in zip(series.tolist(), missing)]
+
+
+def _dates(series):
+    if series.dtype.kind != 'M':
+        series = pd.to_datetime(series)
+    days = series.to_numpy(dtype='datetime64[D]')
+    dates = np.datetime_as_string(days).tolist()
+    today = date.today().isoformat()
+    return [today if m else d for d, m in zip(dates, np.isnat(days).tolist())]
+
+
+# Converters of the metric columns, by registered value type; missing values stay None
+METRIC_CONVERTERS = {
+    'int': _ints,
+    'float': lambda series: _floats(series, default=None),
+    'bool': _bools,
+}
+
+
+def game_columns(df):
+    """Game field values of a frame of games, one list per field in GAME_FIELDS order"""
+    return [
+        _ints(df['id']),
+        _ints(df['game_id']),
+        _dates(df['date']),
+        _strings(df['home_team']),
+        _strings(df['away_team']),
+        _ints(df['home_score']),
+        _ints(df['away_score']),
+        _floats(df['excitement']),
+        _ints(df['season'], default=2024),
+        _strings(df['highlight_url']),
+        _ints(df['view_count']),
+        _floats(df['normalized_views'], default=None),
+    ] + [METRIC_CONVERTERS[kind](df[name]) for name, kind in METRIC_TYPES.items()]
+
+
+def game_records(df):
+    """Convert a page of games to Game-shaped dicts one column at a time"""
+    if df.empty:
+        return []
+    return [dict(zip(GAME_FIELDS, row)) for row in zip(*game_columns(df))]
+
+
+def json_body(payload):
+    return json.dumps(payload, separators=(',', ':')).encode()
+
+
+def json_response(payload):
+    """Encode an already-serializable payload, bypassing response_model validation"""
+    return Response(content=json_body(payload), media_type="application/json")
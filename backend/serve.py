@@ -0,0 +1,53 @@
+"""Run the pandas backend in several worker processes sharing one copy of the dataset.
+
+This process loads the games and builds their indexes and rollups once, writes
+them to a DatasetSnapshot (shared memory by default) and keeps reloading from
+the source, publishing a new snapshot version on every change. The uvicorn
+workers attach to the snapshot read-only and follow its versions, so each one
+starts in a fraction of a second and adds little memory beyond the interpreter.
+
+    python serve.py [workers]       # WEB_CONCURRENCY or the CPU count by default
+"""
+import os
+import sys
+import time
+
+import uvicorn
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def main():
+    workers = int(sys.argv[1]) if len(sys.argv) > 1 else int(os.getenv('WEB_CONCURRENCY', os.cpu_count() or 1))
+    sys.path.insert(0, BACKEND_DIR)
+    # This import loads the data from its source (the workers flag is not set yet)
+    import main as backend
+    from dataset_snapshot import DatasetSnapshot
+
+    snapshot = DatasetSnapshot()
+
+    def write_snapshot(dataset):
+        started = time.perf_counter()
+        metadata = {"source": dataset.source, "fingerprint": dataset.fingerprint, "loaded_at": dataset.loaded_at}
+        version = snapshot.write(dataset.engine.df, dataset.engine.state(), dataset.stats, metadata)
+        print(f"Published dataset snapshot v{version} ({len(dataset.engine.df)} games) to {snapshot.path} in {time.perf_counter() - started:.2f}s")
+        # From here on this process reloads from the mapped copy as well, so the frame
+        # and indexes it built are freed and only the shared snapshot stays resident
+        return backend.snapshot_dataset(snapshot)
+
+    backend.reloader.dataset = write_snapshot(backend.reloader.dataset)
+    backend.release_memory()
+    print(f"Process {os.getpid()} serves snapshot v{backend.reloader.dataset.version}, {backend.process_memory()}")
+    backend.reloader.on_publish = write_snapshot
+    backend.reloader.start()
+
+    os.environ['DATASET_SNAPSHOT_WORKER'] = "1"
+    os.environ['DATASET_SNAPSHOT_PATH'] = snapshot.path
+    try:
+        uvicorn.run("main:app", app_dir=BACKEND_DIR, host=os.getenv('HOST', "0.0.0.0"), port=int(os.getenv('PORT', 8000)), workers=workers)
+    finally:
+        backend.reloader.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from excitement_metrics import METRICS
+from mlb_stats_api import project_pitch_data, aggregate_game_excitement
+
+PITCHES_PER_GAME = 290
+# Roughly the width of a Statcast pitch frame
+EXTRA_NUMERIC_COLUMNS = 70
+EXTRA_TEXT_COLUMNS = 15
+TEAMS = ['ARI', 'ATL', 'BAL', 'BOS', 'CHC', 'CWS', 'CIN', 'CLE', 'COL', 'DET', 'HOU', 'KC', 'LAA', 'LAD', 'MIA',
+         'MIL', 'MIN', 'NYM', 'NYY', 'OAK', 'PHI', 'PIT', 'SD', 'SEA', 'SF', 'STL', 'TB', 'TEX', 'TOR', 'WSH']
+
+
+def synthetic_pitch_data(games, seed=0):
+    """Statcast-shaped pitch frame with `games` games of PITCHES_PER_GAME pitches"""
+    rng = np.random.default_rng(seed)
+    rows = games * PITCHES_PER_GAME
+    game_index = np.repeat(np.arange(games), PITCHES_PER_GAME)
+    home = rng.integers(0, len(TEAMS), games)
+    away = (home + rng.integers(1, len(TEAMS), games)) % len(TEAMS)
+    data = {
+        'game_pk': 700000 + game_index,
+        'game_date': pd.Timestamp('2023-03-30') + pd.to_timedelta(game_index // 15, unit='D'),
+        'home_team': np.array(TEAMS, dtype=object)[home][game_index],
+        'away_team': np.array(TEAMS, dtype=object)[away][game_index],
+        'delta_home_win_exp': rng.normal(0, 0.03, rows).round(3),
+    }
+    # Game state: nine innings of alternating halves, runs scoring on ~1% of pitches
+    pitch = np.tile(np.arange(PITCHES_PER_GAME), games)
+    half = pitch * 18 // PITCHES_PER_GAME
+    bottom = half % 2 == 1
+    runs = (rng.random(rows) < 0.01).astype(np.int64)
+    post_home = np.where(bottom, runs, 0).reshape(games, -1).cumsum(axis=1).ravel()
+    post_away = np.where(bottom, 0, runs).reshape(games, -1).cumsum(axis=1).ravel()
+    data.update({
+        'inning': half // 2 + 1,
+        'inning_topbot': np.where(bottom, 'Bot', 'Top').astype(object),
+        'at_bat_number': pitch // 4 + 1,
+        'pitch_number': pitch % 4 + 1,
+        'home_score': post_home - np.where(bottom, runs, 0),
+        'away_score': post_away - np.where(bottom, 0, runs),
+        'post_home_score': post_home,
+        'post_away_score': post_away,
+    })
+    for i in range(EXTRA_NUMERIC_COLUMNS):
+        data[f'num_{i}'] = rng.random(rows)
+    for i in range(EXTRA_TEXT_COLUMNS):
+        data[f'text_{i}'] = np.array(['FF', 'SL', 'CH', 'CU'], dtype=object)[rng.integers(0, 4, rows)]
+    # Statcast returns the most recent pitch first
+    return pd.DataFrame(data).iloc[::-1].reset_index(drop=True)
+
+
+def groupby_aggregation(pitch_data):
+    """Previous path: Python-level abs, then a dict-based groupby().agg"""
+    pitch_data = pitch_data.copy()
+    pitch_data['delta_home_win_exp'] = pitch_data["delta_home_win_exp"].apply(lambda x: abs(x))
+    pitch_data = pitch_data[['game_pk','game_date','home_team','away_team','delta_home_win_exp']].groupby("game_pk")
+    return pitch_data.agg({'game_date': 'first',
+                           'home_team': 'first',
+                           'away_team': 'first',
+                           'delta_home_win_exp': 'sum'}).sort_values(by='delta_home_win_exp',ascending=False).reset_index()
+
+
+def segment_aggregation(pitch_data):
+    """Current path: early projection to compact dtypes, then sorted-segment reductions
+    for the excitement sum and every registered metric"""
+    return aggregate_game_excitement(project_pitch_data(pitch_data))
+
+
+def segment_excitement_only(pitch_data):
+    """Current path with no metrics registered, for the cost of the metrics themselves"""
+    return aggregate_game_excitement(project_pitch_data(pitch_data), metrics={})
+
+
+def measure(func, pitch_data):
+    # Timed and memory-traced in separate runs, since tracing slows allocation-heavy code
+    start = time.perf_counter()
+    result = func(pitch_data)
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    func(pitch_data)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, elapsed, peak / 2 ** 20
+
+
+def main():
+    for label, games in [("one week", 105), ("one season", 2430)]:
+        pitch_data = synthetic_pitch_data(games)
+        print(f"{label}: {len(pitch_data)} pitches, {pitch_data.memory_usage(deep=True).sum() / 2 ** 20:.0f} MB frame")
+        old, old_time, old_peak = measure(groupby_aggregation, pitch_data)
+        _, sum_time, sum_peak = measure(segment_excitement_only, pitch_data)
+        new, new_time, new_peak = measure(segment_aggregation, pitch_data)
+        same = np.allclose(old.set_index('game_pk')['delta_home_win_exp'].sort_index(),
+                           new.set_index('game_pk')['delta_home_win_exp'].sort_index(), atol=1e-6)
+        print(f"  {'groupby':28} {old_time * 1000:8.1f} ms  peak {old_peak:7.1f} MB")
+        print(f"  {'segments, excitement only':28} {sum_time * 1000:8.1f} ms  peak {sum_peak:7.1f} MB")
+        print(f"  {f'segments, {len(METRICS)} metrics':28} {new_time * 1000:8.1f} ms  peak {new_peak:7.1f} MB  (matches: {same})")
+
+
+if __name__ == "__main__":
+    main()
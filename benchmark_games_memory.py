@@ -0,0 +1,87 @@
+import gc
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+from data_scraping import Game, games_from_frame, games_to_frame, parse_videos
+
+VIDEOS = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+TEAMS = ['Yankees', 'Red Sox', 'Dodgers', 'Giants', 'Cubs', 'Cardinals', "A's", 'D-backs', 'Mariners', 'Astros']
+
+
+class DictGame:
+    """The previous Game: a __dict__ per instance, with fields added by setters"""
+
+    def __init__(self, home_team, away_team, date, view_count, is_double_header):
+        self.home_team = home_team
+        self.away_team = away_team
+        self.date = date
+        self.view_count = view_count
+        self.is_double_header = is_double_header
+
+
+def synthetic_playlist(n, seed=0):
+    """(video_id, title, view_count) in the highlight playlist's title format"""
+    rng = np.random.default_rng(seed)
+    views = rng.integers(1_000, 2_000_000, n).tolist()
+    for i in range(n):
+        away, home = TEAMS[i % len(TEAMS)], TEAMS[(i * 7 + 3) % len(TEAMS)]
+        game = f" Game {i % 2 + 1}" if i % 40 == 0 else ""
+        yield f"vid{i:08d}", f"{away} vs. {home}{game} Highlights ({i % 12 + 1}/{i % 28 + 1}/{i % 10 + 15})", views[i]
+
+
+def to_dict_game(game):
+    # Fill in the fields the old pipeline set later, as data_processing.py did
+    legacy = DictGame(game.home_team, game.away_team, game.date, game.view_count, game.is_double_header)
+    if game.is_double_header:
+        legacy.game_num = game.game_num
+    legacy.video_id = game.video_id
+    legacy.home_id = 1
+    legacy.away_id = 2
+    legacy.expected_views = 1.0
+    legacy.normalized_views = 0.5
+    return legacy
+
+
+def traced_mib(build):
+    """MiB still allocated by build() once it returns"""
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del result
+    return size / 2**20
+
+
+def timed(build):
+    # Timed separately: tracing slows allocation-heavy code several times over
+    start = time.perf_counter()
+    result = build()
+    return result, time.perf_counter() - start
+
+
+def main():
+    games = list(parse_videos(synthetic_playlist(VIDEOS)))
+    for game in games:
+        game.home_id, game.away_id, game.expected_views, game.normalized_views = 1, 2, 1.0, 0.5
+
+    # Only the records themselves are counted: strings and numbers are shared with `games`
+    legacy_mib = traced_mib(lambda: [to_dict_game(game) for game in games])
+    slotted_mib = traced_mib(lambda: [Game(*(getattr(game, field) for field in Game.__slots__)) for game in games])
+    frame_mib = traced_mib(lambda: games_to_frame(games))
+    frame, to_frame_s = timed(lambda: games_to_frame(games))
+    _, from_frame_s = timed(lambda: games_from_frame(frame))
+
+    print(f"{len(games)} games")
+    print(f"{'layout':<24} {'MiB':>8} {'bytes/game':>11}")
+    for label, mib in [("dict Game", legacy_mib), ("slotted Game", slotted_mib), ("DataFrame columns", frame_mib)]:
+        print(f"{label:<24} {mib:>8.1f} {mib * 2**20 / len(games):>11.0f}")
+    print(f"games_to_frame {to_frame_s:.2f}s, games_from_frame {from_frame_s:.2f}s")
+    print(f"DataFrame deep memory_usage {frame.memory_usage(deep=True).sum() / 2**20:.1f} MiB")
+
+
+if __name__ == "__main__":
+    main()
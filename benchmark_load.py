@@ -0,0 +1,55 @@
+import os
+import statistics
+import tempfile
+import time
+
+import pandas as pd
+
+from game_store import GameStore, convert_csv
+
+CSV_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'all_games_data.csv')
+REPEATS = 10
+
+
+def csv_load(path):
+    """The backend's CSV fallback: parse, rename, convert dates and derive season"""
+    df = pd.read_csv(path)
+    df = df.rename(columns={'game_pk': 'game_id', 'game_date': 'date', 'delta_home_win_exp': 'excitement'})
+    df['date'] = pd.to_datetime(df['date'])
+    df['season'] = df['date'].dt.year
+    df['id'] = range(1, len(df) + 1)
+    return df
+
+
+def time_load(func, *args):
+    times = []
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        df = func(*args)
+        times.append(time.perf_counter() - start)
+    return len(df), statistics.median(times) * 1000
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        pickle_path = os.path.join(tmp, 'all_games_data.pkl')
+        csv_load(CSV_PATH).to_pickle(pickle_path)
+        store = GameStore(os.path.join(tmp, 'games_store'))
+        start = time.perf_counter()
+        convert_csv(CSV_PATH, store.path)
+        print(f"Converted {CSV_PATH} in {(time.perf_counter() - start) * 1000:.0f} ms")
+        season = store.seasons()[-1]
+
+        print(f"{'source':<28} {'rows':>8} {'median ms':>10}")
+        for label, func, args in [
+            ("csv", csv_load, (CSV_PATH,)),
+            ("pickle", pd.read_pickle, (pickle_path,)),
+            ("store, all seasons", store.read, ()),
+            (f"store, season {season}", store.read, ([season],)),
+        ]:
+            rows, ms = time_load(func, *args)
+            print(f"{label:<28} {rows:>8} {ms:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
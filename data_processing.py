@@ -1,63 +1,132 @@
+import os
+import sys
+
 import pandas as pd
 import numpy as np
-from mlb_stats_api import teamIds
-from data_scraping import game_info
-
-cleaned_game_list = []
-
-for game in game_info:
-    if game.home_team in teamIds:
-        game.set_home_id(teamIds[game.home_team])
-    elif game.home_team == "A's":
-        game.set_home_id(teamIds['Athletics'])
-    elif game.home_team == "D-Backs" or game.home_team == "Diamondbacks":
-        game.set_home_id(teamIds["D-backs"])
-    else:
-        game.set_home_id(None)
-
-    if game.away_team in teamIds:
-        game.set_away_id(teamIds[game.away_team])
-    elif game.away_team == "A's":
-        game.set_away_id(teamIds['Athletics'])
-    elif game.away_team == "D-Backs" or game.away_team == "Diamondbacks":
-        game.set_away_id(teamIds["D-backs"])
-    else:
-        game.set_away_id(None)
-    
-    if game.home_id is not None and game.away_id is not None and game.date is not None and game.view_count:
-        cleaned_game_list.append(game)
-    
-team_views = {}
-team_games = {}
-
-for game in cleaned_game_list:
-    if game.home_id in team_views:
-        team_views[game.home_id] = team_views[game.home_id] + game.view_count
-        team_games[game.home_id] = team_games[game.home_id] + 1
-    else:
-        team_views[game.home_id] = game.view_count
-        team_games[game.home_id] = 1
-    
-    if game.away_id in team_views:
-        team_views[game.away_id] = team_views[game.away_id] + game.view_count
-        team_games[game.away_id] = team_games[game.away_id] + 1
-    else:
-        team_views[game.away_id] = game.view_count
-        team_games[game.away_id] = 1
+from team_registry import get_team_registry
+from data_scraping import iter_games, games_to_frame, load_seen_ids, save_seen_ids
+from highlight_views import HIGHLIGHT_VIEWS_PATH
+HIGHLIGHT_VIEWS_COLUMNS = ['game_pk', 'video_id', 'view_count', 'expected_views', 'normalized_views']
+# Ids of the playlist videos already matched to a game, for --incremental runs
+SEEN_VIDEOS_PATH = os.getenv('SEEN_VIDEOS_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'seen_video_ids.txt'))
+
+
+def parse_title_dates(dates):
+    """datetime64 values of m/d/yy title dates, NaT where missing or malformed"""
+    # Titles share a few hundred distinct dates a season, so each is parsed once
+    codes, uniques = pd.factorize(dates)
+    parsed = pd.to_datetime(pd.Series(uniques, dtype=object), format='%m/%d/%y', errors='coerce').to_numpy()
+    # Missing dates have code -1, which takes the trailing NaT
+    return np.append(parsed, np.datetime64('NaT', 'ns'))[codes]
+
+
+def normalize_views(videos, teams=None):
+    """Resolve team ids and add expected_views and normalized_views.
+
+    A team's average is taken over every video it appears in, home or away; a
+    game's expected views are the mean of its two teams' averages.
+    """
+    lookup = (teams or get_team_registry()).lookup_table()
+    videos = videos.assign(
+        home_id=videos['home_team'].map(lookup),
+        away_id=videos['away_team'].map(lookup),
+        date=parse_title_dates(videos['date']),
+        view_count=pd.to_numeric(videos['view_count'], errors='coerce'),
+    )
+    usable = videos['home_id'].notna() & videos['away_id'].notna() & videos['date'].notna() & (videos['view_count'] > 0)
+    videos = videos[usable].reset_index(drop=True)
+    videos['home_id'] = videos['home_id'].astype(np.int64)
+    videos['away_id'] = videos['away_id'].astype(np.int64)
+    return add_expected_views(videos)
+
 
-team_avg_views = {}
-for team in team_views:
-    team_avg_views[team] = team_views[team] / team_games[team]
+def add_expected_views(videos):
+    """expected_views and normalized_views from home_id, away_id and view_count"""
+    appearances = pd.concat([
+        pd.DataFrame({'team_id': videos['home_id'], 'view_count': videos['view_count']}),
+        pd.DataFrame({'team_id': videos['away_id'], 'view_count': videos['view_count']}),
+    ])
+    team_avg_views = appearances.groupby('team_id')['view_count'].mean()
+    expected_views = (videos['home_id'].map(team_avg_views).to_numpy() + videos['away_id'].map(team_avg_views).to_numpy()) / 2
+    return videos.assign(
+        expected_views=expected_views,
+        normalized_views=np.log1p(videos['view_count'].to_numpy() / expected_views),
+    )
 
-for game in cleaned_game_list:
-    expected_views = (team_avg_views[game.home_id] + team_avg_views[game.away_id]) / 2
-    game.set_expected_views(expected_views)
 
-def get_normalized_score(game):
-    return game.normalized_views
+def game_team_ids(games, teams=None):
+    """game_pk, date and team ids of all_games_data.csv rows whose teams resolve"""
+    lookup = (teams or get_team_registry()).lookup_table()
+    games = pd.DataFrame({
+        'game_pk': games['game_pk'],
+        'date': pd.to_datetime(games['game_date']),
+        'home_id': games['home_team'].map(lookup),
+        'away_id': games['away_team'].map(lookup),
+    }).dropna(subset=['home_id', 'away_id'])
+    return games.astype({'home_id': np.int64, 'away_id': np.int64})
+
+
+def match_games(videos, games, teams=None):
+    """Attach game_pk from all_games_data.csv rows on date, teams and, for
+    doubleheaders, game number (games of a day are numbered in game_pk order)"""
+    games = game_team_ids(games, teams).sort_values('game_pk', kind='stable')
+    keys = ['date', 'home_id', 'away_id']
+    games['game_num'] = games.groupby(keys).cumcount() + 1
+    videos = videos.assign(game_num=videos['game_num'].fillna(1).astype(np.int64))
+    return videos.merge(games, on=keys + ['game_num'], how='inner')
+
+
+def save_highlight_views(videos, path=HIGHLIGHT_VIEWS_PATH):
+    # Keyed by game_pk, like all_games_data.csv; both backends join it onto the games
+    # (see highlight_views.py and Database_Manager.load_highlight_views)
+    videos = videos.sort_values('normalized_views', ascending=False, kind='stable').drop_duplicates('game_pk')
+    videos[HIGHLIGHT_VIEWS_COLUMNS].to_csv(path + ".tmp", index=False)
+    os.replace(path + ".tmp", path)
+    return len(videos)
+
+
+def merge_highlight_views(matched, games, teams=None, path=HIGHLIGHT_VIEWS_PATH):
+    """matched videos plus those already saved at path, with expected and normalized
+    views recomputed over the combined set (an incremental run only scrapes new videos)"""
+    if not os.path.exists(path):
+        return matched
+    saved = pd.read_csv(path, usecols=['game_pk', 'video_id', 'view_count'])
+    saved = saved[~saved['video_id'].isin(matched['video_id'])]
+    saved = saved.merge(game_team_ids(games, teams)[['game_pk', 'home_id', 'away_id']], on='game_pk')
+    columns = ['game_pk', 'video_id', 'view_count', 'home_id', 'away_id']
+    return add_expected_views(pd.concat([saved[columns], matched[columns]], ignore_index=True))
+
+
+def main(incremental=False):
+    """Scrape the playlist, normalize its view counts and save them per game.
+
+    An incremental run skips videos whose game was matched by an earlier run and
+    stops at the first of them (the playlist is newest first), then merges the new
+    matches into highlight_views.csv. Seen ids are only saved once that file is.
+    """
+    teams = get_team_registry()
+    if incremental:
+        seen_ids = load_seen_ids(SEEN_VIDEOS_PATH)
+        games = iter_games(start=0, seen_ids=seen_ids, stop_at_seen=True)
+    else:
+        games = iter_games()
+    videos = normalize_views(games_to_frame(games), teams)
+    videos = videos.sort_values('normalized_views', ascending=False, kind='stable')
+    for row in videos.itertuples():
+        print(row.normalized_views, row.home_team, row.away_team, row.date.strftime('%m/%d/%y'), row.view_count)
+
+    if os.path.exists("all_games_data.csv"):
+        all_games = pd.read_csv("all_games_data.csv")
+        matched = match_games(videos, all_games, teams)
+        print(f"Matched {len(matched)} of {len(videos)} videos to games")
+        if incremental:
+            matched = merge_highlight_views(matched, all_games, teams)
+        total = save_highlight_views(matched)
+        print(f"Saved views for {total} games to {HIGHLIGHT_VIEWS_PATH}")
+        if incremental:
+            # Unmatched videos stay unseen, so they are retried once their game is stored
+            save_seen_ids(SEEN_VIDEOS_PATH, seen_ids | set(matched['video_id']))
 
-sg= cleaned_game_list.copy()
-sg.sort(key=get_normalized_score,reverse=True)
 
-for g in sg:
-    print(g.normalized_views, g.home_team, g.away_team, g.date, g.view_count)
\ No newline at end of file
+if __name__ == "__main__":
+    main(incremental='--incremental' in sys.argv[1:])
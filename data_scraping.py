@@ -1,15 +1,36 @@
-import yt_dlp
-from mlb_stats_api import teamIds
-import numpy as np
+import itertools
+import operator
+import os
 import re
 
+import numpy as np
+import pandas as pd
+import yt_dlp
+
+# Game attributes, in constructor order; also the columns of games_to_frame
+GAME_FIELDS = (
+    'home_team', 'away_team', 'date', 'view_count', 'is_double_header',
+    'game_num', 'video_id', 'home_id', 'away_id', 'expected_views', 'normalized_views',
+)
+
 class Game:
-    def __init__(self, home_team, away_team, date, view_count,is_double_header):
+    # Every field is declared up front: no per-instance __dict__, and fields that
+    # are not known yet are None rather than missing
+    __slots__ = GAME_FIELDS
+
+    def __init__(self, home_team, away_team, date, view_count, is_double_header, game_num=None,
+                 video_id=None, home_id=None, away_id=None, expected_views=None, normalized_views=None):
         self.home_team = home_team
         self.away_team = away_team
         self.date = date
         self.view_count = view_count
         self.is_double_header = is_double_header
+        self.game_num = game_num
+        self.video_id = video_id
+        self.home_id = home_id
+        self.away_id = away_id
+        self.expected_views = expected_views
+        self.normalized_views = normalized_views
 
     def set_double_header_game(self, game_num):
         self.game_num = game_num
@@ -19,37 +40,53 @@ class Game:
     
     def set_away_id(self, away_id):
         self.away_id = away_id
+
+    def set_video_id(self, video_id):
+        self.video_id = video_id
     
     def set_expected_views(self, expected_views):
         self.expected_views = expected_views
         self.normalized_views = np.log1p(self.view_count / self.expected_views)
-    
+
+def games_to_frame(games):
+    """Struct-of-arrays form of an iterable of Games: one column per field"""
+    get_fields = operator.attrgetter(*GAME_FIELDS)
+    return pd.DataFrame.from_records(map(get_fields, games), columns=GAME_FIELDS)
+
+def games_from_frame(df):
+    """Games from a frame with any subset of GAME_FIELDS as columns; missing fields are None"""
+    columns = [df[field].tolist() if field in df.columns else itertools.repeat(None, len(df)) for field in GAME_FIELDS]
+    return list(itertools.starmap(Game, zip(*columns)))
+
+
+PLAYLIST_URL = "https://www.youtube.com/playlist?list=PLL-lmlkrmJanUePyXyLusrJGzyGRg-Qj3"
+# Videos at the top of the playlist that were skipped by the original [40::] slice
+PLAYLIST_START = 40
+
+DATE_PATTERN = re.compile(r'\((\d{1,2}/\d{1,2}/\d{2})\)')
+DOUBLE_HEADER_TEAMS_PATTERN = re.compile(r'^(.*?)\s+vs\.\s+(.*?)\s+Game')
+TEAMS_PATTERN = re.compile(r'^(.*?)\s+vs\.\s+(.*?)\s+Highlights')
 
 
-def get_playlist_videos(url):
+def iter_playlist_videos(url=PLAYLIST_URL):
+    """Yield (video_id, title, view_count) for each video as yt_dlp pages through the playlist"""
     ydl_opts = {
         'quiet': True,
         'extract_flat': 'in_playlist',
-        'dump_single_json': True,
     }
 
     with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-        result = ydl.extract_info(playlist_url, download=False)
+        # process=False leaves entries as a lazy generator that fetches one page at a time
+        result = ydl.extract_info(url, download=False, process=False)
+        for video in result.get("entries") or []:
+            yield video.get("id"), video.get("title"), video.get("view_count")
 
-    videos = result.get("entries", [])
-    video_data = []
-
-    for video in videos:
-        title = video.get("title")
-        view_count = video.get("view_count")
-        video_data.append((title, view_count))
-
-    return video_data
+def get_playlist_videos(url=PLAYLIST_URL):
+    return [(title, view_count) for _, title, view_count in iter_playlist_videos(url)]
 
 def extract_title_info(title):
     #Extract date from title using re
-    date_pattern = r'\((\d{1,2}/\d{1,2}/\d{2})\)'
-    date_match = re.search(date_pattern, title)
+    date_match = DATE_PATTERN.search(title)
     if date_match:
         date = date_match.group(1)
     else:
@@ -65,12 +102,10 @@ def extract_title_info(title):
             game_num = 2
     
     #extract team names
-    teams_pattern = r'^(.*?)\s+vs\.\s+(.*?)\s+Game'
     if double_header:
-        teams_match = re.search(teams_pattern, title)
+        teams_match = DOUBLE_HEADER_TEAMS_PATTERN.search(title)
     else:
-        teams_pattern = r'^(.*?)\s+vs\.\s+(.*?)\s+Highlights'
-        teams_match = re.search(teams_pattern, title)
+        teams_match = TEAMS_PATTERN.search(title)
     
     away_team = teams_match.group(1).strip() if teams_match else None
     home_team = teams_match.group(2).strip() if teams_match else None
@@ -81,12 +116,38 @@ def extract_title_info(title):
 
     return info
 
-playlist_url = "https://www.youtube.com/playlist?list=PLL-lmlkrmJanUePyXyLusrJGzyGRg-Qj3"
-video_info = get_playlist_videos(playlist_url)[40::]
-game_info = []
-for game_title in video_info:
-    game_title_info = extract_title_info(game_title[0])
-    curr_game = Game(game_title_info[0],game_title_info[1],game_title_info[2],game_title[1],game_title_info[3])
-    if curr_game.is_double_header:
-        curr_game.set_double_header_game(game_title_info[4])
-    game_info.append(curr_game)
\ No newline at end of file
+def parse_videos(videos, seen_ids=None, stop_at_seen=False):
+    """Yield a Game per (video_id, title, view_count), parsed as each one arrives.
+
+    Videos whose id is in seen_ids are skipped; the caller records which ids it has
+    finished with (see data_processing.main). stop_at_seen ends the scan at the first
+    seen video, which avoids paging through the rest of a newest-first playlist.
+    """
+    for video_id, title, view_count in videos:
+        if seen_ids is not None and video_id in seen_ids:
+            if stop_at_seen:
+                return
+            continue
+        if title is None:
+            continue
+        game_title_info = extract_title_info(title)
+        game_num = game_title_info[4] if game_title_info[3] else None
+        yield Game(game_title_info[0], game_title_info[1], game_title_info[2], view_count, game_title_info[3],
+                   game_num=game_num, video_id=video_id)
+
+def iter_games(url=PLAYLIST_URL, start=PLAYLIST_START, seen_ids=None, stop_at_seen=False):
+    """Yield a Game per playlist video as yt_dlp pages through the playlist"""
+    videos = itertools.islice(iter_playlist_videos(url), start, None)
+    return parse_videos(videos, seen_ids=seen_ids, stop_at_seen=stop_at_seen)
+
+def load_seen_ids(path):
+    if not os.path.exists(path):
+        return set()
+    with open(path, "r") as f:
+        return {line.strip() for line in f if line.strip()}
+
+def save_seen_ids(path, seen_ids):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        f.writelines(f"{video_id}\n" for video_id in sorted(seen_ids))
+    os.replace(tmp_path, path)
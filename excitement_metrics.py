@@ -0,0 +1,141 @@
+from functools import cached_property
+
+import numpy as np
+
+# Statcast columns read by the registered metrics, beyond game_pk and delta_home_win_exp
+PITCH_COLUMNS = ['inning', 'inning_topbot', 'at_bat_number', 'pitch_number',
+                 'home_score', 'away_score', 'post_home_score', 'post_away_score']
+
+# (first inning, weight) applied to win expectancy swings by late_leverage
+LATE_INNING_WEIGHTS = [(7, 1.5), (9, 2.0)]
+
+# metric name -> (function of GameSegments returning one value per game, Statcast columns it reads)
+METRICS = {}
+
+# metric name -> value type ('int', 'float' or 'bool'), which fixes its SQL, JSON and Arrow types
+METRIC_TYPES = {}
+
+
+def register_metric(name, columns=(), kind='float'):
+    """Register a per-game metric; it is stored, and sortable, as a column called `name`"""
+    def decorator(func):
+        METRICS[name] = (func, tuple(columns))
+        METRIC_TYPES[name] = kind
+        return func
+    return decorator
+
+
+class GameSegments:
+    """Pitches sorted once into one contiguous, chronological segment per game.
+
+    Metrics reduce over the segments with ufunc.reduceat and share the derived
+    arrays below, so each extra metric is one more vectorized reduction.
+    """
+
+    def __init__(self, pitches):
+        self.pitches = pitches
+        self.columns = set(pitches.columns)
+        game_pks = pitches['game_pk'].to_numpy()
+        # lexsort is stable, so without pitch sequence columns the input order is kept
+        keys = [pitches[c].to_numpy() for c in ('pitch_number', 'at_bat_number') if c in self.columns]
+        self.order = np.lexsort(keys + [game_pks])
+        sorted_pks = game_pks[self.order]
+        self.starts = np.flatnonzero(np.r_[True, sorted_pks[1:] != sorted_pks[:-1]])
+        self.ends = np.r_[self.starts[1:], len(sorted_pks)] - 1
+        self.count = len(self.starts)
+        self.game_pks = sorted_pks[self.starts]
+
+    def column(self, name):
+        """A pitch column in segment order"""
+        return self.pitches[name].to_numpy()[self.order]
+
+    def first(self, name):
+        """A pitch column's value on each game's first pitch"""
+        # Take before converting, so categorical columns only materialize one value per game
+        return self.pitches[name].iloc[self.order[self.starts]].to_numpy()
+
+    def last(self, name):
+        """A pitch column's value on each game's last pitch"""
+        return self.pitches[name].iloc[self.order[self.ends]].to_numpy()
+
+    def sum(self, values):
+        # Accumulate in float64; rounding drops the float32 representation error of the inputs
+        return np.add.reduceat(values, self.starts, dtype=np.float64).round(6)
+
+    def max(self, values):
+        # fmax skips NaNs, so a game only comes out NaN when every pitch is missing
+        return np.fmax.reduceat(values, self.starts).astype(np.float64).round(6)
+
+    @cached_property
+    def game_index(self):
+        """Game number (0..count-1) of each pitch in segment order"""
+        return np.repeat(np.arange(self.count), np.diff(np.r_[self.starts, len(self.order)]))
+
+    @cached_property
+    def abs_delta(self):
+        return np.nan_to_num(np.abs(self.column('delta_home_win_exp')))
+
+    @cached_property
+    def post_lead(self):
+        """Home runs minus away runs after each pitch"""
+        return self.column('post_home_score') - self.column('post_away_score')
+
+
+@register_metric('lead_changes', ['post_home_score', 'post_away_score'], kind='int')
+def lead_changes(games):
+    # Compare the leader across consecutive pitches with a leader, skipping ties
+    leader = np.sign(games.post_lead)
+    led = np.flatnonzero(leader != 0)
+    led = led[~np.isnan(leader[led])]
+    game = games.game_index[led]
+    changed = (leader[led[1:]] != leader[led[:-1]]) & (game[1:] == game[:-1])
+    return np.bincount(game[1:][changed], minlength=games.count)
+
+
+@register_metric('late_leverage', ['delta_home_win_exp', 'inning'])
+def late_leverage(games):
+    # Win expectancy swings, weighted up from the 7th inning on
+    inning = games.column('inning')
+    weights = np.ones(len(inning), dtype=np.float32)
+    for first_inning, weight in LATE_INNING_WEIGHTS:
+        weights[inning >= first_inning] = weight
+    return games.sum(games.abs_delta * weights)
+
+
+@register_metric('max_wp_swing', ['delta_home_win_exp'])
+def max_wp_swing(games):
+    return games.max(games.abs_delta)
+
+
+@register_metric('comeback_runs', ['post_home_score', 'post_away_score'], kind='int')
+def comeback_runs(games):
+    # Largest deficit the eventual winner overcame; 0 for ties and wire-to-wire wins
+    winner = np.sign(games.post_lead[games.ends])
+    deficit = -games.post_lead * winner[games.game_index]
+    return np.maximum(games.max(deficit), 0)
+
+
+@register_metric('extra_innings', ['inning'], kind='bool')
+def extra_innings(games):
+    return games.max(games.column('inning')) > 9
+
+
+@register_metric('walk_off', ['inning', 'inning_topbot', 'home_score', 'away_score', 'post_home_score', 'post_away_score'], kind='bool')
+def walk_off(games):
+    # The home team went ahead on the final pitch, in the bottom of the 9th or later
+    pre_lead = games.last('home_score') - games.last('away_score')
+    post_lead = games.post_lead[games.ends]
+    return (games.last('inning_topbot') == 'Bot') & (games.last('inning') >= 9) & (pre_lead <= 0) & (post_lead > 0)
+
+
+def compute_game_metrics(games, metrics=None):
+    """name -> per-game values for each registered metric; metrics whose Statcast
+    columns are missing (e.g. older seasons) come out as NaN"""
+    metrics = METRICS if metrics is None else metrics
+    values = {}
+    for name, (func, columns) in metrics.items():
+        if any(c not in games.columns for c in columns):
+            values[name] = np.full(games.count, np.nan)
+        else:
+            values[name] = func(games)
+    return values
@@ -9,6 +9,12 @@ export interface Game {
   excitement_score: number;
   season: number;
   highlight_url: string | null;
+  lead_changes?: number | null;
+  late_leverage?: number | null;
+  max_wp_swing?: number | null;
+  comeback_runs?: number | null;
+  extra_innings?: boolean | null;
+  walk_off?: boolean | null;
 }
 
 export interface GameResponse {
@@ -16,6 +22,7 @@ export interface GameResponse {
   total: number;
   page: number;
   limit: number;
+  next_cursor?: string | null;
 }
 
 export interface ApiResponse<T> {
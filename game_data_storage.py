@@ -1,18 +1,59 @@
 import psycopg2
-from mlb_stats_api import safe_get_condensed_game, rank_games_excitement, get_condensed_game
+from mlb_stats_api import rank_games_excitement
+from game_enrichment import enrich_games
+from statcast_backfill import CHECKPOINT_DIR, run_backfill, missed_ranges, combine_partitions, week_chunks
+from missed_dates_retry import in_season_segments
+from excitement_metrics import METRICS, METRIC_TYPES
+from game_store import GameStore, convert_csv
+from highlight_views import HIGHLIGHT_VIEWS_PATH, VIEW_COLUMNS, read_highlight_views
+from game_rollups import ROLLUP_LOCK_ID, refresh_rollups
 import os
 from dotenv import load_dotenv
-import statsapi
 import pybaseball
 from datetime import datetime, timedelta
 import warnings
 import json
+import io
+import time
 import pandas as pd
 warnings.filterwarnings("ignore", category=FutureWarning)
 load_dotenv()
 
 pybaseball.cache.enable()
 
+# SQL types of the excitement metric columns, by their registered value type
+METRIC_SQL_TYPES = {'int': 'INT', 'float': 'FLOAT', 'bool': 'BOOLEAN'}
+METRIC_COLUMNS = {name: METRIC_SQL_TYPES[METRIC_TYPES[name]] for name in METRICS}
+
+# Columns written to the games table, in COPY/INSERT order
+GAME_COLUMNS = ['sport', 'season', 'game_id', 'date', 'home_team', 'away_team', 'home_score', 'away_score', 'excitement', 'highlight_url'] + list(METRIC_COLUMNS)
+# Appended to the games and staging table definitions
+METRIC_COLUMN_DEFINITIONS = "".join(f", {name} {sql_type}" for name, sql_type in METRIC_COLUMNS.items())
+# Columns an upsert only overwrites with a value, so re-running from an older CSV, or
+# after a failed score or highlight lookup, keeps what is already stored
+KEEP_WHEN_MISSING = ['home_score', 'away_score', 'highlight_url'] + list(METRIC_COLUMNS)
+# Highlight popularity columns, set by load_highlight_views rather than by upserts
+VIEW_COLUMN_DEFINITIONS = "".join(f", {name} {sql_type}" for name, sql_type in VIEW_COLUMNS.items())
+
+def game_entries(games_df):
+    """games table rows from enriched games in the all_games_data.csv layout"""
+    entries = pd.DataFrame({
+        'sport': 'MLB',
+        'season': pd.to_datetime(games_df['game_date']).dt.year,
+        'game_id': games_df['game_pk'],
+        'date': games_df['game_date'],
+        'home_team': games_df['home_team'],
+        'away_team': games_df['away_team'],
+        'home_score': games_df['home_score'],
+        'away_score': games_df['away_score'],
+        'excitement': games_df['delta_home_win_exp'],
+        'highlight_url': games_df['highlight_url'],
+    })
+    # Metric columns, empty for a CSV written before they were computed
+    for name in METRIC_COLUMNS:
+        entries[name] = games_df[name] if name in games_df.columns else None
+    return entries
+
 class Database_Manager:
     def __init__(self, host, dbname, user, password, port):
         self.host = host
@@ -30,114 +71,293 @@ class Database_Manager:
             port = self.port,
         ) as conn:
             with conn.cursor() as cur:
-                cur.execute("""CREATE TABLE IF NOT EXISTS games (
+                cur.execute(f"""CREATE TABLE IF NOT EXISTS games (
                             id SERIAL PRIMARY KEY,
                             sport VARCHAR(32),
                             season INT,
-                            game_id INT,
+                            game_id INT UNIQUE,
                             date DATE,
                             home_team VARCHAR(50),
                             away_team VARCHAR(50),
                             home_score INT,
                             away_score INT,
                             excitement FLOAT,
-                            highlight_url VARCHAR(2048)
+                            highlight_url VARCHAR(2048){METRIC_COLUMN_DEFINITIONS}{VIEW_COLUMN_DEFINITIONS},
+                            change_version BIGINT
                             );
                             """)
+
+    def add_metric_columns(self):
+        # Tables created before a metric was registered gain its column, empty until the next upsert;
+        # the highlight view columns and change_version are added the same way
+        with psycopg2.connect(
+            dbname = self.dbname,
+            user = self.user,
+            password = self.password,
+            host = self.host,
+            port = self.port,
+        ) as conn:
+            with conn.cursor() as cur:
+                for name, sql_type in {**METRIC_COLUMNS, **VIEW_COLUMNS, 'change_version': 'BIGINT'}.items():
+                    cur.execute(f"ALTER TABLE games ADD COLUMN IF NOT EXISTS {name} {sql_type}")
+                # The pandas backend polls MAX(change_version) for rows updated in place
+                cur.execute("CREATE INDEX IF NOT EXISTS games_change_version_idx ON games (change_version)")
+
+    def create_games_indexes(self):
+        # Composite indexes matching the API's filters and sort orders. Every sort
+        # breaks ties on id DESC so keyset seeks on (key, id) resolve inside the index.
+        with psycopg2.connect(
+            dbname = self.dbname,
+            user = self.user,
+            password = self.password,
+            host = self.host,
+            port = self.port,
+        ) as conn:
+            with conn.cursor() as cur:
+                cur.execute("""
+                            CREATE INDEX IF NOT EXISTS games_excitement_idx
+                                ON games (excitement DESC, id DESC);
+                            CREATE INDEX IF NOT EXISTS games_date_idx
+                                ON games (date DESC, id DESC);
+                            CREATE INDEX IF NOT EXISTS games_score_diff_idx
+                                ON games ((ABS(home_score - away_score)) DESC, id DESC);
+                            CREATE INDEX IF NOT EXISTS games_season_excitement_idx
+                                ON games (season, excitement DESC, id DESC);
+                            CREATE INDEX IF NOT EXISTS games_home_team_excitement_idx
+                                ON games (home_team, excitement DESC, id DESC);
+                            CREATE INDEX IF NOT EXISTS games_away_team_excitement_idx
+                                ON games (away_team, excitement DESC, id DESC);
+                            CREATE INDEX IF NOT EXISTS games_normalized_views_idx
+                                ON games ((COALESCE(normalized_views, -1)) DESC, id DESC);
+                            """)
+                # Every metric is a /games sort order, with missing values coalesced to -1
+                # (matching SORT_EXPRESSIONS in backend/app/pagination.py)
+                for name, sql_type in METRIC_COLUMNS.items():
+                    key = f"{name}::int" if sql_type == 'BOOLEAN' else name
+                    cur.execute(f"CREATE INDEX IF NOT EXISTS games_{name}_idx ON games ((COALESCE({key}, -1)) DESC, id DESC)")
+                cur.execute("ANALYZE games")
+
+    def ensure_game_id_unique(self):
+        # Tables created before game_id was UNIQUE may hold duplicates from re-runs;
+        # keep the first copy of each game so the unique index can be built
+        with psycopg2.connect(
+            dbname = self.dbname,
+            user = self.user,
+            password = self.password,
+            host = self.host,
+            port = self.port,
+        ) as conn:
+            with conn.cursor() as cur:
+                cur.execute("""
+                            DELETE FROM games a USING games b
+                            WHERE a.game_id = b.game_id AND a.id > b.id;
+                            CREATE UNIQUE INDEX IF NOT EXISTS games_game_id_key ON games (game_id);
+                            """)
+
+    def bulk_upsert_games(self, games_df, batch_size=10000):
+        # Stream rows through COPY into a staging table, then merge into games on game_id
+        columns = GAME_COLUMNS
+        games_df = games_df[columns].copy()
+        int_columns = ['season', 'game_id', 'home_score', 'away_score'] + [name for name, sql_type in METRIC_COLUMNS.items() if sql_type == 'INT']
+        for col in int_columns:
+            games_df[col] = pd.to_numeric(games_df[col], errors='coerce').astype('Int64')
+        for col in [name for name, sql_type in METRIC_COLUMNS.items() if sql_type == 'BOOLEAN']:
+            games_df[col] = games_df[col].astype('boolean')
+        column_list = ", ".join(columns)
+        updated_columns = [col for col in columns if col != 'game_id']
+        new_values = {col: f"EXCLUDED.{col}" for col in updated_columns}
+        for col in KEEP_WHEN_MISSING:
+            new_values[col] = f"COALESCE(EXCLUDED.{col}, games.{col})"
+        # Enrichment stores "" when a game has no condensed video
+        new_values['highlight_url'] = "COALESCE(NULLIF(EXCLUDED.highlight_url, ''), games.highlight_url)"
+        updates = ", ".join(f"{col} = {value}" for col, value in new_values.items())
+
+        start_time = time.perf_counter()
+        with psycopg2.connect(
+            dbname = self.dbname,
+            user = self.user,
+            password = self.password,
+            host = self.host,
+            port = self.port,
+        ) as conn:
+            with conn.cursor() as cur:
+                cur.execute(f"""
+                            CREATE TEMP TABLE games_staging (
+                            sport VARCHAR(32),
+                            season INT,
+                            game_id INT,
+                            date DATE,
+                            home_team VARCHAR(50),
+                            away_team VARCHAR(50),
+                            home_score INT,
+                            away_score INT,
+                            excitement FLOAT,
+                            highlight_url VARCHAR(2048){METRIC_COLUMN_DEFINITIONS},
+                            staging_row BIGSERIAL
+                            ) ON COMMIT DROP;
+                            """)
+                for batch_start in range(0, len(games_df), batch_size):
+                    buffer = io.StringIO()
+                    games_df.iloc[batch_start:batch_start + batch_size].to_csv(buffer, index=False, header=False, na_rep='\\N')
+                    buffer.seek(0)
+                    cur.copy_expert(f"COPY games_staging ({column_list}) FROM STDIN WITH (FORMAT csv, NULL '\\N')", buffer)
+                    print(f"Copied {min(batch_start + batch_size, len(games_df))} rows")
+                # The last input row of a game wins (staging_row follows COPY order).
+                # Every inserted or changed row is stamped with the next change_version, which
+                # is how the pandas backend finds rows updated in place (same id, new values).
+                # Writers are serialized on the rollup lock, so versions commit in order.
+                cur.execute("SELECT pg_advisory_xact_lock(%s)", (ROLLUP_LOCK_ID,))
+                cur.execute("SELECT COALESCE(MAX(change_version), 0) + 1 FROM games")
+                version = cur.fetchone()[0]
+                cur.execute(f"""
+                            INSERT INTO games ({column_list}, change_version)
+                            SELECT DISTINCT ON (game_id) {column_list}, %(version)s FROM games_staging ORDER BY game_id, staging_row DESC
+                            ON CONFLICT (game_id) DO UPDATE SET {updates}, change_version = EXCLUDED.change_version
+                            WHERE ({", ".join(f"games.{col}" for col in new_values)}) IS DISTINCT FROM ({", ".join(new_values.values())});
+                            """, {'version': version})
+                upserted = cur.rowcount
+                # Only the seasons this batch touched are re-aggregated, in the same transaction
+                cur.execute("SELECT DISTINCT season FROM games_staging WHERE season IS NOT NULL")
+                refresh_rollups(cur, [row[0] for row in cur.fetchall()])
+            conn.commit()
+        elapsed = time.perf_counter() - start_time
+        print(f"Upserted {len(games_df)} games ({upserted} new or changed) in {elapsed:.1f}s ({len(games_df) / max(elapsed, 1e-9):.0f} rows/sec)")
+        return upserted
                 
-    def collect_game_data(self):
-        #get needed info for each game
-        all_games_list = []
-        missed_dates = []
+    def load_highlight_views(self, path=HIGHLIGHT_VIEWS_PATH):
+        # Set view_count and normalized_views from data_processing.py's highlight_views.csv.
+        # Only changed rows are written; games no longer in the file have theirs cleared.
+        views = read_highlight_views(path).reset_index()
+        views['view_count'] = pd.to_numeric(views['view_count'], errors='coerce').astype('Int64')
+        columns = list(VIEW_COLUMNS)
+        self.add_metric_columns()
+        with psycopg2.connect(
+            dbname = self.dbname,
+            user = self.user,
+            password = self.password,
+            host = self.host,
+            port = self.port,
+        ) as conn:
+            with conn.cursor() as cur:
+                cur.execute(f"CREATE TEMP TABLE views_staging (game_pk BIGINT{VIEW_COLUMN_DEFINITIONS}) ON COMMIT DROP")
+                buffer = io.StringIO()
+                views[['game_pk'] + columns].to_csv(buffer, index=False, header=False, na_rep='\\N')
+                buffer.seek(0)
+                cur.copy_expert(f"COPY views_staging (game_pk, {', '.join(columns)}) FROM STDIN WITH (FORMAT csv, NULL '\\N')", buffer)
+                assignments = ", ".join(f"{name} = v.{name}" for name in columns)
+                cur.execute(f"""
+                            UPDATE games g SET {assignments} FROM views_staging v
+                            WHERE g.game_id = v.game_pk
+                              AND ({", ".join(f"g.{name}" for name in columns)}) IS DISTINCT FROM ({", ".join(f"v.{name}" for name in columns)})
+                            """)
+                updated = cur.rowcount
+                cur.execute(f"""
+                            UPDATE games SET {", ".join(f"{name} = NULL" for name in columns)}
+                            WHERE ({" OR ".join(f"{name} IS NOT NULL" for name in columns)})
+                              AND NOT EXISTS (SELECT 1 FROM views_staging v WHERE v.game_pk = games.game_id)
+                            """)
+                cleared = cur.rowcount
+            conn.commit()
+        print(f"Loaded highlight views for {len(views)} games ({updated} updated, {cleared} cleared)")
+        return updated
+
+    def rebuild_rollups(self):
+        # Full recompute, e.g. after games were changed outside bulk_upsert_games
+        with psycopg2.connect(
+            dbname = self.dbname,
+            user = self.user,
+            password = self.password,
+            host = self.host,
+            port = self.port,
+        ) as conn:
+            with conn.cursor() as cur:
+                refresh_rollups(cur)
+            conn.commit()
+
+    def collect_game_data(self, workers=4, checkpoint_dir=CHECKPOINT_DIR):
+        # Week chunks run across a process pool; each finished chunk is checkpointed
+        # to its own partition file and recorded in the manifest, so re-runs resume
         start = datetime(1969, 1, 1)
         end = datetime(2024, 12, 31)
-        current = start
-
-        # Go week by week
-        while current <= end:
-            week_end = min(current + timedelta(days=6), end)
-            start_str = current.strftime('%Y-%m-%d')
-            end_str = week_end.strftime('%Y-%m-%d')
-            print(f"Processing {start_str} to {end_str}")
-            try:
-                games = rank_games_excitement(start_str, end_str)
-            except Exception as e:
-                print(f"Error for {start_str} to {end_str}: {e}")
-                missed_dates.append(f"{start_str} to {end_str}")
-                current = week_end + timedelta(days=1)
-                continue
-            if games.empty:
-                print(f"Skipping {start_str} to {end_str} due to missing or bad data.")
-                missed_dates.append(f"{start_str} to {end_str}")
-                current = week_end + timedelta(days=1)
-                continue
-            
-            # Add data to our list
-            games['game_date'] = games['game_date'].dt.date
-            games_array = games.to_numpy()
-            all_games_list.extend(games_array)
-            current = week_end + timedelta(days=1)
+        manifest = run_backfill(start, end, workers=workers, checkpoint_dir=checkpoint_dir)
 
         # Save missed dates to a file
+        missed_dates = missed_ranges(manifest)
         with open("missed_dates.json", "w") as f:
             json.dump(missed_dates, f)
-
         print(f"Missed dates count: {len(missed_dates)}")
-        print(f"Total games collected: {len(all_games_list)}")
-
-        # Create DataFrame from all collected games
-        if all_games_list:
-            columns = ['game_pk', 'game_date', 'home_team', 'away_team', 'delta_home_win_exp']
-            all_games_df = pd.DataFrame(all_games_list, columns=columns)
-            
-            # Save DataFrame to file
-            all_games_df.to_csv("all_games_data.csv", index=False)
-            all_games_df.to_pickle("all_games_data.pkl")  # Also save as pickle for faster loading
-            print("Saved all games data to all_games_data.csv and all_games_data.pkl")
+
+        # The CSV feeds initial_database_entries; the API loads the season-partitioned store
+        total_games = combine_partitions(manifest, checkpoint_dir, pickle_path=None)
+        print(f"Total games collected: {total_games}")
+        if total_games:
+            convert_csv("all_games_data.csv")
+            print("Saved all games data to all_games_data.csv and the game store")
         else:
             print("No games data collected")
 
-    def initial_database_entries(self):
+    def initial_database_entries(self, batch_size=10000):
         # Read all games from CSV
         all_games_df = pd.read_csv("all_games_data.csv")
         print(f"Loaded {len(all_games_df)} games from all_games_data.csv")
 
-        insert_query = """
-        INSERT INTO games (sport, season, game_id, date, home_team, away_team, home_score, away_score, excitement, highlight_url)
-        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-        """
+        # Scores come from one schedule call per date range; highlights from a bounded worker pool
+        all_games_df = enrich_games(all_games_df)
+
+        # Upserting on game_id makes re-runs update rows instead of duplicating them
+        self.ensure_game_id_unique()
+        self.add_metric_columns()
+        self.bulk_upsert_games(game_entries(all_games_df), batch_size=batch_size)
+        print("All games inserted into database.")
+        if os.path.exists(HIGHLIGHT_VIEWS_PATH):
+            self.load_highlight_views()
 
+    def latest_game_date(self):
         with psycopg2.connect(
-                dbname = self.dbname,
-                user = self.user,
-                password = self.password,
-                host = self.host,
-                port = self.port,
-            ) as conn:
+            dbname = self.dbname,
+            user = self.user,
+            password = self.password,
+            host = self.host,
+            port = self.port,
+        ) as conn:
             with conn.cursor() as cur:
-                for idx, row in all_games_df.iterrows():
-                    game_id = row['game_pk']
-                    game_date = row['game_date']
-                    game_home_team = row['home_team']
-                    game_away_team = row['away_team']
-                    game_excitement_score = row['delta_home_win_exp']
-                    game_sport = 'MLB'
-                    game_season = str(pd.to_datetime(game_date).year)
-                    try:
-                        game_home_score = statsapi.schedule(game_id=game_id)[0]['home_score']
-                        game_away_score = statsapi.schedule(game_id=game_id)[0]['away_score']
-                        game_highlights_link = safe_get_condensed_game(game_id)
-                    except Exception as e:
-                        print(f"Error fetching data for game_id {game_id}: {e}")
-                        game_home_score = None
-                        game_away_score = None
-                        game_highlights_link = ""
-                    data_entry = (game_sport, game_season, game_id, game_date, game_home_team, game_away_team, game_home_score, game_away_score, game_excitement_score, game_highlights_link)
-                    cur.execute(insert_query, data_entry)
-                    if idx % 100 == 0:
-                        print(f"Inserted {idx} rows")
-                conn.commit()
-        print("All games inserted into database.")
+                cur.execute("SELECT MAX(date) FROM games")
+                return cur.fetchone()[0]
+
+    def ingest_new_games(self, end_date=None):
+        # Nightly job: only the dates from the last stored date through end_date
+        # (yesterday by default) are fetched. The last stored date is fetched again,
+        # so games that were unfinished, or had no highlight yet, get refreshed; the
+        # upsert on game_id makes re-runs idempotent.
+        start_time = time.perf_counter()
+        end = datetime.strptime(end_date, '%Y-%m-%d') if end_date else datetime.combine(datetime.today() - timedelta(1), datetime.min.time())
+        latest = self.latest_game_date()
+        start = datetime.combine(latest, datetime.min.time()) if latest else end
+
+        # Off-season dates are skipped; long gaps are fetched a week at a time.
+        # Fetch errors are raised, so a failed night leaves the table untouched and the next run retries.
+        frames = []
+        for segment_start, segment_end in in_season_segments(start, end):
+            for start_str, end_str in week_chunks(segment_start, segment_end):
+                games = rank_games_excitement(start_str, end_str, raise_errors=True)
+                if not games.empty:
+                    frames.append(games)
+        if not frames:
+            print(f"No new games from {start:%Y-%m-%d} to {end:%Y-%m-%d}")
+            return 0
+
+        games_df = pd.concat(frames, ignore_index=True).drop_duplicates('game_pk', keep='last')
+        games_df['game_date'] = games_df['game_date'].dt.date
+        games_df = enrich_games(games_df)
+        self.add_metric_columns()
+        upserted = self.bulk_upsert_games(game_entries(games_df))
+
+        # Keep the API's file-based source current as well; only the touched season is rewritten
+        store = GameStore()
+        if store.exists():
+            store.append(games_df)
+        print(f"Ingested {upserted} games from {start:%Y-%m-%d} to {end:%Y-%m-%d} in {time.perf_counter() - start_time:.1f}s")
+        return upserted
 
 
 
@@ -146,6 +366,7 @@ class Database_Manager:
 def main():
     games = Database_Manager(os.getenv('DB_HOST'),os.getenv('DB_NAME'),os.getenv('DB_USER'),os.getenv('DB_PASSWORD'),os.getenv('DB_PORT'))
     #games.create_games_table()
+    #games.create_games_indexes()
     games.initial_database_entries()
 
 if __name__ == "__main__":
@@ -0,0 +1,56 @@
+import pandas as pd
+
+from api_cache import cached_schedule
+from highlight_service import get_highlight_service
+
+
+def date_ranges(dates, max_days=31):
+    """Group dates into (start, end) ranges of at most max_days, split on gaps
+    longer than a week so off-seasons are never requested"""
+    dates = sorted(pd.to_datetime(pd.Series(dates)).dt.normalize().unique())
+    ranges = []
+    for day in dates:
+        if ranges and (day - ranges[-1][0]).days < max_days and (day - ranges[-1][1]).days <= 7:
+            ranges[-1][1] = day
+        else:
+            ranges.append([day, day])
+    return [(start.strftime('%Y-%m-%d'), end.strftime('%Y-%m-%d')) for start, end in ranges]
+
+
+def fetch_schedule_scores(start_date, end_date, schedule=cached_schedule):
+    """Final scores for every game scheduled between start_date and end_date"""
+    games = schedule(start_date=start_date, end_date=end_date)
+    scores = pd.DataFrame(
+        [(game['game_id'], game.get('home_score'), game.get('away_score')) for game in games],
+        columns=['game_pk', 'home_score', 'away_score']
+    )
+    # Suspended games are listed again on the day they resume; keep the last entry
+    return scores.drop_duplicates('game_pk', keep='last')
+
+
+def attach_scores(games_df, max_days=31, schedule=cached_schedule):
+    """Join home/away scores onto games_df with one schedule call per date range"""
+    frames = []
+    for start_date, end_date in date_ranges(games_df['game_date'], max_days):
+        try:
+            frames.append(fetch_schedule_scores(start_date, end_date, schedule))
+        except Exception as e:
+            print(f"Error fetching schedule for {start_date} to {end_date}: {e}")
+    if frames:
+        scores = pd.concat(frames, ignore_index=True).drop_duplicates('game_pk', keep='last')
+    else:
+        scores = pd.DataFrame(columns=['game_pk', 'home_score', 'away_score'])
+    scores['game_pk'] = scores['game_pk'].astype('int64')
+    games_df = games_df.drop(columns=['home_score', 'away_score'], errors='ignore')
+    return games_df.merge(scores, on='game_pk', how='left')
+
+
+def enrich_games(games_df, max_days=31, rate_per_sec=10, retries=3, schedule=cached_schedule, service=None):
+    """Add home_score, away_score and highlight_url to a frame of games keyed by game_pk"""
+    games_df = attach_scores(games_df, max_days=max_days, schedule=schedule)
+    print(f"Attached scores for {games_df['home_score'].notna().sum()} of {len(games_df)} games")
+    # Highlights resolve on the shared service's session and worker pool; failures map to ""
+    service = service or get_highlight_service()
+    highlights = service.get_condensed_games(games_df['game_pk'].tolist(), rate_per_sec=rate_per_sec, retries=retries)
+    games_df['highlight_url'] = games_df['game_pk'].map(highlights).fillna("")
+    return games_df
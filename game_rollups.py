@@ -0,0 +1,74 @@
+# Rollup tables behind the API's /stats endpoints: per-season sums, so a season's rows
+# can be recomputed on their own when its games change. Each SELECT takes the season
+# filter as {where}; teams are upper-cased like the API's team filter. bulk_upsert_games
+# refreshes the seasons it touches, and the API creates any missing table at startup.
+# The functions below take cursors returning tuples.
+ROLLUP_TABLES = {
+    'games_team_season_stats': (
+        "season INT, team VARCHAR(50), games INT, excitement_games INT, excitement_sum FLOAT, PRIMARY KEY (season, team)",
+        """SELECT season, team, COUNT(*), COUNT(excitement), COALESCE(SUM(excitement), 0)
+           FROM (SELECT season, UPPER(home_team) AS team, excitement FROM games {where} AND home_team IS NOT NULL AND away_team IS NOT NULL
+                 UNION ALL
+                 SELECT season, UPPER(away_team) AS team, excitement FROM games {where} AND home_team IS NOT NULL AND away_team IS NOT NULL) appearances
+           GROUP BY season, team""",
+    ),
+    'games_month_stats': (
+        "season INT, month INT, games INT, excitement_games INT, excitement_sum FLOAT, PRIMARY KEY (season, month)",
+        """SELECT season, EXTRACT(MONTH FROM date)::int AS month, COUNT(*), COUNT(excitement), COALESCE(SUM(excitement), 0)
+           FROM games {where} AND date IS NOT NULL AND home_team IS NOT NULL AND away_team IS NOT NULL
+           GROUP BY season, month""",
+    ),
+    'games_matchup_stats': (
+        "team_a VARCHAR(50), team_b VARCHAR(50), season INT, games INT, excitement_games INT, excitement_sum FLOAT, PRIMARY KEY (team_a, team_b, season)",
+        """SELECT LEAST(UPPER(home_team), UPPER(away_team)) AS team_a, GREATEST(UPPER(home_team), UPPER(away_team)) AS team_b,
+                  season, COUNT(*), COUNT(excitement), COALESCE(SUM(excitement), 0)
+           FROM games {where} AND home_team IS NOT NULL AND away_team IS NOT NULL
+           GROUP BY team_a, team_b, season""",
+    ),
+}
+
+# Serializes rollup writers (ingests and API processes starting together) on one database
+ROLLUP_LOCK_ID = 7_412_031
+
+
+def _missing(cur):
+    missing = []
+    for table in ROLLUP_TABLES:
+        cur.execute("SELECT to_regclass(%s)", (table,))
+        if cur.fetchone()[0] is None:
+            missing.append(table)
+    return missing
+
+
+def refresh_rollups(cur, seasons=None):
+    """Recompute the rollup rows of the given seasons (all of them when None) in the
+    caller's transaction. Missing rollup tables are created and filled completely."""
+    cur.execute("SELECT pg_advisory_xact_lock(%s)", (ROLLUP_LOCK_ID,))
+    missing = _missing(cur)
+    for table, (columns, select) in ROLLUP_TABLES.items():
+        table_seasons = seasons
+        if table in missing:
+            cur.execute(f"CREATE TABLE {table} ({columns})")
+            table_seasons = None
+        if table_seasons is None:
+            cur.execute(f"DELETE FROM {table}")
+            cur.execute(f"INSERT INTO {table} {select.format(where='WHERE season IS NOT NULL')}")
+        else:
+            seasons_list = [int(season) for season in table_seasons]
+            cur.execute(f"DELETE FROM {table} WHERE season = ANY(%(seasons)s)", {'seasons': seasons_list})
+            cur.execute(f"INSERT INTO {table} {select.format(where='WHERE season = ANY(%(seasons)s)')}", {'seasons': seasons_list})
+
+
+def create_missing_rollups(cur):
+    """Create and fill any missing rollup table in the caller's transaction, leaving
+    existing ones untouched; returns the created tables"""
+    if not _missing(cur):
+        return []
+    cur.execute("SELECT pg_advisory_xact_lock(%s)", (ROLLUP_LOCK_ID,))
+    # Another process may have created them while this one waited for the lock
+    missing = _missing(cur)
+    for table in missing:
+        columns, select = ROLLUP_TABLES[table]
+        cur.execute(f"CREATE TABLE {table} ({columns})")
+        cur.execute(f"INSERT INTO {table} {select.format(where='WHERE season IS NOT NULL')}")
+    return missing
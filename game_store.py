@@ -0,0 +1,285 @@
+import json
+import mmap
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+from excitement_metrics import METRICS
+
+STORE_PATH = os.getenv('GAME_STORE_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'games_store'))
+MANIFEST_NAME = "manifest.json"
+FORMAT_VERSION = 2
+COLUMN_ALIGNMENT = 64
+
+# Column -> on-disk dtype. 'team' columns hold int16 codes into the manifest's team
+# list (-1 when missing); missing numbers are NaN. 'string' columns are int64 offsets
+# into a UTF-8 buffer stored after them; missing and empty strings read back as None.
+STORE_COLUMNS = {
+    'id': 'int64',
+    'game_id': 'int64',
+    'date': 'datetime64[D]',
+    'season': 'int16',
+    'home_team': 'team',
+    'away_team': 'team',
+    'home_score': 'float64',
+    'away_score': 'float64',
+    'excitement': 'float64',
+    'highlight_url': 'string',
+}
+STORE_COLUMNS.update({name: 'float64' for name in METRICS})
+
+# all_games_data.csv column names -> store column names
+CSV_COLUMNS = {
+    'game_pk': 'game_id',
+    'game_date': 'date',
+    'delta_home_win_exp': 'excitement',
+}
+
+
+def _write_json_atomic(path, data):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def normalize_games(games):
+    """Typed store columns (minus id) from a frame in the all_games_data.csv layout"""
+    games = games.rename(columns=CSV_COLUMNS)
+    date = pd.to_datetime(games['date']).to_numpy(dtype='datetime64[D]')
+    normalized = pd.DataFrame({
+        'game_id': pd.to_numeric(games['game_id']).to_numpy(dtype=np.int64),
+        'date': date,
+        'season': date.astype('datetime64[Y]').astype(np.int16) + 1970,
+        'home_team': games['home_team'].to_numpy(dtype=object),
+        'away_team': games['away_team'].to_numpy(dtype=object),
+    })
+    for column, dtype in STORE_COLUMNS.items():
+        if dtype == 'float64':
+            values = games[column] if column in games.columns else np.nan
+            normalized[column] = pd.to_numeric(pd.Series(values, index=games.index), errors='coerce').to_numpy(dtype=np.float64, na_value=np.nan)
+        elif dtype == 'string':
+            values = games[column] if column in games.columns else None
+            normalized[column] = pd.Series(values, index=games.index, dtype=object).to_numpy()
+    return normalized
+
+
+def _encode_strings(values):
+    """(int64 offsets, UTF-8 buffer) of an array of strings; missing values are empty"""
+    encoded = [value.encode() if isinstance(value, str) else b"" for value in values]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(value) for value in encoded], out=offsets[1:])
+    return offsets, b"".join(encoded)
+
+
+def _decode_strings(offsets, data):
+    data = bytes(data)
+    bounds = offsets.tolist()
+    if data.isascii():
+        # Byte offsets are character offsets, so decode once and slice the text
+        data = data.decode()
+        return np.array([data[start:end] or None for start, end in zip(bounds, bounds[1:])], dtype=object)
+    return np.array([data[start:end].decode() or None for start, end in zip(bounds, bounds[1:])], dtype=object)
+
+
+class GameStore:
+    """Games stored column by column in one file per season.
+
+    Reads memory-map the season files and view each column in place, so loading
+    costs little more than opening them and a single-season read only touches
+    that season's file. Appends rewrite just the seasons they touch: each new
+    partition is written to a fresh file, then the manifest is swapped atomically
+    to point at it.
+    """
+
+    def __init__(self, path=STORE_PATH):
+        self.path = path
+
+    def exists(self):
+        return os.path.exists(os.path.join(self.path, MANIFEST_NAME))
+
+    def load_manifest(self):
+        if not self.exists():
+            return {"format": FORMAT_VERSION, "teams": [], "next_id": 1, "seasons": {}}
+        with open(os.path.join(self.path, MANIFEST_NAME), "r") as f:
+            return json.load(f)
+
+    def seasons(self):
+        return sorted(int(season) for season in self.load_manifest()["seasons"])
+
+    def _read_partition(self, manifest, season, columns, use_mmap=True):
+        entry = manifest["seasons"][str(season)]
+        path = os.path.join(self.path, entry["file"])
+        with open(path, "rb") as f:
+            # Plain ndarray views over the mapping avoid np.memmap's per-slice overhead
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if use_mmap else f.read()
+        data = {}
+        for column in columns:
+            if column not in entry["columns"]:
+                # Written before this column existed
+                data[column] = np.full(entry["rows"], None if STORE_COLUMNS.get(column) == 'string' else np.nan)
+                continue
+            offset, dtype, *string_data = entry["columns"][column]
+            if string_data:
+                offsets = np.frombuffer(buffer, dtype=np.int64, count=entry["rows"] + 1, offset=offset)
+                data_offset = string_data[0]
+                data[column] = _decode_strings(offsets, buffer[data_offset:data_offset + int(offsets[-1])])
+                continue
+            dtype = np.dtype(dtype)
+            data[column] = np.frombuffer(buffer, dtype=dtype, count=entry["rows"], offset=offset)
+        return data
+
+    def read(self, seasons=None, columns=None, use_mmap=True):
+        """DataFrame of the given seasons (all by default), in date order.
+
+        Team columns come back as categoricals, dates as datetime64[ns] and
+        strings as object arrays. The other columns of a single season are
+        returned as views over the memory-mapped files.
+        """
+        try:
+            return self._read(seasons, columns, use_mmap)
+        except FileNotFoundError:
+            # A concurrent append replaced a partition after the manifest was read
+            return self._read(seasons, columns, use_mmap)
+
+    def _read(self, seasons, columns, use_mmap):
+        manifest = self.load_manifest()
+        columns = list(STORE_COLUMNS) if columns is None else columns
+        available = sorted(int(season) for season in manifest["seasons"])
+        seasons = available if seasons is None else [int(s) for s in seasons if int(s) in available]
+        parts = [self._read_partition(manifest, season, columns, use_mmap) for season in seasons]
+
+        teams = pd.Index(manifest["teams"], dtype=object)
+        frame = {}
+        for column in columns:
+            if len(parts) == 1:
+                values = parts[0][column]
+            elif parts:
+                values = np.concatenate([part[column] for part in parts])
+            else:
+                values = np.array([], dtype='datetime64[D]' if column == 'date' else None)
+            if STORE_COLUMNS.get(column) == 'team':
+                values = pd.Categorical.from_codes(np.asarray(values, dtype=np.int16), categories=teams)
+            elif column == 'date':
+                values = values.astype('datetime64[ns]')
+            frame[column] = values
+        return pd.DataFrame(frame, copy=False)
+
+    def _encode(self, games, manifest):
+        """On-disk column arrays for a frame of normalized games with ids"""
+        arrays = {}
+        for column, dtype in STORE_COLUMNS.items():
+            if dtype == 'team':
+                # New teams are added to the end of the list, so existing codes stay valid
+                teams = games[column].dropna().astype(str)
+                known = set(manifest["teams"])
+                manifest["teams"].extend(team for team in pd.unique(teams) if team not in known)
+                codes = pd.Categorical(games[column], categories=manifest["teams"]).codes
+                arrays[column] = codes.astype(np.int16)
+            elif dtype == 'string':
+                arrays[column] = _encode_strings(games[column].to_numpy(dtype=object))
+            else:
+                arrays[column] = games[column].to_numpy(dtype=dtype)
+        return arrays
+
+    def _write_partition(self, manifest, season, games):
+        """Write one season as a single file of column buffers, each aligned to
+        COLUMN_ALIGNMENT bytes; returns the file it supersedes, if any"""
+        # Files are never modified in place, so open memory maps stay valid
+        previous = manifest["seasons"].get(str(season))
+        generation = int(previous["file"].split(".")[1]) + 1 if previous else 1
+        name = f"season={season}.{generation}.bin"
+        columns = {}
+        with open(os.path.join(self.path, name), "wb") as f:
+            for column, values in self._encode(games, manifest).items():
+                f.write(b"\0" * (-f.tell() % COLUMN_ALIGNMENT))
+                if isinstance(values, tuple):
+                    # String column: offsets, then the UTF-8 buffer, each aligned
+                    offsets, string_data = values
+                    columns[column] = [f.tell(), offsets.dtype.str]
+                    f.write(offsets.tobytes())
+                    f.write(b"\0" * (-f.tell() % COLUMN_ALIGNMENT))
+                    columns[column].append(f.tell())
+                    f.write(string_data)
+                    continue
+                columns[column] = [f.tell(), values.dtype.str]
+                f.write(values.tobytes())
+        manifest["seasons"][str(season)] = {
+            "file": name,
+            "rows": len(games),
+            "columns": columns,
+            "first_date": str(games['date'].min().date()),
+            "last_date": str(games['date'].max().date()),
+        }
+        return previous["file"] if previous else None
+
+    def append(self, games):
+        """Add games in the all_games_data.csv layout. Games already stored keep
+        their id and are replaced; only the seasons present in `games` are rewritten."""
+        games = normalize_games(games).drop_duplicates('game_id', keep='last')
+        if games.empty:
+            return 0
+        os.makedirs(self.path, exist_ok=True)
+        manifest = self.load_manifest()
+        superseded = []
+        for season, new in games.groupby('season', sort=True):
+            if str(season) in manifest["seasons"]:
+                existing = self._read(seasons=[season], columns=None, use_mmap=False)
+                existing['home_team'] = existing['home_team'].astype(object)
+                existing['away_team'] = existing['away_team'].astype(object)
+                # Games stored in another season (a corrected date) are not moved
+                ids = existing.set_index('game_id')['id']
+                new = new.assign(id=new['game_id'].map(ids))
+                existing = existing[~existing['game_id'].isin(new['game_id'])]
+            else:
+                existing = None
+                new = new.assign(id=np.nan)
+            missing = new['id'].isna().to_numpy()
+            new.loc[missing, 'id'] = np.arange(manifest["next_id"], manifest["next_id"] + missing.sum())
+            manifest["next_id"] += int(missing.sum())
+            new['id'] = new['id'].astype(np.int64)
+            combined = new if existing is None else pd.concat([existing, new], ignore_index=True)
+            combined = combined.sort_values(['date', 'id'], kind='stable')
+            superseded.append(self._write_partition(manifest, season, combined))
+        # Rewritten seasons use the current layout; older ones stay readable
+        manifest["format"] = FORMAT_VERSION
+        _write_json_atomic(os.path.join(self.path, MANIFEST_NAME), manifest)
+        for name in superseded:
+            if name:
+                os.remove(os.path.join(self.path, name))
+        return len(games)
+
+
+def convert_csv(csv_path="all_games_data.csv", store_path=STORE_PATH):
+    """Build a fresh store from all_games_data.csv, numbering games in file order
+    like the backend does when it loads the CSV, then swap it into place"""
+    games = pd.read_csv(csv_path)
+    tmp_path = store_path + ".tmp"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    store = GameStore(tmp_path)
+    manifest = store.load_manifest()
+    games = normalize_games(games)
+    games['id'] = np.arange(1, len(games) + 1, dtype=np.int64)
+    manifest["next_id"] = len(games) + 1
+    os.makedirs(tmp_path)
+    for season, partition in games.groupby('season', sort=True):
+        store._write_partition(manifest, season, partition.sort_values(['date', 'id'], kind='stable'))
+    _write_json_atomic(os.path.join(tmp_path, MANIFEST_NAME), manifest)
+
+    old_path = store_path + ".old"
+    if os.path.exists(store_path):
+        os.replace(store_path, old_path)
+    os.replace(tmp_path, store_path)
+    shutil.rmtree(old_path, ignore_errors=True)
+    return len(games)
+
+
+def main():
+    total = convert_csv()
+    print(f"Converted {total} games into {STORE_PATH}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+import concurrent.futures
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from api_cache import cached_game_highlight_data
+
+SCHEDULE_URL = "https://statsapi.mlb.com/api/v1/schedule"
+# Same request statsapi.game_highlight_data makes, so cached responses are interchangeable
+HIGHLIGHT_PARAMS = {
+    "sportId": 1,
+    "hydrate": "game(content(highlights(highlights)))",
+    "fields": "dates,date,games,gamePk,content,highlights,items,headline,type,value,title,description,duration,playbacks,name,url",
+}
+
+CONNECT_TIMEOUT = 3.05
+MAX_WORKERS = 8
+
+
+def parse_highlights(response):
+    """Video highlights of one game in date order, as statsapi.game_highlight_data returns them"""
+    dates = response.get("dates") or [{}]
+    games = dates[0].get("games") or [{}]
+    highlights = games[0].get("content", {}).get("highlights", {}).get("highlights", {})
+    videos = {item["date"]: item for item in highlights.get("items", []) if isinstance(item, dict) and item.get("type") == "video"}
+    return [videos[day] for day in sorted(videos)]
+
+
+def condensed_game_url(highlights):
+    video_url = ""
+    for link in highlights:
+        if 'condensed-game' in link['id']:
+            video_url = link['playbacks'][0]['url']
+    return video_url
+
+
+class RateLimiter:
+    """Spaces calls at least 1/rate seconds apart across threads"""
+
+    def __init__(self, rate_per_sec):
+        self.interval = 1.0 / rate_per_sec if rate_per_sec else 0.0
+        self._lock = threading.Lock()
+        self._next_call = 0.0
+
+    def wait(self):
+        with self._lock:
+            now = time.monotonic()
+            delay = self._next_call - now
+            self._next_call = max(now, self._next_call) + self.interval
+        if delay > 0:
+            time.sleep(delay)
+
+
+class HighlightService:
+    """Condensed-game lookups over one keep-alive HTTP session and one bounded worker pool.
+
+    Requests carry socket-level connect/read timeouts, so a stalled call fails in
+    its own thread instead of being abandoned by a per-call executor.
+    """
+
+    def __init__(self, max_workers=MAX_WORKERS, timeout=10):
+        self.timeout = timeout
+        self.session = requests.Session()
+        # One connection per worker, reused across calls
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_workers)
+        self.session.mount("https://", adapter)
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="highlights")
+
+    def highlight_data(self, game_id, timeout=None):
+        response = self.session.get(
+            SCHEDULE_URL,
+            params=dict(HIGHLIGHT_PARAMS, gamePk=game_id),
+            timeout=(CONNECT_TIMEOUT, timeout or self.timeout),
+        )
+        response.raise_for_status()
+        return parse_highlights(response.json())
+
+    def condensed_game(self, game_id, timeout=None):
+        """Condensed-game URL ("" when none is published); raises on request errors"""
+        highlights = cached_game_highlight_data(game_id, fetch=lambda: self.highlight_data(game_id, timeout))
+        return condensed_game_url(highlights)
+
+    def get_condensed_game(self, game_id, timeout=None, retries=1, backoff=0.5, limiter=None):
+        """condensed_game, tried up to `retries` times with exponential backoff; the
+        last timeout or error is logged and mapped to "" """
+        for attempt in range(retries):
+            if limiter is not None:
+                limiter.wait()
+            try:
+                return self.condensed_game(game_id, timeout)
+            except Exception as e:
+                if attempt < retries - 1:
+                    time.sleep(backoff * 2 ** attempt)
+                elif isinstance(e, requests.Timeout):
+                    print(f"Timeout getting highlight for game_id {game_id}")
+                else:
+                    print(f"Error getting highlight for game_id {game_id}: {e}")
+        return ""
+
+    def get_condensed_games(self, game_ids, timeout=None, rate_per_sec=None, retries=1, backoff=0.5):
+        """game_id -> condensed-game URL, resolved concurrently on the shared pool,
+        starting at most rate_per_sec requests a second when given"""
+        limiter = RateLimiter(rate_per_sec) if rate_per_sec else None
+        futures = [(game_id, self.executor.submit(self.get_condensed_game, game_id, timeout, retries, backoff, limiter))
+                   for game_id in game_ids]
+        return {game_id: future.result() for game_id, future in futures}
+
+    def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        self.session.close()
+
+
+_service = None
+_service_lock = threading.Lock()
+
+
+def get_highlight_service():
+    global _service
+    with _service_lock:
+        if _service is None:
+            _service = HighlightService()
+    return _service
@@ -0,0 +1,32 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+# Written by data_processing.py, one row per game_pk
+HIGHLIGHT_VIEWS_PATH = os.getenv('HIGHLIGHT_VIEWS_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'highlight_views.csv'))
+
+# Per-game popularity columns served next to excitement -> SQL type. normalized_views
+# is log1p(views / the two teams' average views), so popular teams do not dominate.
+VIEW_COLUMNS = {
+    'view_count': 'BIGINT',
+    'normalized_views': 'FLOAT',
+}
+
+
+def read_highlight_views(path=HIGHLIGHT_VIEWS_PATH):
+    """VIEW_COLUMNS of every game with a matched highlight video, indexed by game_pk;
+    empty when data_processing.py has not written the file yet"""
+    if not os.path.exists(path):
+        return pd.DataFrame(columns=list(VIEW_COLUMNS), index=pd.Index([], dtype=np.int64, name='game_pk'))
+    views = pd.read_csv(path, usecols=['game_pk', *VIEW_COLUMNS])
+    return views.drop_duplicates('game_pk').set_index('game_pk')
+
+
+def attach_views(games, key='game_id', path=HIGHLIGHT_VIEWS_PATH):
+    """games with VIEW_COLUMNS joined on `key`; NaN for games without a video"""
+    views = read_highlight_views(path)
+    games = games.drop(columns=list(VIEW_COLUMNS), errors='ignore')
+    for column in VIEW_COLUMNS:
+        games[column] = games[key].map(views[column]).astype(np.float64) if key in games.columns else np.nan
+    return games
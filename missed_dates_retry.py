@@ -0,0 +1,175 @@
+import concurrent.futures
+import json
+import os
+import time
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+from api_cache import cached_get, TEAMS_TTL
+from mlb_stats_api import rank_games_excitement
+from game_store import GameStore
+from statcast_backfill import (
+    CHECKPOINT_DIR, chunk_key, partition_path, load_manifest, save_manifest,
+    missed_ranges, write_json_atomic, GAME_DATA_COLUMNS
+)
+
+
+def parse_range(key):
+    start_str, end_str = key.split(" to ")
+    return datetime.strptime(start_str, '%Y-%m-%d'), datetime.strptime(end_str, '%Y-%m-%d')
+
+
+def season_window(year):
+    """(first day of the regular season, last day of the postseason) from the
+    schedule API, or None if the calendar is unavailable"""
+    ttl = None if year < datetime.today().year else TEAMS_TTL
+    try:
+        seasons = cached_get('seasons', {'sportId': 1, 'season': year}, ttl=ttl).get('seasons', [])
+    except Exception as e:
+        print(f"Error fetching season calendar for {year}: {e}")
+        return None
+    if not seasons:
+        return None
+    season = seasons[0]
+    start = season.get('regularSeasonStartDate')
+    end = season.get('postSeasonEndDate') or season.get('regularSeasonEndDate')
+    if not start or not end:
+        return None
+    return datetime.strptime(start, '%Y-%m-%d'), datetime.strptime(end, '%Y-%m-%d')
+
+
+def in_season_segments(start, end):
+    """Parts of start..end that fall inside a season; when a year's calendar is
+    unknown the whole year is treated as in season"""
+    segments = []
+    for year in range(start.year, end.year + 1):
+        year_start = max(start, datetime(year, 1, 1))
+        year_end = min(end, datetime(year, 12, 31))
+        window = season_window(year)
+        if window is not None:
+            year_start = max(year_start, window[0])
+            year_end = min(year_end, window[1])
+        if year_start <= year_end:
+            segments.append((year_start, year_end))
+    return segments
+
+
+def fetch_with_backoff(start, end, attempts=4, base_delay=2.0, timeout=60):
+    """Fetch a range, retrying failures with exponential backoff. Timeouts on
+    multi-day ranges are re-raised so the caller can split the range."""
+    start_str, end_str = start.strftime('%Y-%m-%d'), end.strftime('%Y-%m-%d')
+    for attempt in range(attempts):
+        try:
+            return rank_games_excitement(start_str, end_str, timeout=timeout, raise_errors=True)
+        except concurrent.futures.TimeoutError:
+            if start < end:
+                raise
+            error = "timeout"
+        except Exception as e:
+            error = str(e)
+        if attempt < attempts - 1:
+            delay = base_delay * 2 ** attempt
+            print(f"Retrying {start_str} to {end_str} in {delay:.0f}s ({error})")
+            time.sleep(delay)
+    raise RuntimeError(f"Giving up on {start_str} to {end_str} after {attempts} attempts: {error}")
+
+
+def retry_range(start, end, manifest, checkpoint_dir=CHECKPOINT_DIR, **fetch_kwargs):
+    """Re-fetch one range, recording the outcome (and any day-level split) in the manifest"""
+    key = chunk_key(start.strftime('%Y-%m-%d'), end.strftime('%Y-%m-%d'))
+    try:
+        games = fetch_with_backoff(start, end, **fetch_kwargs)
+    except concurrent.futures.TimeoutError:
+        # Too much data for one request: split the range into single days
+        print(f"Splitting {key} into days after a timeout")
+        days = [start + timedelta(days=i) for i in range((end - start).days + 1)]
+        manifest[key] = {"status": "split", "children": [chunk_key(d.strftime('%Y-%m-%d'), d.strftime('%Y-%m-%d')) for d in days]}
+        save_manifest(manifest, checkpoint_dir)
+        for day in days:
+            retry_range(day, day, manifest, checkpoint_dir, **fetch_kwargs)
+        return
+    except Exception as e:
+        print(e)
+        manifest[key] = {"status": "missed", "error": str(e)}
+    else:
+        if games.empty:
+            manifest[key] = {"status": "empty"}
+        else:
+            games['game_date'] = games['game_date'].dt.date
+            path = partition_path(checkpoint_dir, *key.split(" to "))
+            games[GAME_DATA_COLUMNS].to_csv(path + ".tmp", index=False)
+            os.replace(path + ".tmp", path)
+            manifest[key] = {"status": "done", "rows": len(games), "file": os.path.basename(path)}
+    save_manifest(manifest, checkpoint_dir)
+
+
+def merge_recovered(manifest, keys, checkpoint_dir=CHECKPOINT_DIR, csv_path="all_games_data.csv", pickle_path="all_games_data.pkl"):
+    """Add the partitions of newly completed ranges to the existing game data files"""
+    frames = [pd.read_csv(csv_path)] if os.path.exists(csv_path) else []
+    frames += [pd.read_csv(os.path.join(checkpoint_dir, manifest[key]["file"])) for key in keys]
+    if not frames:
+        return 0
+    games = pd.concat(frames, ignore_index=True).drop_duplicates('game_pk', keep='last')
+    games = games.sort_values('game_date', kind='stable').reindex(columns=GAME_DATA_COLUMNS)
+    games.to_csv(csv_path + ".tmp", index=False)
+    os.replace(csv_path + ".tmp", csv_path)
+    if pickle_path:
+        games.to_pickle(pickle_path)
+    return len(games)
+
+
+def seed_manifest(checkpoint_dir=CHECKPOINT_DIR, missed_dates_path="missed_dates.json"):
+    """Backfill manifest, seeded from a legacy missed_dates.json when none exists yet"""
+    manifest = load_manifest(checkpoint_dir)
+    if not manifest and os.path.exists(missed_dates_path):
+        with open(missed_dates_path, "r") as f:
+            manifest = {key: {"status": "missed"} for key in json.load(f)}
+        os.makedirs(checkpoint_dir, exist_ok=True)
+        save_manifest(manifest, checkpoint_dir)
+    return manifest
+
+
+def retry_missed_dates(checkpoint_dir=CHECKPOINT_DIR, missed_dates_path="missed_dates.json", **fetch_kwargs):
+    """Retry every missed range in the manifest, dropping off-season ones, then
+    refresh missed_dates.json and fold recovered games into all_games_data.csv"""
+    manifest = seed_manifest(checkpoint_dir, missed_dates_path)
+    done_before = {key for key, entry in manifest.items() if entry.get("status") == "done"}
+    missed = missed_ranges(manifest)
+    print(f"Retrying {len(missed)} missed date ranges")
+
+    for key in missed:
+        start, end = parse_range(key)
+        segments = in_season_segments(start, end)
+        if not segments:
+            manifest[key] = {"status": "off_season"}
+            save_manifest(manifest, checkpoint_dir)
+            continue
+        if segments != [(start, end)]:
+            # Only the in-season part of the range is worth fetching
+            children = [chunk_key(s.strftime('%Y-%m-%d'), e.strftime('%Y-%m-%d')) for s, e in segments]
+            manifest[key] = {"status": "split", "children": children}
+            save_manifest(manifest, checkpoint_dir)
+        for segment_start, segment_end in segments:
+            retry_range(segment_start, segment_end, manifest, checkpoint_dir, **fetch_kwargs)
+
+    still_missed = missed_ranges(manifest)
+    write_json_atomic(missed_dates_path, still_missed)
+    print(f"Recovered {len(missed) - len(still_missed)} ranges, {len(still_missed)} still missed")
+    recovered = sorted(key for key, entry in manifest.items() if entry.get("status") == "done" and key not in done_before)
+    if recovered:
+        total_games = merge_recovered(manifest, recovered, checkpoint_dir, pickle_path=None)
+        print(f"Total games collected: {total_games}")
+        # Only the seasons the recovered games fall in are rewritten
+        store = GameStore()
+        if store.exists():
+            store.append(pd.concat([pd.read_csv(os.path.join(checkpoint_dir, manifest[key]["file"])) for key in recovered], ignore_index=True))
+    return still_missed
+
+
+def main():
+    retry_missed_dates()
+
+
+if __name__ == "__main__":
+    main()
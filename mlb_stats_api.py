@@ -1,31 +1,32 @@
 import requests
 import time
 import datetime
-import statsapi
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta, date
 from pybaseball import statcast
 import concurrent.futures
+import multiprocessing
+from api_cache import cached_schedule
+from highlight_service import get_highlight_service
+from team_registry import get_team_registry
+from excitement_metrics import PITCH_COLUMNS, GameSegments, compute_game_metrics
 
 
-#create dictionary of team ids
-teams_info = statsapi.get('teams',{'sportId':1})['teams']
-teamIds = {}
-team_abbreviations = {}
-for team in teams_info:
-    team_abbreviations[team['abbreviation']] = team['id']
-    teamIds[team['teamName']] = team['id']
+def __getattr__(name):
+    # teamIds / team_abbreviations are served by the lazily loaded team registry,
+    # so importing this module makes no network calls
+    if name == 'teamIds':
+        return get_team_registry().team_ids
+    if name == 'team_abbreviations':
+        return get_team_registry().abbreviations
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 #get link to condensed game from highlight plays endpoint
 def get_condensed_game(game_Id):
-    highlight_videos= statsapi.game_highlight_data(game_Id)
-    video_url = ""
-    for link in highlight_videos:
-        if 'condensed-game' in link['id']:
-            video_url = link['playbacks'][0]['url']
-    return video_url
+    # Raises on request errors; safe_get_condensed_game maps them to ""
+    return get_highlight_service().condensed_game(game_Id)
 
 def get_yesterday_date():
     yesterday = datetime.strftime(datetime.today() - timedelta(1), '%Y-%m-%d')
@@ -34,7 +35,7 @@ def get_yesterday_date():
 
 #get list of all game ids for a given date
 def get_game_ids_for_day(date):
-    games = statsapi.schedule(date)
+    games = cached_schedule(date)
     game_ids = []
     for game in games:
         game_ids.append(game['game_id'])
@@ -42,7 +43,7 @@ def get_game_ids_for_day(date):
 
 #score differntial for a given game id
 def get_score_differential(game_id):
-    game_info = statsapi.schedule(game_id=game_id)[0]
+    game_info = cached_schedule(game_id=game_id)[0]
     score_diff = abs(game_info["home_score"]-game_info["away_score"])
     return score_diff
 
@@ -52,7 +53,7 @@ def rank_yesterdays_games_by_score_differential():
     return games_ranked
 
 def game_title(game_id):
-    game_info = statsapi.schedule(game_id=game_id)[0]
+    game_info = cached_schedule(game_id=game_id)[0]
     title = game_info['game_date']+ ": " + game_info['away_name'] + " @ " + game_info["home_name"]
     return title
 
@@ -71,41 +72,79 @@ def print_ranked_games_highlight_links():
 #                         'delta_home_win_exp': 'sum'}).sort_values(by='delta_home_win_exp',ascending=False).reset_index()
 #     return game_excitement
 
-def rank_games_excitement(start_date, end_date, timeout=60):
+# Statcast columns needed to score a game
+EXCITEMENT_COLUMNS = ['game_pk','game_date','home_team','away_team','delta_home_win_exp']
+
+def project_pitch_data(pitch_data):
+    # Keep only the scoring columns, in compact dtypes, so the ~90-column frame can be freed
+    pitches = pd.DataFrame({
+        'game_pk': pitch_data['game_pk'].to_numpy(dtype=np.int32),
+        'game_date': pitch_data['game_date'].to_numpy(dtype='datetime64[ns]'),
+        'home_team': pd.Categorical(pitch_data['home_team']),
+        'away_team': pd.Categorical(pitch_data['away_team']),
+        'delta_home_win_exp': pitch_data['delta_home_win_exp'].to_numpy(dtype=np.float32, na_value=np.nan),
+    })
+    # Columns read by the excitement metrics, where this range of Statcast has them
+    for column in PITCH_COLUMNS:
+        if column not in pitch_data.columns:
+            continue
+        if column == 'inning_topbot':
+            pitches[column] = pd.Categorical(pitch_data[column])
+        else:
+            pitches[column] = pd.to_numeric(pitch_data[column], errors='coerce').to_numpy(dtype=np.float32, na_value=np.nan)
+    return pitches
+
+def aggregate_game_excitement(pitches, metrics=None):
+    # Sort the pitches into per-game segments once; the excitement sum and every
+    # registered metric are then vectorized reductions over those segments
+    games = GameSegments(pitches)
+    game_excitement = pd.DataFrame({
+        'game_pk': games.game_pks.astype(np.int64),
+        'game_date': games.first('game_date'),
+        'home_team': np.asarray(games.first('home_team'), dtype=object),
+        'away_team': np.asarray(games.first('away_team'), dtype=object),
+        'delta_home_win_exp': games.sum(games.abs_delta),
+    })
+    for name, values in compute_game_metrics(games, metrics).items():
+        game_excitement[name] = values
+    return game_excitement.sort_values(by='delta_home_win_exp', ascending=False, kind='stable').reset_index(drop=True)
+
+def fetch_pitch_data(start_date, end_date):
+    # Runs in rank_games_excitement's worker process; only the projected pitches
+    # are sent back. None when the range has no usable Statcast data
+    pitch_data = statcast(start_dt=start_date, end_dt=end_date)
+    if pitch_data.empty or not set(EXCITEMENT_COLUMNS).issubset(pitch_data.columns):
+        return None
+    return project_pitch_data(pitch_data)
+
+def rank_games_excitement(start_date, end_date, timeout=60, raise_errors=False):
+    # raise_errors lets callers tell timeouts and failures apart from ranges with no games
     try:
-        with concurrent.futures.ThreadPoolExecutor() as executor:
-            future = executor.submit(statcast, start_dt=start_date, end_dt=end_date)
-            pitch_data = future.result(timeout=timeout)
-        if pitch_data.empty or not set(['game_pk','game_date','home_team','away_team','delta_home_win_exp']).issubset(pitch_data.columns):
+        # A worker process rather than a thread: leaving the pool terminates it, so a
+        # timed-out fetch is killed at the deadline instead of being waited on
+        with multiprocessing.Pool(1) as pool:
+            try:
+                pitches = pool.apply_async(fetch_pitch_data, (start_date, end_date)).get(timeout)
+            except multiprocessing.TimeoutError:
+                raise concurrent.futures.TimeoutError() from None
+        if pitches is None:
             print(f"Statcast data missing or malformed for {start_date} to {end_date}")
             return pd.DataFrame()
-        pitch_data['delta_home_win_exp'] = pitch_data["delta_home_win_exp"].apply(lambda x: abs(x))
-        pitch_data = pitch_data[['game_pk','game_date','home_team','away_team','delta_home_win_exp']].groupby("game_pk")
-        game_excitement = pitch_data.agg({'game_date': 'first', 
-                            'home_team': 'first', 
-                            'away_team': 'first', 
-                            'delta_home_win_exp': 'sum'}).sort_values(by='delta_home_win_exp',ascending=False).reset_index()
-        return game_excitement
+        return aggregate_game_excitement(pitches)
     except concurrent.futures.TimeoutError:
         print(f"Timeout loading statcast data for {start_date} to {end_date}")
+        if raise_errors:
+            raise
         return pd.DataFrame()
     except Exception as e:
         print(f"Error loading statcast data for {start_date} to {end_date}: {e}")
+        if raise_errors:
+            raise
         return pd.DataFrame()
     
 def safe_get_condensed_game(game_id, timeout=10):
-    with concurrent.futures.ThreadPoolExecutor() as executor:
-        future = executor.submit(get_condensed_game, game_id)
-        try:
-            return future.result(timeout=timeout)
-        except concurrent.futures.TimeoutError:
-            print(f"Timeout getting highlight for game_id {game_id}")
-            return ""
-        except Exception as e:
-            print(f"Error getting highlight for game_id {game_id}: {e}")
-            return ""
-
-        
+    # Runs in the calling thread; the shared session's read timeout bounds the wait
+    return get_highlight_service().get_condensed_game(game_id, timeout=timeout)
 
 def main():
     #print_ranked_games_highlight_links()
@@ -0,0 +1,19 @@
+import os
+import sys
+
+from dotenv import load_dotenv
+
+from game_data_storage import Database_Manager
+
+load_dotenv()
+
+
+def main():
+    # Usage: python nightly_ingest.py [YYYY-MM-DD]; ingests through yesterday by default
+    games = Database_Manager(os.getenv('DB_HOST'), os.getenv('DB_NAME'), os.getenv('DB_USER'), os.getenv('DB_PASSWORD'), os.getenv('DB_PORT'))
+    end_date = sys.argv[1] if len(sys.argv) > 1 else None
+    games.ingest_new_games(end_date)
+
+
+if __name__ == "__main__":
+    main()
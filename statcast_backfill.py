@@ -0,0 +1,115 @@
+import concurrent.futures
+import json
+import os
+from datetime import timedelta
+
+import pandas as pd
+
+from mlb_stats_api import rank_games_excitement
+from excitement_metrics import METRICS
+
+CHECKPOINT_DIR = "backfill_chunks"
+MANIFEST_NAME = "manifest.json"
+# Per-game metric columns follow the excitement sum
+GAME_DATA_COLUMNS = ['game_pk', 'game_date', 'home_team', 'away_team', 'delta_home_win_exp'] + list(METRICS)
+
+
+def week_chunks(start, end):
+    """(start, end) date strings for consecutive week-long chunks covering start..end"""
+    chunks = []
+    current = start
+    while current <= end:
+        week_end = min(current + timedelta(days=6), end)
+        chunks.append((current.strftime('%Y-%m-%d'), week_end.strftime('%Y-%m-%d')))
+        current = week_end + timedelta(days=1)
+    return chunks
+
+
+def chunk_key(start_str, end_str):
+    # Same format as the entries in missed_dates.json
+    return f"{start_str} to {end_str}"
+
+
+def partition_path(checkpoint_dir, start_str, end_str):
+    return os.path.join(checkpoint_dir, f"games_{start_str}_{end_str}.csv")
+
+
+def write_json_atomic(path, data):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def load_manifest(checkpoint_dir=CHECKPOINT_DIR):
+    path = os.path.join(checkpoint_dir, MANIFEST_NAME)
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def save_manifest(manifest, checkpoint_dir=CHECKPOINT_DIR):
+    write_json_atomic(os.path.join(checkpoint_dir, MANIFEST_NAME), manifest)
+
+
+def process_chunk(start_str, end_str, checkpoint_dir=CHECKPOINT_DIR):
+    """Aggregate one chunk and checkpoint it to its own partition file"""
+    print(f"Processing {start_str} to {end_str}")
+    games = rank_games_excitement(start_str, end_str)
+    if games.empty:
+        print(f"Skipping {start_str} to {end_str} due to missing or bad data.")
+        return chunk_key(start_str, end_str), {"status": "missed"}
+    games['game_date'] = games['game_date'].dt.date
+    path = partition_path(checkpoint_dir, start_str, end_str)
+    games[GAME_DATA_COLUMNS].to_csv(path + ".tmp", index=False)
+    os.replace(path + ".tmp", path)
+    return chunk_key(start_str, end_str), {"status": "done", "rows": len(games), "file": os.path.basename(path)}
+
+
+def run_backfill(start, end, workers=4, checkpoint_dir=CHECKPOINT_DIR, retry_missed=False):
+    """Process every week chunk not already recorded in the manifest across a
+    process pool. The manifest is rewritten after each chunk, so an interrupted
+    run resumes where it stopped."""
+    os.makedirs(checkpoint_dir, exist_ok=True)
+    manifest = load_manifest(checkpoint_dir)
+    # Anything already recorded is skipped; missed chunks only when asked to retry them
+    retry = {None, "missed"} if retry_missed else {None}
+    pending = [c for c in week_chunks(start, end) if manifest.get(chunk_key(*c), {}).get("status") in retry]
+    print(f"{len(pending)} chunks to process, {len(manifest)} already in manifest")
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(process_chunk, s, e, checkpoint_dir): (s, e) for s, e in pending}
+        for future in concurrent.futures.as_completed(futures):
+            start_str, end_str = futures[future]
+            try:
+                key, entry = future.result()
+            except Exception as e:
+                print(f"Error for {start_str} to {end_str}: {e}")
+                key, entry = chunk_key(start_str, end_str), {"status": "missed", "error": str(e)}
+            manifest[key] = entry
+            save_manifest(manifest, checkpoint_dir)
+    return manifest
+
+
+def missed_ranges(manifest):
+    return sorted(key for key, entry in manifest.items() if entry.get("status") == "missed")
+
+
+def combine_partitions(manifest, checkpoint_dir=CHECKPOINT_DIR, csv_path="all_games_data.csv", pickle_path="all_games_data.pkl"):
+    """Stream completed partitions, in date order, into a single CSV and pickle"""
+    done = [key for key in sorted(manifest) if manifest[key].get("status") == "done"]
+    if not done:
+        return 0
+    total = 0
+    with open(csv_path + ".tmp", "w", newline="") as out:
+        out.write(",".join(GAME_DATA_COLUMNS) + "\n")
+        for key in done:
+            chunk = pd.read_csv(os.path.join(checkpoint_dir, manifest[key]["file"]))
+            # Partitions written before a metric was registered leave its column empty
+            chunk.reindex(columns=GAME_DATA_COLUMNS).to_csv(out, index=False, header=False)
+            total += len(chunk)
+    os.replace(csv_path + ".tmp", csv_path)
+    if pickle_path:
+        pd.read_csv(csv_path).to_pickle(pickle_path)
+    return total
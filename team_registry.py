@@ -0,0 +1,119 @@
+import json
+import os
+import threading
+
+from api_cache import TEAMS_TTL, cached_get, get_cache
+
+TEAMS_PARAMS = {'sportId': 1}
+TEAMS_SNAPSHOT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'teams_snapshot.json')
+
+# Team names used in highlight video titles, and older Statcast abbreviations -> Stats API teamName
+TEAM_ALIASES = {
+    "A's": 'Athletics',
+    'D-Backs': 'D-backs',
+    'Diamondbacks': 'D-backs',
+    'OAK': 'Athletics',
+    'ARI': 'D-backs',
+    'WAS': 'Nationals',
+    'MON': 'Nationals',
+}
+
+
+class TeamRegistry:
+    """MLB team ids by team name, alias and abbreviation, loaded on first use.
+
+    The first lookup reads the cached teams response (even an expired one), or the
+    bundled teams_snapshot.json when there is none, so it never waits on the
+    network. If that data may be stale, a background thread refetches it from the
+    Stats API and swaps in the result.
+    """
+
+    def __init__(self, snapshot_path=TEAMS_SNAPSHOT_PATH, aliases=TEAM_ALIASES, refresh=True):
+        self.snapshot_path = snapshot_path
+        self.aliases = dict(aliases)
+        self.refresh_enabled = refresh
+        self.source = None
+        self._lookups = None
+        self._lock = threading.Lock()
+        self._refresh_thread = None
+
+    def _set_teams(self, teams, source):
+        ids = {team['teamName']: team['id'] for team in teams}
+        abbreviations = {team['abbreviation']: team['id'] for team in teams}
+        # Published as one tuple, so readers never see names and abbreviations from different loads
+        self._lookups = (ids, abbreviations)
+        self.source = source
+
+    def _load(self):
+        cache = get_cache()
+        key = cache.make_key('teams', TEAMS_PARAMS)
+        response = cache.get(key)
+        if response is not None:
+            self._set_teams(response['teams'], 'cache')
+            return
+        response = cache.get(key, allow_expired=True)
+        if response is not None:
+            self._set_teams(response['teams'], 'stale cache')
+        else:
+            with open(self.snapshot_path, 'r') as f:
+                self._set_teams(json.load(f), 'snapshot')
+        if self.refresh_enabled:
+            self._refresh_thread = threading.Thread(target=self.refresh, name="team-registry-refresh", daemon=True)
+            self._refresh_thread.start()
+
+    def _ensure_loaded(self):
+        if self._lookups is None:
+            with self._lock:
+                if self._lookups is None:
+                    self._load()
+        return self._lookups
+
+    def refresh(self):
+        """Refetch the teams from the Stats API; keeps the current data on failure"""
+        try:
+            response = cached_get('teams', TEAMS_PARAMS, ttl=TEAMS_TTL)
+        except Exception as e:
+            print(f"Error refreshing teams: {e}")
+            return False
+        self._set_teams(response['teams'], 'api')
+        return True
+
+    @property
+    def team_ids(self):
+        """teamName -> team id"""
+        return self._ensure_loaded()[0]
+
+    @property
+    def abbreviations(self):
+        """Abbreviation -> team id"""
+        return self._ensure_loaded()[1]
+
+    def team_id(self, name):
+        """Id for a team name, alias or abbreviation, or None"""
+        ids, abbreviations = self._ensure_loaded()
+        if name in ids:
+            return ids[name]
+        if name in self.aliases:
+            return ids.get(self.aliases[name])
+        return abbreviations.get(name)
+
+    def lookup_table(self):
+        """Every known name, alias and abbreviation -> team id, with the same
+        precedence as team_id, for mapping whole columns at once"""
+        ids, abbreviations = self._ensure_loaded()
+        table = dict(abbreviations)
+        table.update({alias: ids[name] for alias, name in self.aliases.items() if name in ids})
+        table.update(ids)
+        return table
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_team_registry():
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = TeamRegistry()
+    return _registry
@@ -0,0 +1,51 @@
+import concurrent.futures
+import multiprocessing
+import time
+from datetime import datetime
+
+import pandas as pd
+import pytest
+
+import missed_dates_retry
+import mlb_stats_api
+
+# The stubbed statcast reaches the fetch worker by being inherited over fork
+pytestmark = pytest.mark.skipif(multiprocessing.get_start_method() != 'fork', reason="needs the fork start method")
+
+SLOW_FETCH = 5
+
+
+def stub_statcast(start_dt, end_dt):
+    """Hangs on multi-day ranges; one game for a single day"""
+    if start_dt != end_dt:
+        time.sleep(SLOW_FETCH)
+    return pd.DataFrame({
+        'game_pk': [int(start_dt.replace('-', ''))] * 2,
+        'game_date': [start_dt] * 2,
+        'home_team': ['NYY'] * 2,
+        'away_team': ['BOS'] * 2,
+        'delta_home_win_exp': [0.25, -0.5],
+    })
+
+
+@pytest.fixture
+def slow_statcast(monkeypatch):
+    monkeypatch.setattr(mlb_stats_api, 'statcast', stub_statcast)
+
+
+def test_timeout_is_raised_at_the_deadline(slow_statcast):
+    start = time.monotonic()
+    with pytest.raises(concurrent.futures.TimeoutError):
+        mlb_stats_api.rank_games_excitement('2023-04-01', '2023-04-07', timeout=1, raise_errors=True)
+    assert time.monotonic() - start < SLOW_FETCH - 2
+
+
+def test_timed_out_week_is_split_into_days(slow_statcast, tmp_path):
+    manifest = {}
+    start = time.monotonic()
+    missed_dates_retry.retry_range(datetime(2023, 4, 1), datetime(2023, 4, 3), manifest, str(tmp_path), timeout=1)
+    assert time.monotonic() - start < SLOW_FETCH
+    assert manifest['2023-04-01 to 2023-04-03']['status'] == 'split'
+    days = manifest['2023-04-01 to 2023-04-03']['children']
+    assert [manifest[day]['status'] for day in days] == ['done'] * 3
+    assert all(manifest[day]['rows'] == 1 for day in days)